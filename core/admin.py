@@ -0,0 +1,128 @@
+"""Admin changelists for tables with millions of rows.
+
+The default changelist runs two exact ``COUNT(*)`` queries per page, one for
+the paginator and one for the "N total" link. ``LargeTableAdmin`` drops the
+second and lets ``EstimatedCountPaginator`` read the row count of an
+unfiltered changelist from the database statistics. Filtered and searched
+lists are still counted exactly.
+
+The date hierarchy lists its years, months or days with a ``SELECT DISTINCT``
+over the truncated date of every row. ``LargeTableAdmin`` finds each period
+with an index seek on the ``date_hierarchy`` field instead (see
+``SeekDatesMixin``), so the field must be indexed.
+"""
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Min, QuerySet
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+
+def estimate_count(model, using='default'):
+    """Approximate row count of a model's table, or None if unavailable"""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            # Row count gathered by ANALYZE (PRAGMA optimize) if there is one,
+            # else the highest rowid, which is exact until rows are deleted
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone():
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+                row = cursor.fetchone()
+                if row:
+                    return int(row[0].split()[0])
+            cursor.execute(f'SELECT MAX(rowid) FROM {connection.ops.quote_name(table)}')
+            return cursor.fetchone()[0] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that estimates the size of large unfiltered querysets"""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where:
+            estimate = estimate_count(queryset.model, queryset.db)
+            if estimate is not None and estimate >= getattr(settings, 'ADMIN_ESTIMATED_COUNT_MIN', 10000):
+                return estimate
+        return super().count
+
+
+def _period_start(value, kind):
+    value = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if kind in ('year', 'month'):
+        value = value.replace(day=1)
+    if kind == 'year':
+        value = value.replace(month=1)
+    return value
+
+
+def _next_period(start, kind):
+    if kind == 'year':
+        return start.replace(year=start.year + 1)
+    if kind == 'month':
+        return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start + timedelta(days=1)
+
+
+class SeekDatesMixin:
+    """datetimes() that finds each period with a MIN(field) index seek.
+
+    One query per period listed (at most 31 for the days of a month) instead
+    of truncating the date of every row.
+    """
+
+    def datetimes(self, field_name, kind, order='ASC', tzinfo=None):
+        if kind not in ('year', 'month', 'day'):
+            return super().datetimes(field_name, kind, order, tzinfo)
+        tzinfo = tzinfo or timezone.get_current_timezone()
+        queryset = self.order_by()
+        periods = []
+        current = queryset.aggregate(first=Min(field_name))['first']
+        while current is not None:
+            # Periods are calendar periods of the current time zone
+            local = timezone.localtime(current, tzinfo).replace(tzinfo=None) if settings.USE_TZ else current
+            start = _period_start(local, kind)
+            following = _next_period(start, kind)
+            if settings.USE_TZ:
+                start = timezone.make_aware(start, tzinfo)
+                following = timezone.make_aware(following, tzinfo)
+            periods.append(start)
+            current = queryset.filter(**{f'{field_name}__gte': following}).aggregate(
+                first=Min(field_name)
+            )['first']
+        return periods if order == 'ASC' else periods[::-1]
+
+
+@lru_cache(maxsize=None)
+def _seek_dates_class(queryset_class):
+    return type(f'SeekDates{queryset_class.__name__}', (SeekDatesMixin, queryset_class), {})
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """ModelAdmin defaults for large tables.
+
+    Subclasses should also set ``list_select_related`` for the foreign keys
+    they display and ``autocomplete_fields`` (or ``raw_id_fields``) for the
+    ones they edit, so no page loads a related table whole.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if self.date_hierarchy:
+            # Clones keep the class, so actions still get the model's methods
+            queryset.__class__ = _seek_dates_class(type(queryset))
+        return queryset
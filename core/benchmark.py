@@ -0,0 +1,241 @@
+"""Scenarios and measurement helpers for the ``benchmark_api`` command"""
+import json
+import statistics
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+
+
+def _scenario(name, method='GET', kwargs=None, query=None, data=None, upload=None,
+              write=False, auth=True, headers=None, requires=()):
+    return {
+        'name': name,
+        'method': method,
+        'kwargs': kwargs or (lambda ctx: {}),
+        'query': query or (lambda ctx: {}),
+        'data': data,
+        'upload': upload,
+        'write': write,
+        'auth': auth,
+        'headers': headers or (lambda ctx: {}),
+        'requires': requires,
+    }
+
+
+# One scenario per named route. ``requires`` lists the dataset objects the
+# scenario needs; scenarios whose objects are missing are reported as skipped.
+SCENARIOS = [
+    # Authentication
+    _scenario('user-register', 'POST', write=True, auth=False, data=lambda ctx, i: {
+        'email': f'bench-{i}@example.com', 'username': f'bench-{i}', 'first_name': 'Bench',
+        'last_name': 'User', 'password': 'bench-password', 'password_confirm': 'bench-password',
+    }),
+    _scenario('user-login', 'POST', auth=False, data=lambda ctx, i: {
+        'email': ctx['user'].email, 'password': ctx['password'],
+    }),
+    _scenario('token-refresh', 'POST', auth=False, data=lambda ctx, i: {'refresh': ctx['refresh']}),
+    _scenario('user-profile'),
+    _scenario('user-search', query=lambda ctx: {'q': ctx['user'].first_name[:3]}),
+    _scenario('user-by-id', kwargs=lambda ctx: {'user_id': ctx['member'].user_id},
+              requires=('member',)),
+
+    # Groups
+    _scenario('group-list-create'),
+    _scenario('group-detail', kwargs=lambda ctx: {'group_id': ctx['group'].id}),
+    _scenario('group-members', kwargs=lambda ctx: {'group_id': ctx['group'].id}),
+    _scenario('group-add-member', 'POST', write=True,
+              kwargs=lambda ctx: {'group_id': ctx['group'].id},
+              data=lambda ctx, i: {'user_id': ctx['outsider'].user_id},
+              requires=('outsider',)),
+    _scenario('group-add-members', 'POST', write=True,
+              kwargs=lambda ctx: {'group_id': ctx['group'].id},
+              data=lambda ctx, i: {'user_ids': ctx['outsiders']},
+              requires=('outsiders',)),
+    _scenario('group-remove-member', 'DELETE', write=True,
+              kwargs=lambda ctx: {'group_id': ctx['group'].id, 'user_id': ctx['member'].user_id},
+              requires=('member',)),
+    _scenario('group-export', kwargs=lambda ctx: {'group_id': ctx['group'].id},
+              query=lambda ctx: {'format': 'ndjson'}),
+    _scenario('group-import', 'POST', write=True,
+              kwargs=lambda ctx: {'group_id': ctx['group'].id},
+              upload=lambda ctx, i: ('tasks.ndjson', ''.join(
+                  json.dumps({'title': f'Imported task {i}-{n}', 'priority': 'low'}) + '\n'
+                  for n in range(100)
+              ).encode())),
+    _scenario('group-stats', kwargs=lambda ctx: {'group_id': ctx['group'].id}),
+    _scenario('group-workload', kwargs=lambda ctx: {'group_id': ctx['group'].id}),
+    _scenario('group-deletion', kwargs=lambda ctx: {'deletion_id': ctx['deletion'].id},
+              requires=('deletion',)),
+
+    # Tasks
+    _scenario('task-list'),
+    _scenario('task-detail', kwargs=lambda ctx: {'pk': ctx['task'].id}, requires=('task',)),
+    _scenario('task-create', 'POST', write=True,
+              kwargs=lambda ctx: {'group_id': ctx['group'].id},
+              data=lambda ctx, i: {'title': f'Benchmark task {i}', 'auto_assign': True}),
+    _scenario('task-calendar', query=lambda ctx: {
+        'from': (ctx['now'] - timedelta(days=7)).isoformat(),
+        'to': (ctx['now'] + timedelta(days=30)).isoformat(),
+    }),
+    _scenario('task-calendar-feed-url'),
+    # Polled by calendar apps without a JWT; served from the cache after the first request
+    _scenario('task-calendar-feed', auth=False, kwargs=lambda ctx: {'token': ctx['feed_token']}),
+    _scenario('task-recurrence-list', kwargs=lambda ctx: {'group_id': ctx['group'].id}),
+    _scenario('task-recurrence-detail', kwargs=lambda ctx: {'recurrence_id': ctx['recurrence'].id},
+              requires=('recurrence',)),
+    _scenario('task-swap-list'),
+    _scenario('task-swap-create', 'POST', write=True,
+              kwargs=lambda ctx: {'task_id': ctx['own_task'].id},
+              data=lambda ctx, i: {'target_user_id': ctx['target_task'].assigned_to_user.user_id,
+                                   'target_task_id': ctx['target_task'].id},
+              requires=('own_task', 'target_task')),
+    _scenario('task-swap-approve-admin', 'POST', write=True,
+              kwargs=lambda ctx: {'swap_id': ctx['admin_swap'].id}, requires=('admin_swap',)),
+    _scenario('task-swap-approve-user', 'POST', write=True,
+              kwargs=lambda ctx: {'swap_id': ctx['user_swap'].id}, requires=('user_swap',)),
+    _scenario('task-swap-reject', 'POST', write=True,
+              kwargs=lambda ctx: {'swap_id': ctx['admin_swap'].id},
+              data=lambda ctx, i: {'reason': 'benchmark'}, requires=('admin_swap',)),
+
+    # Notifications
+    _scenario('notification-list'),
+    _scenario('notification-read', 'POST', write=True,
+              kwargs=lambda ctx: {'notification_id': ctx['notification'].id},
+              requires=('notification',)),
+    _scenario('notification-mark-all-read', 'POST', write=True),
+    _scenario('notification-unread-count'),
+
+    # Sync
+    _scenario('sync', query=lambda ctx: {'since': ctx['sync_token']}),
+
+    # Webhooks
+    _scenario('webhook-list', query=lambda ctx: {'group': ctx['group'].id}),
+    _scenario('webhook-detail', kwargs=lambda ctx: {'webhook_id': ctx['webhook'].id},
+              requires=('webhook',)),
+    _scenario('webhook-deliveries', kwargs=lambda ctx: {'webhook_id': ctx['webhook'].id},
+              requires=('webhook',)),
+    _scenario('webhook-redeliver', 'POST', write=True,
+              kwargs=lambda ctx: {'webhook_id': ctx['webhook'].id}, requires=('webhook',)),
+
+    # Batch: the calls behind the group page in one round trip
+    _scenario('batch', 'POST', data=lambda ctx, i: {'requests': [
+        {'path': f"/api/groups/{ctx['group'].id}/"},
+        {'path': f"/api/groups/{ctx['group'].id}/members/"},
+        {'path': f"/api/tasks/?group={ctx['group'].id}"},
+        {'path': '/api/tasks/swaps/'},
+        {'path': '/api/notifications/unread-count/'},
+    ]}),
+
+    # Operations
+    _scenario('metrics', auth=False,
+              headers=lambda ctx: {'HTTP_AUTHORIZATION': f"Bearer {ctx['metrics_token']}"}),
+    _scenario('profile-list'),
+    _scenario('profile-download', kwargs=lambda ctx: {'name': ctx['profile']},
+              requires=('profile',)),
+]
+
+
+def named_routes():
+    """Return the names of all project routes outside the admin site"""
+    names = []
+
+    def walk(patterns, namespace=None):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns, pattern.namespace or namespace)
+            elif isinstance(pattern, URLPattern) and pattern.name and namespace is None:
+                names.append(pattern.name)
+
+    walk(get_resolver().url_patterns)
+    return names
+
+
+def scenario_path(scenario, ctx):
+    return reverse(scenario['name'], kwargs=scenario['kwargs'](ctx))
+
+
+class QueryCounter:
+    """Execute wrapper that counts queries and their time on the default connection"""
+
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.time += time.perf_counter() - start
+
+
+def send(client, scenario, path, ctx, iteration):
+    """Issue one request and fully consume the response, running its on-commit work"""
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        return _send(client, scenario, path, ctx, iteration)
+
+
+def _send(client, scenario, path, ctx, iteration):
+    data = scenario['data'](ctx, iteration) if scenario['data'] else None
+    method = scenario['method']
+    if scenario['upload']:
+        name, content = scenario['upload'](ctx, iteration)
+        response = client.post(path, {'file': SimpleUploadedFile(name, content)})
+    elif method == 'GET':
+        response = client.get(path, scenario['query'](ctx))
+    elif method == 'DELETE':
+        response = client.delete(path)
+    else:
+        response = client.generic(method, path, data=json.dumps(data or {}),
+                                  content_type='application/json')
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def measure(client, scenario, path, ctx, iteration):
+    """Return (latency seconds, query counter, status code) for one request"""
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        start = time.perf_counter()
+        response = send(client, scenario, path, ctx, iteration)
+        elapsed = time.perf_counter() - start
+    return elapsed, counter, response.status_code
+
+
+def peak_memory(client, scenario, path, ctx, iteration):
+    """Peak bytes allocated by Python while serving one request"""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        send(client, scenario, path, ctx, iteration)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def summarize(latencies, query_counts, query_times, statuses, wall_time):
+    """Aggregate per-request samples into the numbers written to the report"""
+    ms = sorted(value * 1000 for value in latencies)
+    if len(ms) > 1:
+        cuts = statistics.quantiles(ms, n=100, method='inclusive')
+        p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+    else:
+        p50 = p95 = p99 = ms[0]
+    return {
+        'requests': len(ms),
+        'p50_ms': round(p50, 3),
+        'p95_ms': round(p95, 3),
+        'p99_ms': round(p99, 3),
+        'mean_ms': round(statistics.fmean(ms), 3),
+        'throughput_rps': round(len(ms) / wall_time, 2) if wall_time else None,
+        'queries': max(query_counts),
+        'query_time_ms': round(statistics.fmean(query_times) * 1000, 3),
+        'statuses': sorted(set(statuses)),
+    }
@@ -0,0 +1,44 @@
+"""System checks for settings the core features rely on."""
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+# Cache backends whose entries only the process that set them can see
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Calendar feeds are cached to be served by every worker"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in PROCESS_LOCAL_CACHES:
+        return [Warning(
+            'The default cache is not shared by the worker processes.',
+            hint=(
+                'Each worker renders and caches the calendar feeds again. '
+                'Use the file, database, Redis or Memcached cache backend.'
+            ),
+            id='core.W001',
+        )]
+    return []
+
+
+@register(Tags.caches)
+def check_replica_cache(app_configs, **kwargs):
+    """Replica stickiness needs a cache shared by all worker processes"""
+    if not getattr(settings, 'READ_REPLICAS', []):
+        return []
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in PROCESS_LOCAL_CACHES:
+        return [Error(
+            'READ_REPLICAS needs a default cache shared by all worker processes.',
+            hint=(
+                f'{backend} is per process, so a user whose write was served by '
+                'one worker can read stale data from a replica through another. '
+                'Use the file, database, Redis or Memcached cache backend.'
+            ),
+            id='core.E001',
+        )]
+    return []
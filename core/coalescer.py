@@ -0,0 +1,224 @@
+"""Group commit for small independent writes.
+
+SQLite serializes writers, so many tiny autocommit writes from concurrent
+requests each pay for taking the write lock and committing. The coalescer
+queues such writes and a background thread runs them together in one
+transaction, either every ``MAX_DELAY_MS`` or once ``MAX_BATCH`` writes are
+waiting. ``coalesced_write()`` returns a ``concurrent.futures.Future`` that
+resolves once the write is committed, for callers that need durability.
+
+Each write runs in its own savepoint, so one failing write only fails its
+own future. If the batch transaction itself cannot commit, every write is
+retried in its own transaction. Coalesced inserts send ``post_save`` like
+``save()`` does, from inside the batch transaction. Failed writes are logged
+even when nobody waits on their future.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models.signals import post_save
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MAX_BATCH': 200,
+    'MAX_DELAY_MS': 5,
+    # Seconds callers wait on a future before giving up
+    'WAIT_TIMEOUT': 30,
+}
+
+
+def coalescer_settings():
+    return {**DEFAULTS, **getattr(settings, 'WRITE_COALESCER', {})}
+
+
+class WriteCoalescer:
+    def __init__(self, max_batch, max_delay, using='default'):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.using = using
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name='write-coalescer', daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        future.add_done_callback(_log_failure)
+        self.queue.put((future, fn, args, kwargs))
+        return future
+
+    def stop(self):
+        """Commit everything queued so far and stop the worker thread"""
+        self.queue.put(None)
+        self.thread.join()
+
+    def _run(self):
+        running = True
+        while running:
+            item = self.queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+            try:
+                self._commit(batch)
+            except Exception as exc:
+                # Never leave a caller waiting on a write that was not attempted
+                for future, *_ in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+        connections[self.using].close()
+
+    def submit_insert(self, instance):
+        """Queue an insert; inserts of one model in a batch share one bulk_create"""
+        return self.submit(None, instance)
+
+    def _commit(self, batch):
+        from .metrics import record_write_batch
+        close_old_connections()
+        outcomes = []
+        try:
+            with transaction.atomic(using=self.using):
+                inserts = {}
+                for item in batch:
+                    if item[1] is None:
+                        inserts.setdefault(type(item[2][0]), []).append(item)
+                    else:
+                        outcomes.append(self._attempt(item))
+                for items in inserts.values():
+                    outcomes.extend(self._insert(items))
+        except Exception:
+            # The batch could not be committed; isolate the writes instead
+            for item in batch:
+                if item[1] is None:
+                    self._reset_insert(item[2][0])
+                future, result, exc = self._attempt(item)
+                if exc is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(exc)
+            return
+        for future, result, exc in outcomes:
+            if exc is None:
+                future.set_result(result)
+            else:
+                future.set_exception(exc)
+        record_write_batch(len(batch))
+
+    def _attempt(self, item):
+        """Run one write in a savepoint (a transaction outside the batch)"""
+        future, fn, args, kwargs = item
+        try:
+            with transaction.atomic(using=self.using):
+                if fn is None:
+                    args[0].save(using=self.using)
+                    return future, args[0], None
+                return future, fn(*args, **kwargs), None
+        except Exception as exc:
+            return future, None, exc
+
+    def _reset_insert(self, instance):
+        """Forget the primary key of an insert that was rolled back"""
+        instance.pk = None
+        instance._state.adding = True
+
+    def _insert(self, items):
+        instances = [item[2][0] for item in items]
+        model = type(instances[0])
+        try:
+            with transaction.atomic(using=self.using):
+                bulk_insert(model, instances, using=self.using)
+        except Exception:
+            # Find the bad rows by inserting one at a time
+            for instance in instances:
+                self._reset_insert(instance)
+            return [self._attempt(item) for item in items]
+        return [(item[0], instance, None) for item, instance in zip(items, instances)]
+
+
+def bulk_insert(model, instances, using=None, batch_size=None):
+    """bulk_create the instances and send post_save for each, as save() would"""
+    using = using or router.db_for_write(model)
+    model.objects.using(using).bulk_create(instances, batch_size=batch_size)
+    for instance in instances:
+        post_save.send(sender=model, instance=instance, created=True,
+                       update_fields=None, raw=False, using=using)
+    return instances
+
+
+def _log_failure(future):
+    exc = future.exception()
+    if exc is not None:
+        logger.error('Coalesced write failed', exc_info=exc)
+
+
+_coalescer = None
+_coalescer_pid = None
+_coalescer_lock = threading.Lock()
+
+
+def get_coalescer():
+    """Return this process's coalescer, starting it on first use"""
+    global _coalescer, _coalescer_pid
+    with _coalescer_lock:
+        # The worker thread does not survive a fork
+        if _coalescer is None or _coalescer_pid != os.getpid():
+            config = coalescer_settings()
+            _coalescer = WriteCoalescer(config['MAX_BATCH'], config['MAX_DELAY_MS'] / 1000)
+            _coalescer_pid = os.getpid()
+        return _coalescer
+
+
+def coalesced_write(fn, *args, **kwargs):
+    """Run a write through the coalescer and return a Future of its result.
+
+    Writes made inside a transaction, or with the coalescer disabled, run
+    immediately so that they keep the caller's transactional semantics; the
+    returned future is then already resolved.
+    """
+    if coalescer_settings()['ENABLED'] and not transaction.get_connection().in_atomic_block:
+        return get_coalescer().submit(fn, *args, **kwargs)
+    future = Future()
+    future.set_result(fn(*args, **kwargs))
+    return future
+
+
+def coalesced_insert(instance):
+    """Insert a model instance through the coalescer; see coalesced_write()"""
+    if coalescer_settings()['ENABLED'] and not transaction.get_connection().in_atomic_block:
+        return get_coalescer().submit_insert(instance)
+    instance.save()
+    future = Future()
+    future.set_result(instance)
+    return future
+
+
+def wait(future):
+    """Block until a coalesced write is committed, re-raising its error"""
+    return future.result(timeout=coalescer_settings()['WAIT_TIMEOUT'])
+
+
+@atexit.register
+def _stop_coalescer():
+    if _coalescer is not None and _coalescer_pid == os.getpid():
+        _coalescer.stop()
@@ -0,0 +1,164 @@
+"""Idempotency keys for POST requests.
+
+A client that may retry a POST sends an ``Idempotency-Key`` header. The
+first request with a key runs normally and its response is stored, compressed,
+for ``IDEMPOTENCY_TTL`` seconds; retries with the same key get the stored
+response back (marked ``Idempotent-Replayed: true``) without running the view
+again. A retry that arrives while the first request is still running waits
+for it, up to ``IDEMPOTENCY_WAIT_SECONDS``. Keys are scoped to the user of the
+request's JWT and are ignored on unauthenticated requests.
+"""
+import hashlib
+import time
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .models import IdempotencyRecord
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+# Bodies larger than this (e.g. file uploads) are identified by their length
+# only, so that they are not read into memory here
+MAX_HASHED_BODY = 1024 * 1024
+# Headers added again by the outer middleware when a response is replayed
+SKIPPED_HEADERS = {'content-length', 'server-timing', 'x-profile-id'}
+
+
+def request_user_id(request):
+    """User id from the request's JWT without a database query, or None"""
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw = auth.get_raw_token(header) if header else None
+    if raw is None:
+        return None
+    try:
+        return auth.get_validated_token(raw)[jwt_settings.USER_ID_CLAIM]
+    except (InvalidToken, TokenError, KeyError):
+        return None
+
+
+def request_hash(request):
+    digest = hashlib.sha256(f'{request.method} {request.get_full_path()}\n'.encode())
+    length = int(request.META.get('CONTENT_LENGTH') or 0)
+    if length <= MAX_HASHED_BODY:
+        digest.update(request.body)
+    else:
+        digest.update(str(length).encode())
+    return digest.hexdigest()
+
+
+def replay(record):
+    response = HttpResponse(zlib.decompress(bytes(record.body)), status=record.status_code)
+    for name, value in record.headers.items():
+        response[name] = value
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+class IdempotencyMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        key = request.META.get(HEADER)
+        if request.method != 'POST' or not key:
+            return self.get_response(request)
+        if len(key) > MAX_KEY_LENGTH:
+            return JsonResponse(
+                {'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'},
+                status=400
+            )
+        user_id = request_user_id(request)
+        if user_id is None:
+            return self.get_response(request)
+
+        fingerprint = request_hash(request)
+        while True:
+            try:
+                record = self.claim(user_id, key, fingerprint)
+            except IntegrityError:
+                # E.g. the token's user no longer exists
+                return self.get_response(request)
+            if record is None:
+                break
+            response = self.existing(record, fingerprint)
+            if response is not None:
+                return response
+            # The request holding the key failed and released it; run this one
+
+        try:
+            response = self.get_response(request)
+        except Exception:
+            self.release(user_id, key)
+            raise
+        if response.status_code >= 500 or response.streaming:
+            # Let a retry run the request again
+            self.release(user_id, key)
+            return response
+
+        IdempotencyRecord.objects.filter(user_id=user_id, key=key).update(
+            status_code=response.status_code,
+            headers={
+                name: value for name, value in response.items()
+                if name.lower() not in SKIPPED_HEADERS
+            },
+            body=zlib.compress(response.content),
+        )
+        return response
+
+    def claim(self, user_id, key, fingerprint):
+        """Record the key as in flight; return the existing record if it is taken"""
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=getattr(settings, 'IDEMPOTENCY_TTL', 86400))
+        # In-flight records older than this belong to a worker that died
+        abandoned = now - timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 60))
+        for _ in range(3):
+            try:
+                with transaction.atomic():
+                    IdempotencyRecord.objects.create(
+                        user_id=user_id, key=key, request_hash=fingerprint, expires_at=expires_at
+                    )
+                return None
+            except IntegrityError:
+                record = IdempotencyRecord.objects.filter(user_id=user_id, key=key).first()
+            if record is None:
+                continue  # Released in the meantime
+            if record.expires_at <= now or (record.status_code is None and record.created_at <= abandoned):
+                IdempotencyRecord.objects.filter(pk=record.pk).delete()
+                continue
+            return record
+        raise IntegrityError(f'Could not claim idempotency key {key!r}')
+
+    def existing(self, record, fingerprint):
+        """Response for a request whose key is taken, or None if it was released"""
+        if record.request_hash != fingerprint:
+            return JsonResponse(
+                {'error': 'Idempotency-Key was already used for a different request'},
+                status=422
+            )
+        # Wait for the request that holds the key to finish
+        deadline = time.monotonic() + getattr(settings, 'IDEMPOTENCY_WAIT_SECONDS', 10)
+        delay = 0.01
+        while record is not None and record.status_code is None:
+            if time.monotonic() >= deadline:
+                response = JsonResponse(
+                    {'error': 'A request with this Idempotency-Key is still in progress'},
+                    status=409
+                )
+                response['Retry-After'] = '1'
+                return response
+            time.sleep(delay)
+            delay = min(delay * 2, 0.2)
+            record = IdempotencyRecord.objects.filter(pk=record.pk).first()
+        return replay(record) if record is not None else None
+
+    def release(self, user_id, key):
+        IdempotencyRecord.objects.filter(user_id=user_id, key=key, status_code__isnull=True).delete()
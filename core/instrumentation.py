@@ -0,0 +1,109 @@
+"""Per-request SQL and serializer instrumentation"""
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+
+# Metrics of the request being served by the current thread / task
+current_metrics = ContextVar('current_metrics', default=None)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*(?:%s|NULL|DEFAULT)(?:\s*,\s*(?:%s|NULL|DEFAULT))*\s*\)', re.IGNORECASE)
+_REPEATED_LISTS = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+_WHITESPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """Normalize a statement so that queries differing only in values compare equal"""
+    sql = _STRING_LITERAL.sub('%s', sql)
+    sql = _NUMBER_LITERAL.sub('%s', sql)
+    # IN lists of any length share one fingerprint, and so do multi-row
+    # VALUES lists of any number of rows
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    sql = _REPEATED_LISTS.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql.replace('%s', '?')).strip()
+
+
+class RequestMetrics:
+    """Query and serializer timings collected while serving one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serialize_time = 0.0
+        self.statements = Counter()
+        self.statement_time = Counter()
+        self._serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Connection execute wrapper"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.sql_time += elapsed
+            self.statements[sql] += 1
+            self.statement_time[sql] += elapsed
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def fingerprints(self):
+        """Return [(fingerprint, count, seconds)] grouped by normalized statement"""
+        counts = Counter()
+        times = Counter()
+        for sql, count in self.statements.items():
+            key = fingerprint(sql)
+            counts[key] += count
+            times[key] += self.statement_time[sql]
+        return [(key, count, times[key]) for key, count in counts.most_common()]
+
+    @property
+    def duplicates(self):
+        """Number of queries repeating a statement pattern already run in this request"""
+        counts = Counter()
+        for sql, count in self.statements.items():
+            counts[fingerprint(sql)] += count
+        return sum(count - 1 for count in counts.values())
+
+    def server_timing(self):
+        """Value of the Server-Timing header"""
+        return ', '.join([
+            f'sql;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries"',
+            f'sql-dup;desc="{self.duplicates} repeated"',
+            f'serialize;dur={self.serialize_time * 1000:.1f}',
+            f'total;dur={self.elapsed * 1000:.1f}',
+        ])
+
+
+def install_serializer_timing():
+    """Time DRF serializer ``.data`` evaluation into the current request's metrics"""
+    from rest_framework.serializers import BaseSerializer
+
+    original = BaseSerializer.data
+    if getattr(original.fget, 'instrumented', False):
+        return
+
+    def data(self):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return original.fget(self)
+        # Only the outermost serializer is timed; nested .data calls are part of it
+        metrics._serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return original.fget(self)
+        finally:
+            metrics._serializer_depth -= 1
+            if not metrics._serializer_depth:
+                metrics.serialize_time += time.perf_counter() - start
+
+    data.instrumented = True
+    BaseSerializer.data = property(data)
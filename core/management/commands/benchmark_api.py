@@ -0,0 +1,273 @@
+import json
+import platform
+import secrets
+import time
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test import Client, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.benchmark import SCENARIOS, measure, named_routes, peak_memory, scenario_path, summarize
+from core.profiling import list_profiles
+from groups.models import GroupDeletion, GroupMembership
+from notifications.models import Notification
+from sync.models import ChangeLog
+from tasks.models import CalendarFeed, GroupTaskStats, Task, TaskRecurrence, TaskSwap
+from webhooks.models import WebhookEndpoint
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every API route in-process and report latency, throughput and SQL usage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50,
+                            help='Measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=5,
+                            help='Unmeasured requests per endpoint before measuring')
+        parser.add_argument('--user',
+                            help='Email of the user to benchmark as (defaults to the creator '
+                                 'of the group with the most tasks)')
+        parser.add_argument('--password', default='password123',
+                            help='Password of the benchmark user, used by the login scenario')
+        parser.add_argument('--endpoint', action='append', default=[],
+                            help='Only run this route name (repeatable)')
+        parser.add_argument('--include-writes', action='store_true',
+                            help='Also run write endpoints; each request is rolled back')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--baseline', help='JSON report of a previous run to compare against')
+        parser.add_argument('--strict', action='store_true',
+                            help='Fail when a named route has no benchmark scenario')
+        parser.add_argument('--threshold', type=float, default=20.0,
+                            help='Fail when p95 latency grows by more than this many percent '
+                                 'over the baseline, or when the query count grows')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as f:
+                baseline = json.load(f)
+
+        routes = named_routes()
+        covered = {scenario['name'] for scenario in SCENARIOS}
+        uncovered = sorted(set(routes) - covered)
+        if uncovered and options['strict']:
+            raise CommandError(f"No benchmark scenario for route(s): {', '.join(uncovered)}")
+        for name in uncovered:
+            self.stdout.write(self.style.WARNING(f'No benchmark scenario for route "{name}"'))
+        ctx = self.build_context(options)
+
+        selected = [
+            scenario for scenario in SCENARIOS
+            if not options['endpoint'] or scenario['name'] in options['endpoint']
+        ]
+        unknown = set(options['endpoint']) - covered
+        if unknown:
+            raise CommandError(f"Unknown endpoint(s): {', '.join(sorted(unknown))}")
+
+        results = {}
+        skipped = {}
+        # Repeated logins would otherwise be measured as 429 responses. Jobs
+        # (e.g. notification fan-out) run inline, inside the measured request,
+        # even for writes that are rolled back.
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver'], RATE_LIMIT_ENABLED=False,
+                                   JOB_RUN_INLINE=True, METRICS_TOKEN=ctx['metrics_token']):
+                for scenario in selected:
+                    missing = [key for key in scenario['requires'] if ctx.get(key) is None]
+                    if scenario['write'] and not options['include_writes']:
+                        skipped[scenario['name']] = 'write endpoint (use --include-writes)'
+                    elif missing:
+                        skipped[scenario['name']] = f"dataset has no {', '.join(missing)}"
+                    else:
+                        results[scenario['name']] = self.run_scenario(scenario, ctx, options)
+                        self.report_line(scenario['name'], results[scenario['name']])
+        finally:
+            # Leave the dataset as it was found
+            if ctx['created_feed'] is not None:
+                ctx['created_feed'].delete()
+
+        for name, reason in skipped.items():
+            self.stdout.write(f'{name:32} skipped: {reason}')
+
+        report = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'user': ctx['user'].email,
+                'group_id': ctx['group'].id,
+                'group_tasks': ctx['group_tasks'],
+            },
+            'endpoints': results,
+            'skipped': skipped,
+            'uncovered': uncovered,
+        }
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+        if baseline is not None:
+            regressions = self.compare(baseline, results, options['threshold'])
+            if regressions:
+                for line in regressions:
+                    self.stderr.write(line)
+                raise CommandError(f'{len(regressions)} regression(s) against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS('No regressions against baseline'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Benchmarked {len(results)} endpoints'))
+
+    def build_context(self, options):
+        """Pick the benchmark user and the dataset objects the scenarios need"""
+        if options['user']:
+            try:
+                user = User.objects.get(email=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist")
+            totals = GroupTaskStats.objects.filter(
+                assignee__isnull=True, group__creator=user
+            ).select_related('group').order_by('-total').first()
+        else:
+            totals = GroupTaskStats.objects.filter(
+                assignee__isnull=True
+            ).select_related('group__creator').order_by('-total').first()
+            user = totals.group.creator if totals else None
+        if totals is None:
+            raise CommandError(
+                'No group with tasks found for the benchmark user; '
+                'generate one with generate_load_data first'
+            )
+        group = totals.group
+
+        members = GroupMembership.objects.filter(group=group).exclude(user=user).select_related('user')
+        member = next((m.user for m in members.order_by('id')[:1]), None)
+        outsiders = list(
+            User.objects.exclude(user_groups=group).order_by('id').values_list('user_id', flat=True)[:50]
+        )
+        outsider = User.objects.filter(user_id=outsiders[0]).first() if outsiders else None
+        tasks = Task.objects.filter(group=group).select_related('assigned_to_user')
+        own_task = tasks.filter(assigned_to_user=user).order_by('id').first()
+        target_task = None
+        if own_task is not None:
+            target_task = tasks.filter(
+                assigned_to_user__isnull=False
+            ).exclude(assigned_to_user=user).order_by('id').first()
+        swaps = TaskSwap.objects.filter(requester_task__group=group)
+        # Token of a client that is 100 changes behind
+        behind = ChangeLog.objects.filter(user=user).order_by('-id').values_list('id', flat=True)
+        sync_token = next(iter(behind[100:101]), 0)
+        refresh = RefreshToken.for_user(user)
+        # The calendar feed scenarios need a feed; one created for the run is
+        # deleted at the end of it
+        feed, feed_created = CalendarFeed.objects.get_or_create(
+            user=user, defaults={'token': CalendarFeed.new_token()}
+        )
+
+        return {
+            'user': user,
+            'password': options['password'],
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+            # Scrapes of /metrics send the token the run configures
+            'metrics_token': secrets.token_urlsafe(),
+            'group': group,
+            'group_tasks': totals.total,
+            'member': member,
+            'outsider': outsider,
+            # Users added at once by the bulk add-members scenario
+            'outsiders': outsiders or None,
+            'task': tasks.filter(Q(assigned_to_user=user) | Q(assigned_to_group=group)).order_by('id').first(),
+            'own_task': own_task,
+            'target_task': target_task,
+            'admin_swap': swaps.filter(status='pending_admin').order_by('id').first(),
+            'user_swap': swaps.filter(status='pending_user', target_user=user).order_by('id').first(),
+            'profile': next((profile['name'] for profile in list_profiles()), None),
+            'notification': Notification.objects.filter(recipient=user, is_read=False).order_by('id').first(),
+            'sync_token': sync_token,
+            'now': timezone.now(),
+            'feed_token': feed.token,
+            'created_feed': feed if feed_created else None,
+            'recurrence': TaskRecurrence.objects.filter(group=group).order_by('id').first(),
+            'webhook': WebhookEndpoint.objects.filter(group=group).order_by('id').first(),
+            'deletion': GroupDeletion.objects.filter(requested_by=user).order_by('-id').first(),
+        }
+
+    def run_scenario(self, scenario, ctx, options):
+        headers = scenario['headers'](ctx)
+        if scenario['auth']:
+            headers['HTTP_AUTHORIZATION'] = f"Bearer {ctx['access']}"
+        # Server errors are recorded as 500 responses instead of aborting the run
+        client = Client(raise_request_exception=False, **headers)
+        path = scenario_path(scenario, ctx)
+
+        def run(method, *args):
+            if not scenario['write']:
+                return method(client, scenario, path, ctx, *args)
+            # Roll back writes so every iteration sees the same dataset
+            with transaction.atomic():
+                result = method(client, scenario, path, ctx, *args)
+                transaction.set_rollback(True)
+            return result
+
+        for i in range(options['warmup']):
+            run(measure, -1 - i)
+
+        latencies, query_counts, query_times, statuses = [], [], [], []
+        started = time.perf_counter()
+        for i in range(options['iterations']):
+            elapsed, counter, status_code = run(measure, i)
+            latencies.append(elapsed)
+            query_counts.append(counter.count)
+            query_times.append(counter.time)
+            statuses.append(status_code)
+        wall_time = time.perf_counter() - started
+
+        result = summarize(latencies, query_counts, query_times, statuses, wall_time)
+        result['method'] = scenario['method']
+        result['path'] = path
+        result['peak_memory_kb'] = round(run(peak_memory, options['iterations']) / 1024, 1)
+        return result
+
+    def report_line(self, name, result):
+        line = (
+            f"{name:32} p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms  "
+            f"p99 {result['p99_ms']:8.2f}ms  {result['throughput_rps']:8.1f} req/s  "
+            f"{result['queries']:4d} queries  {result['peak_memory_kb']:9.1f} KiB  "
+            f"status {','.join(map(str, result['statuses']))}"
+        )
+        if any(code >= 400 for code in result['statuses']):
+            self.stdout.write(self.style.WARNING(line))
+        else:
+            self.stdout.write(line)
+
+    def compare(self, baseline, results, threshold):
+        """Return a description of every endpoint that got slower or chattier"""
+        regressions = []
+        previous = baseline.get('endpoints', {})
+        for name, result in results.items():
+            before = previous.get(name)
+            if before is None:
+                continue
+            limit = before['p95_ms'] * (1 + threshold / 100)
+            if result['p95_ms'] > limit:
+                regressions.append(
+                    f"{name}: p95 {result['p95_ms']:.2f}ms > {before['p95_ms']:.2f}ms "
+                    f"+{threshold:g}%"
+                )
+            if result['queries'] > before['queries']:
+                regressions.append(
+                    f"{name}: {result['queries']} queries, baseline {before['queries']}"
+                )
+        return regressions
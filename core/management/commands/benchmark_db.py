@@ -0,0 +1,166 @@
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.models import Count
+
+from tasks.models import Task
+
+# The SQLite setup Django uses without any tuning: rollback journal, deferred
+# transactions, the sqlite3 module's 5 second busy timeout, and a new
+# connection for every request
+DEFAULT_PROFILE = {
+    'CONN_MAX_AGE': 0,
+    'OPTIONS': {'init_command': 'PRAGMA journal_mode=DELETE;', 'timeout': 5},
+}
+
+
+class Command(BaseCommand):
+    help = ('Compare concurrent read/write throughput of the configured SQLite profile '
+            'against the untuned default, on a copy of the database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10.0,
+                            help='Seconds to run each profile')
+        parser.add_argument('--write-ratio', type=float, default=0.2,
+                            help='Share of operations that are read-then-write transactions')
+        parser.add_argument('--profile', choices=['default', 'tuned', 'both'], default='both')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        config = settings.DATABASES['default']
+        if config['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('benchmark_db only supports SQLite databases')
+
+        task_ids = list(Task.objects.values_list('id', flat=True)[:10000])
+        group_ids = list(Task.objects.order_by().values_list('group_id', flat=True).distinct()[:1000])
+        if not task_ids:
+            raise CommandError('The database has no tasks; generate data with generate_load_data first')
+        connections['default'].close()
+
+        profiles = ['default', 'tuned'] if options['profile'] == 'both' else [options['profile']]
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for name in profiles:
+                alias = f'benchmark_{name}'
+                path = os.path.join(directory, f'{name}.sqlite3')
+                self.copy_database(config['NAME'], path)
+                profile_config = dict(config, NAME=path)
+                if name == 'default':
+                    profile_config.update(DEFAULT_PROFILE)
+                connections.settings[alias] = connections.configure_settings(
+                    {'default': dict(config), alias: profile_config}
+                )[alias]
+                try:
+                    results[name] = self.run_profile(alias, task_ids, group_ids, options)
+                finally:
+                    connections[alias].close()
+                    del connections.settings[alias]
+                self.report(name, results[name])
+
+        if len(results) == 2 and results['default']['ops_per_second']:
+            gain = results['tuned']['ops_per_second'] / results['default']['ops_per_second']
+            self.stdout.write(self.style.SUCCESS(f'Tuned profile throughput: {gain:.2f}x default'))
+
+    def copy_database(self, source, target):
+        """Consistent copy of the database, including content still in its WAL"""
+        # A URI like Django's, so the in-memory test database can be copied
+        src = sqlite3.connect(source, uri=True)
+        dst = sqlite3.connect(target)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+
+    def run_profile(self, alias, task_ids, group_ids, options):
+        reuse = connections.settings[alias]['CONN_MAX_AGE'] != 0
+        deadline = time.monotonic() + options['duration']
+        lock = threading.Lock()
+        stats = {'reads': [], 'writes': [], 'errors': 0}
+
+        def worker(seed):
+            rng = random.Random(seed)
+            connection = connections[alias]
+            reads, writes, errors = [], [], 0
+            try:
+                while time.monotonic() < deadline:
+                    write = rng.random() < options['write_ratio']
+                    start = time.perf_counter()
+                    try:
+                        if write:
+                            self.write_op(alias, rng.choice(task_ids))
+                        else:
+                            self.read_op(alias, rng.choice(group_ids))
+                    except OperationalError:
+                        errors += 1  # "database is locked"
+                    else:
+                        (writes if write else reads).append(time.perf_counter() - start)
+                    if not reuse:
+                        # Emulate CONN_MAX_AGE=0: one connection per request
+                        connection.close()
+            finally:
+                connection.close()
+            with lock:
+                stats['reads'].extend(reads)
+                stats['writes'].extend(writes)
+                stats['errors'] += errors
+
+        threads = [
+            threading.Thread(target=worker, args=(options['seed'] * 1000 + n,))
+            for n in range(options['threads'])
+        ]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+
+        completed = len(stats['reads']) + len(stats['writes'])
+        return {
+            'ops_per_second': completed / elapsed,
+            'reads': len(stats['reads']),
+            'writes': len(stats['writes']),
+            'errors': stats['errors'],
+            'read_p95_ms': self.p95(stats['reads']),
+            'write_p95_ms': self.p95(stats['writes']),
+        }
+
+    def read_op(self, alias, group_id):
+        """A task list page plus the per-status counts of a group"""
+        tasks = Task.objects.using(alias).filter(group_id=group_id)
+        list(tasks.order_by('-created_at')[:20])
+        list(tasks.order_by().values('status').annotate(n=Count('id')))
+
+    def write_op(self, alias, task_id):
+        """Read a task and update it in one transaction, like a PATCH request.
+
+        With deferred transactions two of these can both hold read locks and
+        then fail to upgrade them, which busy waiting cannot resolve.
+        """
+        with transaction.atomic(using=alias):
+            task = Task.objects.using(alias).only('id', 'status').get(id=task_id)
+            status = 'in_progress' if task.status == 'not_started' else 'not_started'
+            Task.objects.using(alias).filter(id=task_id).update(status=status)
+
+    def p95(self, samples):
+        if len(samples) < 2:
+            return None
+        return round(statistics.quantiles(samples, n=20)[18] * 1000, 2)
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"{name:8} {result['ops_per_second']:9.1f} ops/s  "
+            f"reads {result['reads']:7d} (p95 {result['read_p95_ms']} ms)  "
+            f"writes {result['writes']:6d} (p95 {result['write_p95_ms']} ms)  "
+            f"locked errors {result['errors']}"
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import IdempotencyRecord
+
+
+class Command(BaseCommand):
+    help = 'Delete stored idempotency responses past their expiry'
+
+    def handle(self, *args, **options):
+        count, _ = IdempotencyRecord.objects.filter(expires_at__lt=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} expired idempotency records'))
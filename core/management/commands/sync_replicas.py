@@ -0,0 +1,81 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Restarted(Exception):
+    """The primary changed during a step-wise copy, which starts it over"""
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database to the read replicas with the online backup API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', default=[],
+                            help='Replica alias to sync (repeatable, defaults to READ_REPLICAS)')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep syncing every this many seconds (default: sync once)')
+        parser.add_argument('--pages', type=int, default=1024,
+                            help='Pages copied per backup step; readers of the replica are '
+                                 'only blocked while a step is written')
+        parser.add_argument('--retries', type=int, default=3,
+                            help='Step-wise copies started over by writes to the primary before '
+                                 'copying in one step with the writers blocked')
+
+    def handle(self, *args, **options):
+        aliases = options['database'] or list(getattr(settings, 'READ_REPLICAS', []))
+        if not aliases:
+            raise CommandError('No replicas to sync; set READ_REPLICAS or pass --database')
+        if options['retries'] < 0:
+            raise CommandError('--retries must not be negative')
+        for alias in aliases:
+            config = settings.DATABASES.get(alias)
+            if config is None or config['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError(f'"{alias}" is not a configured SQLite database')
+
+        source = settings.DATABASES['default']['NAME']
+        while True:
+            for alias in aliases:
+                started = time.monotonic()
+                self.sync(source, settings.DATABASES[alias]['NAME'], options['pages'], options['retries'])
+                self.stdout.write(self.style.SUCCESS(
+                    f'Synced {alias} in {time.monotonic() - started:.2f}s'
+                ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def sync(self, source, target, pages, retries):
+        src = sqlite3.connect(source)
+        dst = sqlite3.connect(target, timeout=30)
+        try:
+            for attempt in range(retries):
+                try:
+                    src.backup(dst, pages=pages, progress=self.progress())
+                    return
+                except Restarted:
+                    self.stdout.write(f'Primary changed during the copy (attempt {attempt + 1})')
+            # A busy primary would restart every step-wise copy: block the
+            # writers (readers go on) and copy everything in a single step
+            lock = sqlite3.connect(source, timeout=30, isolation_level=None)
+            try:
+                lock.execute('BEGIN IMMEDIATE')
+                src.backup(dst, pages=-1)
+            finally:
+                lock.close()
+        finally:
+            dst.close()
+            src.close()
+
+    def progress(self):
+        """Backup callback that aborts the copy when SQLite starts it over"""
+        copied = -1
+
+        def callback(status, remaining, total):
+            nonlocal copied
+            if total - remaining <= copied:
+                raise Restarted
+            copied = total - remaining
+        return callback
@@ -0,0 +1,295 @@
+"""Process-local Prometheus metrics, merged across worker processes on scrape.
+
+Every process records into an in-memory registry guarded by a lock, which
+keeps recording to a few dictionary updates. Server processes (the WSGI and
+ASGI entry points call ``enable_export()``) periodically write the registry
+to their own file in ``METRICS_DIR``; ``/metrics`` sums the files of all
+processes, so counters and histograms cover every worker. Management
+commands, including benchmarks run through the test client, keep their
+samples to themselves. The files of processes that exited are folded into
+one archive file on scrape, so counters keep their totals and the directory
+holds one file per live process. Without ``METRICS_DIR`` only the serving
+process is reported.
+"""
+import atexit
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+FANOUT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# metrics-<pid>-<random>.json
+PROCESS_FILE = re.compile(r'^metrics-(?P<pid>\d+)-[0-9a-f]{8}\.json$')
+# Samples of exited processes
+ARCHIVE_FILE = 'metrics-archive.json'
+LOCK_FILE = 'metrics.lock'
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    'tasksphere_http_requests_total': (
+        'counter', 'HTTP requests by view, method and status', None),
+    'tasksphere_http_request_duration_seconds': (
+        'histogram', 'Request latency by view', LATENCY_BUCKETS),
+    'tasksphere_db_queries_per_request': (
+        'histogram', 'SQL queries issued per request by view', QUERY_BUCKETS),
+    'tasksphere_notification_fanout': (
+        'histogram', 'Notifications created per event', FANOUT_BUCKETS),
+    'tasksphere_cache_requests_total': (
+        'counter', 'Cache lookups by cache and result (hit or miss)', None),
+    'tasksphere_write_batch_size': (
+        'histogram', 'Writes committed per write coalescer transaction', BATCH_BUCKETS),
+    'tasksphere_rate_limited_total': (
+        'counter', 'Requests rejected by the rate limiter by view and bucket scope', None),
+}
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        # Whether this process writes its samples to METRICS_DIR
+        self.export = False
+        self._reset()
+
+    def _reset(self):
+        self.pid = os.getpid()
+        self.file_name = f'metrics-{self.pid}-{uuid.uuid4().hex[:8]}.json'
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.last_flush = time.monotonic()
+
+    def _check_fork(self):
+        # A forked worker must not report the parent's samples as its own
+        if os.getpid() != self.pid:
+            self._reset()
+
+    def inc(self, name, labels, amount=1):
+        with self.lock:
+            self._check_fork()
+            self.counters[(name, labels)] += amount
+        self._maybe_flush()
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        with self.lock:
+            self._check_fork()
+            key = (name, labels)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                # Per-bucket counts (plus +Inf), sum, count
+                histogram = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0, 0]
+            histogram[bisect_left(buckets, value)] += 1
+            histogram[-2] += value
+            histogram[-1] += 1
+        self._maybe_flush()
+
+    def snapshot(self):
+        with self.lock:
+            self._check_fork()
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), list(values)] for (name, labels), values in self.histograms.items()],
+            }
+
+    def _maybe_flush(self):
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        if time.monotonic() - self.last_flush >= interval:
+            self.flush(wait=False)
+
+    def flush(self, wait=True):
+        """Write this process's samples to its file in METRICS_DIR"""
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory or not self.export:
+            self.last_flush = time.monotonic()
+            return
+        if not self.flush_lock.acquire(blocking=wait):
+            return  # Another thread is already flushing
+        try:
+            self.last_flush = time.monotonic()
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, self.file_name)
+            tmp_path = f'{path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp_path, path)
+        finally:
+            self.flush_lock.release()
+
+
+registry = Registry()
+
+
+def enable_export():
+    """Write this process's samples to METRICS_DIR; call once in server processes"""
+    if not registry.export:
+        registry.export = True
+        # Keep the samples recorded since the last periodic flush of a stopping worker
+        atexit.register(registry.flush)
+
+
+def record_request(view, method, status_code, duration, queries=None):
+    registry.inc('tasksphere_http_requests_total',
+                 (('view', view), ('method', method), ('status', str(status_code))))
+    registry.observe('tasksphere_http_request_duration_seconds', (('view', view),), duration)
+    if queries is not None:
+        registry.observe('tasksphere_db_queries_per_request', (('view', view),), queries)
+
+
+def record_fanout(kind, recipients):
+    """Record how many notifications one event created"""
+    registry.observe('tasksphere_notification_fanout', (('kind', kind),), recipients)
+
+
+def record_cache(cache, hit):
+    """Record a lookup in one of the application caches"""
+    registry.inc('tasksphere_cache_requests_total',
+                 (('cache', cache), ('result', 'hit' if hit else 'miss')))
+
+
+def record_write_batch(size):
+    """Record the number of writes committed together by the write coalescer"""
+    registry.observe('tasksphere_write_batch_size', (), size)
+
+
+def record_rate_limited(view, scope):
+    """Record a request rejected by one of the view's token buckets"""
+    registry.inc('tasksphere_rate_limited_total', (('view', view), ('scope', scope)))
+
+
+def _pid_alive(pid):
+    if os.name != 'posix':
+        return True  # No cheap check; keep the file
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None  # Removed or being replaced concurrently
+
+
+def _archive_dead(directory):
+    """Fold the files of exited processes into the archive file and delete them"""
+    dead = [
+        entry.path for entry in os.scandir(directory)
+        if (match := PROCESS_FILE.match(entry.name)) and not _pid_alive(int(match['pid']))
+    ]
+    if not dead or fcntl is None:
+        return
+    with open(os.path.join(directory, LOCK_FILE), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        # Files another scrape archived meanwhile are gone and read as None
+        snapshots = [snapshot for snapshot in map(_read, dead) if snapshot is not None]
+        if not snapshots:
+            return
+        archive = os.path.join(directory, ARCHIVE_FILE)
+        previous = _read(archive)
+        merged = _merge(snapshots + ([previous] if previous else []))
+        tmp_path = f'{archive}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'counters': [[name, list(labels), value] for (name, labels), value in merged['counters'].items()],
+                'histograms': [[name, list(labels), values] for (name, labels), values in merged['histograms'].items()],
+            }, f)
+        os.replace(tmp_path, archive)
+        for path in dead:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _merge(snapshots):
+    counters = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, values in snapshot['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            if key in histograms:
+                histograms[key] = [a + b for a, b in zip(histograms[key], values)]
+            else:
+                histograms[key] = values
+    return {'counters': counters, 'histograms': histograms}
+
+
+def collect():
+    """Return samples of all processes as {'counters': {...}, 'histograms': {...}}"""
+    directory = getattr(settings, 'METRICS_DIR', None)
+    snapshots = []
+    if directory and registry.export:
+        registry.flush()
+        _archive_dead(directory)
+        for entry in os.scandir(directory):
+            if entry.name.endswith('.json'):
+                snapshot = _read(entry.path)
+                if snapshot is not None:
+                    snapshots.append(snapshot)
+    else:
+        snapshots.append(registry.snapshot())
+    return _merge(snapshots)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _number(value):
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def render():
+    """Render all samples in the Prometheus text exposition format"""
+    samples = collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        if kind == 'counter':
+            for (metric, labels), value in sorted(samples['counters'].items()):
+                if metric == name:
+                    lines.append(f'{name}{_labels(labels)} {_number(value)}')
+            continue
+        for (metric, labels), values in sorted(samples['histograms'].items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], values):
+                cumulative += count
+                le = bound if bound == '+Inf' else _number(bound)
+                lines.append(f'{name}_bucket{_labels(labels + (("le", le),))} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {_number(values[-2])}')
+            lines.append(f'{name}_count{_labels(labels)} {values[-1]}')
+    return '\n'.join(lines) + '\n'
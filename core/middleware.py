@@ -0,0 +1,91 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .instrumentation import RequestMetrics, current_metrics
+from .metrics import record_request
+
+slow_request_logger = logging.getLogger('task_sphere.slow_requests')
+
+# Statements included in a slow-request log entry, most frequent first
+SLOW_LOG_STATEMENTS = 10
+
+
+class QueryInstrumentationMiddleware:
+    """Count queries, SQL time and serializer time of every request.
+
+    The numbers are returned in a ``Server-Timing`` header, and requests slower
+    than ``SLOW_REQUEST_THRESHOLD_MS`` are written to the
+    ``task_sphere.slow_requests`` log with their normalized statements. The
+    collected metrics are kept on ``request.metrics``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', 500) / 1000
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        request.metrics = metrics
+        token = current_metrics.set(metrics)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+
+        # Queries run while a streaming response is consumed are not included
+        response['Server-Timing'] = metrics.server_timing()
+        if metrics.elapsed >= self.slow_threshold:
+            self.log_slow_request(request, response, metrics)
+        return response
+
+    def log_slow_request(self, request, response, metrics):
+        user = getattr(request, 'user', None)
+        match = request.resolver_match
+        entry = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'user_id': user.user_id if user is not None and user.is_authenticated else None,
+            'duration_ms': round(metrics.elapsed * 1000, 1),
+            'sql_ms': round(metrics.sql_time * 1000, 1),
+            'queries': metrics.queries,
+            'duplicate_queries': metrics.duplicates,
+            'serialize_ms': round(metrics.serialize_time * 1000, 1),
+            'statements': [
+                {'fingerprint': sql, 'count': count, 'ms': round(seconds * 1000, 1)}
+                for sql, count, seconds in metrics.fingerprints()[:SLOW_LOG_STATEMENTS]
+            ],
+        }
+        slow_request_logger.warning(json.dumps(entry))
+
+
+class MetricsMiddleware:
+    """Record request count, latency and query count per resolved URL name"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        metrics = getattr(request, 'metrics', None)
+        record_request(
+            match.view_name if match else 'unresolved',
+            request.method,
+            response.status_code,
+            duration,
+            metrics.queries if metrics is not None else None,
+        )
+        return response
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.db import models
+
+
+class IdempotencyRecord(models.Model):
+    """Outcome of a POST sent with an ``Idempotency-Key`` header.
+
+    A record without ``status_code`` belongs to a request still in flight.
+    Completed records hold the zlib-compressed response, which is replayed
+    to retries until ``expires_at``. See core.idempotency.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='idempotency_records'
+    )
+    key = models.CharField(max_length=255)
+    # Hash of the method, path and body the key was first used with
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    headers = models.JSONField(default=dict)
+    body = models.BinaryField(default=b'')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.key} ({self.status_code or 'in flight'})"
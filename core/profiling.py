@@ -0,0 +1,119 @@
+"""Opt-in cProfile capture of individual requests"""
+import cProfile
+import hmac
+import os
+import random
+import re
+import threading
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+
+# <UTC timestamp>_<url name>_<random>.prof
+PROFILE_NAME = re.compile(r'^(?P<stamp>\d{8}T\d{12})_(?P<view>[\w.-]+)_[0-9a-f]{8}\.prof$')
+
+# Held while a request is profiled. Python 3.12+ allows one active profiler
+# per process, so overlapping requests of a threaded server are not profiled.
+_profiling = threading.Lock()
+
+
+def profiles_dir():
+    return Path(getattr(settings, 'PROFILING_DIR', Path(settings.BASE_DIR) / 'profiles'))
+
+
+def list_profiles():
+    """Return metadata of the saved profiles, newest first"""
+    directory = profiles_dir()
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for entry in os.scandir(directory):
+        match = PROFILE_NAME.match(entry.name)
+        if not match or not entry.is_file():
+            continue
+        created_at = datetime.strptime(match['stamp'], '%Y%m%dT%H%M%S%f').replace(tzinfo=dt_timezone.utc)
+        profiles.append({
+            'name': entry.name,
+            'view': match['view'],
+            'size': entry.stat().st_size,
+            'created_at': created_at,
+        })
+    profiles.sort(key=lambda profile: profile['name'], reverse=True)
+    return profiles
+
+
+def profile_path(name):
+    """Path of a saved profile, or None if the name is not a profile in the ring"""
+    if not PROFILE_NAME.match(name):
+        return None
+    path = profiles_dir() / name
+    return path if path.is_file() else None
+
+
+def save_profile(profiler, view_name):
+    """Write a profile to the ring directory and drop the oldest beyond the limit"""
+    directory = profiles_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(dt_timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+    view = re.sub(r'[^\w.-]', '-', view_name or 'unresolved')
+    name = f'{stamp}_{view}_{uuid.uuid4().hex[:8]}.prof'
+    # Write under a temporary name so listings never see a partial file
+    tmp_path = directory / f'.{name}.tmp'
+    profiler.dump_stats(tmp_path)
+    os.replace(tmp_path, directory / name)
+
+    limit = getattr(settings, 'PROFILING_MAX_FILES', 50)
+    for stale in list_profiles()[limit:]:
+        try:
+            os.unlink(directory / stale['name'])
+        except FileNotFoundError:
+            pass  # Removed by a concurrent request
+    return name
+
+
+class ProfilingMiddleware:
+    """Profile a request with cProfile when asked to, or for a sample of requests.
+
+    A request is profiled when its ``X-Profile`` header matches
+    ``PROFILING_TOKEN``, or at random with probability
+    ``PROFILING_SAMPLE_RATE``. The pstats output is saved to ``PROFILING_DIR``,
+    which keeps at most ``PROFILING_MAX_FILES`` profiles, and its name is
+    returned in the ``X-Profile-Id`` response header. Requests arriving while
+    another request is being profiled are served without profiling.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.token = getattr(settings, 'PROFILING_TOKEN', None)
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+
+    def should_profile(self, request):
+        header = request.META.get(PROFILE_HEADER)
+        if header and self.token and hmac.compare_digest(header.encode(), self.token.encode()):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.should_profile(request) or not _profiling.acquire(blocking=False):
+            return self.get_response(request)
+
+        try:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiling tool is active
+                return self.get_response(request)
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        finally:
+            _profiling.release()
+        match = request.resolver_match
+        response['X-Profile-Id'] = save_profile(profiler, match.view_name if match else None)
+        return response
@@ -0,0 +1,163 @@
+"""Token-bucket rate limiting shared by all worker processes on a host.
+
+Buckets live in a memory-mapped file (``RATE_LIMIT_FILE``, on ``/dev/shm``
+where available) holding a fixed-size hash table, so every worker sees the
+same token counts and a check is a hash, a few slot reads and a write under
+an ``fcntl`` record lock, with no database access. ``RATE_LIMITS`` maps URL
+names to per-user, per-IP and per-route limits; other routes are not
+checked. Throttled requests get DRF's 429 response with ``Retry-After``.
+
+Without ``fcntl`` (Windows) buckets are kept per process.
+"""
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+# Slot layout: key hash (0 marks a free slot), tokens, last refill time
+SLOT = struct.Struct('=Qdd')
+# Slots probed for a key; a key lives in one of PROBES slots after its home
+PROBES = 8
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rate(rate):
+    """'10/minute' -> (10 requests, 60 seconds)"""
+    count, _, period = rate.partition('/')
+    return int(count), PERIODS[period.rstrip('s')]
+
+
+def default_path():
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(directory, 'task_sphere_ratelimit')
+
+
+class BucketTable:
+    """Fixed-size table of token buckets in a shared memory map"""
+
+    def __init__(self, path, slots):
+        self.path = path
+        self.slots = slots
+        self.size = slots * SLOT.size
+        # fcntl locks belong to the process, so threads also need this lock
+        self.thread_lock = threading.Lock()
+        self.pid = None
+        self.map = None
+        self.fd = None
+
+    def _open(self):
+        if self.map is not None and self.pid == os.getpid():
+            return
+        if fcntl is None or not self.path:
+            self.fd, self.map = None, mmap.mmap(-1, self.size)
+        else:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            if os.fstat(self.fd).st_size < self.size:
+                os.ftruncate(self.fd, self.size)
+            self.map = mmap.mmap(self.fd, self.size)
+        self.pid = os.getpid()
+
+    def take(self, key, capacity, period):
+        """Take a token from the key's bucket; return 0 or the seconds to wait"""
+        digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little')
+        digest = digest or 1
+        # Probe windows never wrap, so one byte range lock covers a window
+        home = digest % (self.slots - PROBES + 1)
+        start, length = home * SLOT.size, PROBES * SLOT.size
+        rate = capacity / period
+        with self.thread_lock:
+            self._open()
+            if self.fd is not None:
+                fcntl.lockf(self.fd, fcntl.LOCK_EX, length, start)
+            try:
+                now = time.time()
+                offset = self._find(digest, start)
+                stored, tokens, last = SLOT.unpack_from(self.map, offset)
+                if stored != digest:
+                    tokens, last = capacity, now
+                tokens = min(capacity, tokens + max(0.0, now - last) * rate)
+                wait = 0.0
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / rate
+                SLOT.pack_into(self.map, offset, digest, tokens, now)
+                return wait
+            finally:
+                if self.fd is not None:
+                    fcntl.lockf(self.fd, fcntl.LOCK_UN, length, start)
+
+    def _find(self, digest, start):
+        """Offset of the key's slot, a free slot, or the least recently used one"""
+        oldest, oldest_time = start, math.inf
+        for offset in range(start, start + PROBES * SLOT.size, SLOT.size):
+            stored, _, last = SLOT.unpack_from(self.map, offset)
+            if stored == digest or stored == 0:
+                return offset
+            if last < oldest_time:
+                oldest, oldest_time = offset, last
+        # An idle bucket refills to capacity, so evicting it loses nothing
+        return oldest
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_table():
+    global _table
+    with _table_lock:
+        if _table is None:
+            _table = BucketTable(
+                getattr(settings, 'RATE_LIMIT_FILE', None) or default_path(),
+                getattr(settings, 'RATE_LIMIT_SLOTS', 65536),
+            )
+        return _table
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Apply the ``RATE_LIMITS`` of the request's URL name"""
+
+    def allow_request(self, request, view):
+        self.wait_time = 0
+        match = request.resolver_match
+        limits = getattr(settings, 'RATE_LIMITS', {}).get(match.url_name if match else None)
+        if not limits or not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+            return True
+
+        user = request.user
+        identities = {
+            'user': user.pk if user is not None and user.is_authenticated else None,
+            'ip': self.get_ident(request),
+            'route': '*',
+        }
+        # Per-client buckets first, so a throttled client does not drain the
+        # route's shared bucket
+        for scope in ('user', 'ip', 'route'):
+            rate = limits.get(scope)
+            if rate is None or identities[scope] is None:
+                continue
+            capacity, period = parse_rate(rate)
+            wait = get_table().take(f'{match.url_name}:{scope}:{identities[scope]}', capacity, period)
+            if wait:
+                from .metrics import record_rate_limited
+                record_rate_limited(match.url_name, scope)
+                self.wait_time = wait
+                return False
+        return True
+
+    def wait(self):
+        return math.ceil(self.wait_time)
@@ -0,0 +1,113 @@
+"""Read replica routing.
+
+Reads go to the ``default`` database unless a view opts in with
+``ReplicaReadMixin`` (class views) or ``@replica_reads`` (function views), in
+which case safe requests read from one of the ``READ_REPLICAS`` aliases.
+After a user writes, their reads stay on ``default`` for
+``REPLICA_STICKY_SECONDS`` so they always see their own changes; the
+``ReplicaStickinessMiddleware`` records the writes in the cache.
+"""
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+# Alias reads are routed to in the current request, None for default
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def _sticky_key(user):
+    return f'replica-sticky:{user.pk}'
+
+
+def mark_sticky(user):
+    """Keep the user's reads on the primary while replicas catch up"""
+    cache.set(_sticky_key(user), True, getattr(settings, 'REPLICA_STICKY_SECONDS', 30))
+
+
+def read_from_primary(request):
+    """Serve the rest of a DRF request's reads from the primary, after it wrote.
+
+    The user's next reads stay on the primary too, as after a write request.
+    """
+    _read_alias.set(None)
+    request._request.replica_sticky = True
+
+
+def replica_for(request):
+    """Replica alias to serve a request's reads from, or None for the primary"""
+    replicas = getattr(settings, 'READ_REPLICAS', [])
+    if not replicas or request.method not in SAFE_METHODS:
+        return None
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated and cache.get(_sticky_key(user)):
+        return None
+    return random.choice(replicas)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas are copies of the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from sync_replicas
+        return db == 'default'
+
+
+class ReplicaReadMixin:
+    """Serve the safe requests of a DRF class view from a read replica"""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Runs after authentication, so stickiness can be checked per user
+        self._read_alias_token = _read_alias.set(replica_for(request))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_read_alias_token', None)
+        if token is not None:
+            _read_alias.reset(token)
+            self._read_alias_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+def replica_reads(view):
+    """Serve a DRF function view's safe requests from a read replica.
+
+    Apply below ``@api_view`` so that the request is already authenticated.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = _read_alias.set(replica_for(request))
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+    return wrapper
+
+
+class ReplicaStickinessMiddleware:
+    """Mark users who sent a write request as sticky to the primary"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        # Views can say whether an unsafe request wrote (see the batch view)
+        wrote = getattr(request, 'replica_sticky', request.method not in SAFE_METHODS)
+        if getattr(settings, 'READ_REPLICAS', []) and wrote:
+            # DRF authenticates inside the view and sets request.user then
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                mark_sticky(user)
+        return response
@@ -0,0 +1,451 @@
+import io
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import zlib
+from concurrent.futures import Future
+from datetime import timedelta
+from unittest import mock
+
+from django.apps import apps
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from groups.models import Group
+from tasks.models import Task
+from users.models import User
+from . import checks, coalescer, metrics, profiling, ratelimit, views
+from .idempotency import IdempotencyMiddleware, request_hash
+from .instrumentation import fingerprint
+from .management.commands.sync_replicas import Command as SyncReplicasCommand
+from .benchmark import named_routes
+from .models import IdempotencyRecord
+
+
+class FingerprintTests(SimpleTestCase):
+    def test_in_lists_of_any_length_match(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s)'),
+        )
+
+    def test_values_lists_of_any_length_match(self):
+        many = fingerprint('INSERT INTO "t" ("a", "b") VALUES (%s, %s), (%s, NULL), (%s, %s)')
+        self.assertEqual(many, 'INSERT INTO "t" ("a", "b") VALUES (...)')
+        self.assertEqual(many, fingerprint('INSERT INTO "t" ("a", "b") VALUES (%s, %s)'))
+
+    def test_literals_are_replaced(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE a = 'x' AND b = 12"),
+            'SELECT * FROM t WHERE a = ? AND b = ?',
+        )
+
+
+class ReplicaCacheCheckTests(SimpleTestCase):
+    LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+    def test_per_process_cache_with_replicas_fails(self):
+        with override_settings(READ_REPLICAS=['replica'], CACHES=self.LOCMEM):
+            self.assertEqual([error.id for error in checks.check_replica_cache(None)], ['core.E001'])
+
+    def test_per_process_cache_without_replicas_passes(self):
+        with override_settings(READ_REPLICAS=[], CACHES=self.LOCMEM):
+            self.assertEqual(checks.check_replica_cache(None), [])
+            self.assertEqual([warning.id for warning in checks.check_shared_cache(None)], ['core.W001'])
+
+
+class SyncReplicasTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.primary = os.path.join(directory.name, 'primary.sqlite3')
+        self.replica = os.path.join(directory.name, 'replica.sqlite3')
+        with sqlite3.connect(self.primary) as db:
+            db.execute('CREATE TABLE item (value TEXT)')
+            db.executemany('INSERT INTO item VALUES (?)', [('x' * 1000,)] * 200)
+
+    def count(self, path):
+        db = sqlite3.connect(path)
+        try:
+            return db.execute('SELECT COUNT(*) FROM item').fetchone()[0]
+        finally:
+            db.close()
+
+    def test_busy_primary_is_copied_in_one_step(self):
+        output = io.StringIO()
+        command = SyncReplicasCommand(stdout=output)
+        progress = command.progress
+        writer = sqlite3.connect(self.primary, isolation_level=None)
+        self.addCleanup(writer.close)
+
+        def busy():
+            # Every step is followed by a write, which starts the copy over
+            callback = progress()
+
+            def step(*args):
+                callback(*args)
+                writer.execute("INSERT INTO item VALUES ('y')")
+            return step
+
+        with mock.patch.object(command, 'progress', side_effect=busy) as attempts:
+            command.sync(self.primary, self.replica, pages=1, retries=2)
+        self.assertEqual(attempts.call_count, 2)
+        self.assertIn('attempt 2', output.getvalue())
+        self.assertEqual(self.count(self.replica), self.count(self.primary))
+
+    def test_quiet_primary_is_copied_in_steps(self):
+        SyncReplicasCommand().sync(self.primary, self.replica, pages=4, retries=1)
+        self.assertEqual(self.count(self.replica), 200)
+
+
+class CoalescerTests(SimpleTestCase):
+    def test_failed_write_is_logged_without_a_waiter(self):
+        future = Future()
+        future.add_done_callback(coalescer._log_failure)
+        with self.assertLogs('core.coalescer', 'ERROR'):
+            future.set_exception(ValueError('constraint failed'))
+
+
+class ProfilingMiddlewareTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(PROFILING_DIR=directory.name, PROFILING_SAMPLE_RATE=1.0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.middleware = profiling.ProfilingMiddleware(lambda request: HttpResponse('ok'))
+
+    def test_sampled_request_is_profiled(self):
+        response = self.middleware(RequestFactory().get('/'))
+        self.assertIn('X-Profile-Id', response)
+
+    @override_settings(PROFILING_SAMPLE_RATE=0.0, PROFILING_TOKEN='s3cret')
+    def test_token_header(self):
+        middleware = profiling.ProfilingMiddleware(lambda request: HttpResponse('ok'))
+        for header, profiled in (('s3cret', True), ('wrong', False), ('s\u00e9cret', False)):
+            with self.subTest(header=header):
+                response = middleware(RequestFactory().get('/', HTTP_X_PROFILE=header))
+                self.assertEqual('X-Profile-Id' in response, profiled)
+
+    def test_overlapping_request_is_not_profiled(self):
+        with profiling._profiling:
+            response = self.middleware(RequestFactory().get('/'))
+        self.assertEqual(response.content, b'ok')
+        self.assertNotIn('X-Profile-Id', response)
+
+
+class MetricsExportTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = override_settings(METRICS_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def write(self, name, value):
+        with open(os.path.join(self.directory, name), 'w') as f:
+            json.dump({'counters': [['tasksphere_rate_limited_total', [], value]], 'histograms': []}, f)
+
+    def test_non_server_process_writes_no_file(self):
+        registry = metrics.Registry()
+        registry.inc('tasksphere_rate_limited_total', ())
+        registry.flush()
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_files_of_exited_processes_are_archived(self):
+        exited = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                                capture_output=True, text=True).stdout.strip()
+        self.write(f'metrics-{exited}-0000aaaa.json', 2)
+        self.write(f'metrics-{os.getpid()}-0000bbbb.json', 3)
+        with mock.patch.object(metrics.registry, 'export', True), \
+                mock.patch.object(metrics.registry, 'flush'):
+            for _ in range(2):
+                counters = metrics.collect()['counters']
+                self.assertEqual(counters[('tasksphere_rate_limited_total', ())], 5)
+        self.assertEqual(set(os.listdir(self.directory)), {
+            metrics.ARCHIVE_FILE, metrics.LOCK_FILE, f'metrics-{os.getpid()}-0000bbbb.json',
+        })
+
+
+class MetricsViewTests(SimpleTestCase):
+    def scrape(self, authorization=None):
+        headers = {'HTTP_AUTHORIZATION': authorization} if authorization is not None else {}
+        with mock.patch.object(views, 'render', return_value=''):
+            return views.metrics(RequestFactory().get('/metrics', **headers))
+
+    @override_settings(METRICS_TOKEN=None, DEBUG=False)
+    def test_closed_without_a_token(self):
+        self.assertEqual(self.scrape().status_code, 403)
+
+    @override_settings(METRICS_TOKEN=None, DEBUG=True)
+    def test_open_without_a_token_in_debug(self):
+        self.assertEqual(self.scrape().status_code, 200)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_token_is_required(self):
+        self.assertEqual(self.scrape('Bearer s3cret').status_code, 200)
+        self.assertEqual(self.scrape('Bearer wrong').status_code, 401)
+        self.assertEqual(self.scrape().status_code, 401)
+        self.assertEqual(self.scrape('Bearer s\u00e9cret').status_code, 401)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class BatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='admin@example.com', username='admin', password='x', first_name='Admin', last_name='Test'
+        )
+        cls.group = Group.objects.create(name='Chores', creator=cls.user)
+        cls.group.add_member(cls.user)
+
+    def batch(self, *items):
+        return self.client.post(
+            '/api/batch/', {'requests': list(items)}, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}'
+        )
+
+    def statuses(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [item['status'] for item in response.json()['responses']]
+
+    def test_failures_stay_in_their_own_entry(self):
+        response = self.batch(
+            {'path': f'/api/groups/{self.group.id}/'},
+            {'path': '/api/groups/999999/'},
+            {'method': 'TRACE', 'path': '/api/tasks/'},
+            {'path': '/api/unknown/'},
+            {'path': '/api/notifications/unread-count/'},
+        )
+        self.assertEqual(self.statuses(response), [200, 404, 400, 404, 200])
+        self.assertEqual(response.json()['responses'][0]['body']['name'], 'Chores')
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_at_most_max_requests(self):
+        item = {'path': '/api/notifications/unread-count/'}
+        self.assertEqual(self.statuses(self.batch(item, item)), [200, 200])
+        self.assertEqual(self.batch(item, item, item).status_code, 400)
+
+    def test_batches_cannot_be_nested(self):
+        response = self.batch({'method': 'POST', 'path': '/api/batch/', 'body': {'requests': []}})
+        self.assertEqual(self.statuses(response), [400])
+        self.assertEqual(response.json()['responses'][0]['body']['error'], 'Batches cannot be nested')
+
+    def test_streaming_endpoints_are_rejected(self):
+        response = self.batch(
+            {'path': f'/api/groups/{self.group.id}/export/'},
+            {'path': f'/api/groups/{self.group.id}/'},
+        )
+        self.assertEqual(self.statuses(response), [400, 200])
+        self.assertEqual(response.json()['responses'][0]['body']['error'],
+                         'Streaming endpoints cannot be batched')
+
+
+class BucketTableTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'buckets')
+        self.now = 1000.0
+        clock = mock.patch('core.ratelimit.time.time', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def test_burst_up_to_capacity(self):
+        table = ratelimit.BucketTable(self.path, 64)
+        self.assertEqual([table.take('k', 3, 60) for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(table.take('k', 3, 60), 20)
+
+    def test_refill(self):
+        table = ratelimit.BucketTable(self.path, 64)
+        for _ in range(2):
+            table.take('k', 2, 1)
+        self.assertAlmostEqual(table.take('k', 2, 1), 0.5)
+        self.now += 0.5
+        self.assertEqual(table.take('k', 2, 1), 0)
+        self.now += 10
+        # Refills stop at capacity
+        self.assertEqual([table.take('k', 2, 1) for _ in range(2)], [0, 0])
+        self.assertGreater(table.take('k', 2, 1), 0)
+
+    def test_shared_between_tables_of_one_file(self):
+        ratelimit.BucketTable(self.path, 64).take('k', 1, 60)
+        self.assertGreater(ratelimit.BucketTable(self.path, 64).take('k', 1, 60), 0)
+
+    def test_colliding_keys_keep_their_own_buckets(self):
+        # Every key has the same home slot in a table of one probe window
+        table = ratelimit.BucketTable(self.path, ratelimit.PROBES)
+        keys = [f'key-{index}' for index in range(ratelimit.PROBES)]
+        for key in keys:
+            self.assertEqual(table.take(key, 1, 60), 0)
+            self.now += 1
+        for key in keys:
+            self.assertGreater(table.take(key, 1, 60), 0)
+
+        # A new key evicts the least recently used bucket, which starts full again
+        self.now += 1
+        self.assertEqual(table.take('another', 1, 60), 0)
+        self.assertEqual(table.take(keys[0], 1, 60), 0)
+        self.assertGreater(table.take('another', 1, 60), 0)
+
+
+@override_settings(RATE_LIMIT_ENABLED=True, RATE_LIMITS={'user-search': {'user': '2/minute'}})
+class RateLimitTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='alice@example.com', username='alice', password='x', first_name='Alice', last_name='Test'
+        )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        table = ratelimit.BucketTable(os.path.join(directory.name, 'buckets'), 64)
+        patch = mock.patch.object(ratelimit, '_table', table)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_throttled_request_gets_429_with_retry_after(self):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+        for _ in range(2):
+            self.assertEqual(self.client.get('/api/auth/search/', {'q': 'al'}, **headers).status_code, 200)
+        response = self.client.get('/api/auth/search/', {'q': 'al'}, **headers)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn(int(response['Retry-After']), range(29, 31))
+        # Unlimited routes are not checked
+        self.assertEqual(self.client.get('/api/notifications/unread-count/', **headers).status_code, 200)
+
+
+class IdempotencyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='alice@example.com', username='alice', password='x', first_name='Alice', last_name='Test'
+        )
+        cls.token = str(RefreshToken.for_user(cls.user).access_token)
+
+    def setUp(self):
+        self.calls = 0
+        self.status = 201
+        self.middleware = IdempotencyMiddleware(self.view)
+
+    def view(self, request):
+        self.calls += 1
+        if self.status is None:
+            raise RuntimeError('view failed')
+        return HttpResponse(json.dumps({'call': self.calls}), status=self.status,
+                            content_type='application/json')
+
+    def request(self, body, key='retry-1'):
+        return RequestFactory().post(
+            '/api/tasks/groups/1/create/', body, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {self.token}', HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def post(self, body, key='retry-1'):
+        return self.middleware(self.request(body, key))
+
+    def test_retry_replays_the_stored_response(self):
+        first = self.post({'title': 'Bins'})
+        retry = self.post({'title': 'Bins'})
+        self.assertEqual(self.calls, 1)
+        self.assertEqual((retry.status_code, retry.content), (201, first.content))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertNotIn('Idempotent-Replayed', first)
+        # Another key is another request
+        self.post({'title': 'Bins'}, key='retry-2')
+        self.assertEqual(self.calls, 2)
+
+    def test_same_key_with_another_body_is_refused(self):
+        self.post({'title': 'Bins'})
+        self.assertEqual(self.post({'title': 'Dishes'}).status_code, 422)
+        self.assertEqual(self.calls, 1)
+
+    def test_duplicate_waits_for_the_request_in_flight(self):
+        request = self.request({'title': 'Bins'})
+        record = IdempotencyRecord.objects.create(
+            user=self.user, key='retry-1', request_hash=request_hash(request),
+            expires_at=timezone.now() + timedelta(days=1)
+        )
+
+        def first_request_finishes(delay):
+            IdempotencyRecord.objects.filter(pk=record.pk).update(
+                status_code=201, headers={'Content-Type': 'application/json'},
+                body=zlib.compress(b'{"call": 0}')
+            )
+
+        with mock.patch('core.idempotency.time.sleep', side_effect=first_request_finishes) as sleep:
+            response = self.middleware(request)
+        sleep.assert_called_once()
+        self.assertEqual(self.calls, 0)
+        self.assertEqual((response.status_code, response.content), (201, b'{"call": 0}'))
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0)
+    def test_duplicate_gives_up_waiting(self):
+        request = self.request({'title': 'Bins'})
+        IdempotencyRecord.objects.create(
+            user=self.user, key='retry-1', request_hash=request_hash(request),
+            expires_at=timezone.now() + timedelta(days=1)
+        )
+        response = self.middleware(request)
+        self.assertEqual((response.status_code, response['Retry-After']), (409, '1'))
+
+    def test_failed_attempt_releases_the_key(self):
+        self.status = None
+        with self.assertRaises(RuntimeError):
+            self.post({'title': 'Bins'})
+        self.status = 503
+        self.assertEqual(self.post({'title': 'Bins'}).status_code, 503)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+        self.status = 201
+        self.assertEqual(self.post({'title': 'Bins'}).status_code, 201)
+        self.assertEqual(self.calls, 3)
+        self.assertEqual(self.post({'title': 'Bins'})['Idempotent-Replayed'], 'true')
+
+
+class BenchmarkAPITests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('generate_load_data', users=6, groups=2, min_members=2, max_members=4,
+                     tasks_per_group=4, swaps=3, notifications_per_user=2, stdout=io.StringIO())
+
+    def dataset(self):
+        rows = {model._meta.label: list(model.objects.order_by('pk').values()) for model in apps.get_models()}
+        # Reads move the overdue cut-off of the task statistics to the current time
+        for row in rows['tasks.GroupTaskStats']:
+            del row['overdue'], row['overdue_as_of']
+        return rows
+
+    def test_strict_run_leaves_the_dataset_unchanged(self):
+        before = self.dataset()
+        output = io.StringIO()
+        call_command('benchmark_api', strict=True, iterations=1, warmup=0, stdout=output)
+        self.assertIn('Benchmarked', output.getvalue())
+        for name in named_routes():
+            self.assertIn(name, output.getvalue())
+        self.assertEqual(self.dataset(), before)
+
+
+class BenchmarkDBTests(TransactionTestCase):
+    def test_both_profiles_run_on_a_copy(self):
+        # Committed, so the copy made through another connection sees the rows
+        call_command('generate_load_data', users=6, groups=2, min_members=2, max_members=4,
+                     tasks_per_group=4, swaps=3, notifications_per_user=2, stdout=io.StringIO())
+        statuses = list(Task.objects.order_by('id').values_list('status', flat=True))
+        output = io.StringIO()
+        # The command adds a database alias per profile, for copies of this one
+        aliases = self.databases | {'benchmark_default', 'benchmark_tuned'}
+        with mock.patch.object(BenchmarkDBTests, 'databases', aliases):
+            call_command('benchmark_db', threads=2, duration=0.2, write_ratio=0.5, stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[:2]], ['default', 'tuned'])
+        self.assertIn('Tuned profile throughput', lines[2])
+        self.assertEqual(list(Task.objects.order_by('id').values_list('status', flat=True)), statuses)
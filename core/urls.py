@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('profiles/', views.profile_list, name='profile-list'),
+    path('profiles/<str:name>/', views.profile_download, name='profile-download'),
+]
@@ -0,0 +1,66 @@
+import hmac
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from .batch import batch_settings, is_read, run_batch
+from .metrics import render
+from .profiling import list_profiles, profile_path
+
+
+def metrics(request):
+    """Prometheus scrape endpoint; requires "Authorization: Bearer <METRICS_TOKEN>".
+
+    Without a token configured the endpoint is only served when DEBUG is on.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token:
+        if not settings.DEBUG:
+            return HttpResponse(status=403)
+    else:
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if not hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+            return HttpResponse(status=401)
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def profile_list(request):
+    """List saved request profiles, newest first"""
+    return Response(list_profiles())
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def profile_download(request, name):
+    """Download a saved profile (pstats format)"""
+    path = profile_path(name)
+    try:
+        profile = open(path, 'rb') if path else None
+    except FileNotFoundError:
+        profile = None  # Rotated out of the ring since the check
+    if profile is None:
+        return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    return FileResponse(profile, as_attachment=True, filename=name,
+                        content_type='application/octet-stream')
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def batch(request):
+    """Serve several API requests in one round trip"""
+    items = request.data.get('requests') if isinstance(request.data, dict) else None
+    if not isinstance(items, list) or not items:
+        return Response({'error': 'requests must be a non-empty list'},
+                       status=status.HTTP_400_BAD_REQUEST)
+    limit = batch_settings()['MAX_REQUESTS']
+    if len(items) > limit:
+        return Response({'error': f'A batch can hold at most {limit} requests'},
+                       status=status.HTTP_400_BAD_REQUEST)
+    # A batch of reads does not pin the user's reads to the primary
+    request._request.replica_sticky = not all(is_read(item) for item in items)
+    return Response({'responses': run_batch(request, items)})
@@ -1,10 +1,13 @@
 from django.contrib import admin
-from .models import Group, GroupMembership
+from django.db.models import Count
+from core.admin import LargeTableAdmin
+from .models import Group, GroupDeletion, GroupMembership
 
 
 class GroupMembershipInline(admin.TabularInline):
     model = GroupMembership
     extra = 0
+    autocomplete_fields = ['user', 'added_by']
     readonly_fields = ['joined_at']
 
 
@@ -13,16 +16,33 @@ class GroupAdmin(admin.ModelAdmin):
     list_display = ['name', 'creator', 'member_count', 'created_at']
     list_filter = ['created_at']
     search_fields = ['name', 'creator__user_id', 'creator__email']
+    list_select_related = ['creator']
+    autocomplete_fields = ['creator']
     readonly_fields = ['created_at', 'updated_at']
     inlines = [GroupMembershipInline]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(member_total=Count('members'))
+
     def member_count(self, obj):
-        return obj.members.count()
+        return obj.member_total
     member_count.short_description = 'Members'
+    member_count.admin_order_field = 'member_total'
 
 
 @admin.register(GroupMembership)
-class GroupMembershipAdmin(admin.ModelAdmin):
+class GroupMembershipAdmin(LargeTableAdmin):
     list_display = ['group', 'user', 'added_by', 'joined_at']
     list_filter = ['joined_at']
+    list_select_related = ['group', 'user', 'added_by']
+    autocomplete_fields = ['group', 'user', 'added_by']
     search_fields = ['group__name', 'user__user_id', 'user__email']
+
+
+@admin.register(GroupDeletion)
+class GroupDeletionAdmin(admin.ModelAdmin):
+    list_display = ['group_name', 'requested_by', 'status', 'step', 'purged', 'total', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['group_name', 'requested_by__user_id']
+    list_select_related = ['requested_by']
+    readonly_fields = ['group', 'created_at', 'updated_at', 'started_at', 'finished_at']
@@ -0,0 +1,153 @@
+"""Deleting groups without loading their dependents.
+
+Deleting a group through the ORM makes Django's collector load every task,
+swap, notification and membership of the group into memory and delete them
+in one transaction. Instead, ``delete_group`` only marks the group deleted,
+which hides it from ``Group.objects`` and the task and swap endpoints, and
+records a ``GroupDeletion``. ``purge_group`` then removes the dependent rows
+with raw bulk deletes of ``GROUP_PURGE_BATCH_SIZE`` rows, one short
+transaction per batch, and deletes the group row last.
+
+Purges run on a background thread of the process that deleted the group
+(``GROUP_PURGE_IN_BACKGROUND``); ``python manage.py purge_deleted_groups``
+runs pending ones and resumes purges that failed or were interrupted.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Group, GroupDeletion
+from .signals import pre_purge
+
+logger = logging.getLogger(__name__)
+
+# (step, model, lookup of the group id) in deletion order: rows referencing
+# another model's rows are deleted before them
+PURGE_STEPS = [
+    ('notifications', 'notifications.Notification', 'related_swap__requester_task__group'),
+    ('notifications', 'notifications.Notification', 'related_swap__target_task__group'),
+    ('notifications', 'notifications.Notification', 'related_task__group'),
+    ('notifications', 'notifications.Notification', 'related_group'),
+    ('swaps', 'tasks.TaskSwap', 'requester_task__group'),
+    ('swaps', 'tasks.TaskSwap', 'target_task__group'),
+    ('visibility', 'tasks.TaskVisibility', 'group'),
+    ('stats', 'tasks.GroupTaskStats', 'group'),
+    ('tasks', 'tasks.Task', 'group'),
+    ('recurrences', 'tasks.TaskRecurrence', 'group'),
+    ('webhooks', 'webhooks.WebhookDelivery', 'endpoint__group'),
+    ('webhooks', 'webhooks.OutboxEvent', 'group'),
+    ('webhooks', 'webhooks.WebhookEndpoint', 'group'),
+    ('memberships', 'groups.GroupMembership', 'group'),
+]
+
+
+def purge_settings():
+    return {
+        'BATCH_SIZE': getattr(settings, 'GROUP_PURGE_BATCH_SIZE', 500),
+        'IN_BACKGROUND': getattr(settings, 'GROUP_PURGE_IN_BACKGROUND', True),
+    }
+
+
+def delete_group(group, user):
+    """Mark the group deleted and schedule the purge of its rows"""
+    with transaction.atomic():
+        group.deleted_at = timezone.now()
+        # post_save lets sync clients know the group is gone
+        group.save(update_fields=['deleted_at'])
+        deletion = GroupDeletion.objects.create(
+            group=group, group_name=group.name, requested_by=user
+        )
+        if purge_settings()['IN_BACKGROUND']:
+            transaction.on_commit(lambda: start_purge(deletion.pk))
+    return deletion
+
+
+def start_purge(deletion_id):
+    thread = threading.Thread(
+        target=_purge_in_thread, args=(deletion_id,),
+        name=f'group-purge-{deletion_id}', daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def _purge_in_thread(deletion_id):
+    try:
+        deletion = claim(deletion_id)
+        if deletion is not None:
+            purge_group(deletion)
+    finally:
+        connection.close()
+
+
+def claim(deletion_id, statuses=('pending',)):
+    """Mark a deletion running; None if it is not in one of ``statuses``"""
+    claimed = GroupDeletion.objects.filter(id=deletion_id, status__in=statuses).update(
+        status='running', started_at=timezone.now(), error=''
+    )
+    return GroupDeletion.objects.get(id=deletion_id) if claimed else None
+
+
+def claimable(stale_after=timedelta(minutes=10)):
+    """Deletions a worker should run: pending, failed, or running but idle"""
+    return GroupDeletion.objects.filter(
+        Q(status__in=['pending', 'failed']) |
+        Q(status='running', updated_at__lt=timezone.now() - stale_after)
+    ).order_by('created_at')
+
+
+def count_rows(group_id, using):
+    return sum(
+        apps.get_model(model_name)._base_manager.using(using)
+        .filter(**{lookup: group_id}).count()
+        for _, model_name, lookup in PURGE_STEPS
+    ) + 1
+
+
+def purge_group(deletion, batch_size=None):
+    """Delete the rows of a deleted group in batches, then the group.
+
+    Failures are logged and recorded on the deletion, which can be run again:
+    every batch is committed, so a new run continues where this one stopped.
+    """
+    batch_size = batch_size or purge_settings()['BATCH_SIZE']
+    using = router.db_for_write(Group)
+    deletions = GroupDeletion.objects.filter(pk=deletion.pk)
+    try:
+        if deletion.total is None:
+            # Rows matching several lookups are counted more than once, so
+            # this is an upper bound
+            deletion.total = count_rows(deletion.group_id, using)
+            deletions.update(total=deletion.total)
+
+        for step, model_name, lookup in PURGE_STEPS:
+            model = apps.get_model(model_name)
+            rows = model._base_manager.using(using).filter(**{lookup: deletion.group_id})
+            while True:
+                with transaction.atomic(using=using):
+                    ids = list(rows.order_by().values_list('pk', flat=True)[:batch_size])
+                    if not ids:
+                        break
+                    pre_purge.send(sender=model, ids=ids)
+                    count = model._base_manager.using(using).filter(pk__in=ids)._raw_delete(using)
+                    deletions.update(
+                        step=step, purged=F('purged') + count, updated_at=timezone.now()
+                    )
+
+        with transaction.atomic(using=using):
+            Group.all_objects.using(using).filter(pk=deletion.group_id)._raw_delete(using)
+            deletions.update(
+                status='completed', step='', purged=F('purged') + 1,
+                updated_at=timezone.now(), finished_at=timezone.now()
+            )
+    except Exception as exc:
+        logger.exception('Purge of group %s failed', deletion.group_id)
+        deletions.update(status='failed', error=str(exc), updated_at=timezone.now())
+    deletion.refresh_from_db()
+    return deletion
@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from groups.deletion import claim, claimable, purge_group
+
+
+class Command(BaseCommand):
+    help = 'Purge the rows of deleted groups, resuming failed or interrupted purges'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Rows deleted per transaction (default GROUP_PURGE_BATCH_SIZE)')
+        parser.add_argument('--stale-minutes', type=int, default=10,
+                            help='Take over running purges idle for this many minutes')
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(minutes=options['stale_minutes'])
+        completed = failed = 0
+        for deletion_id in list(claimable(stale_after).values_list('id', flat=True)):
+            deletion = claim(deletion_id, statuses=('pending', 'failed', 'running'))
+            if deletion is None:
+                continue
+            deletion = purge_group(deletion, options['batch_size'])
+            if deletion.status == 'completed':
+                completed += 1
+                self.stdout.write(f'{deletion.group_name}: purged {deletion.purged} rows')
+            else:
+                failed += 1
+                self.stderr.write(f'{deletion.group_name}: {deletion.error}')
+
+        self.stdout.write(self.style.SUCCESS(f'Purged {completed} groups, {failed} failed'))
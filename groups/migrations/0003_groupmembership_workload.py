@@ -0,0 +1,53 @@
+# Generated by Django 5.2 on 2026-10-19 14:49
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, IntegerField, Q, Sum, Value, When
+
+
+def populate_workloads(apps, schema_editor):
+    GroupMembership = apps.get_model('groups', 'GroupMembership')
+    Task = apps.get_model('tasks', 'Task')
+    priority_weight = Case(
+        When(priority='low', then=Value(1)),
+        When(priority='medium', then=Value(2)),
+        When(priority='high', then=Value(3)),
+        When(priority='urgent', then=Value(5)),
+        default=Value(0),
+        output_field=IntegerField()
+    )
+    deadline_weight = Case(
+        When(deadline__isnull=False, then=Value(1)),
+        default=Value(0),
+        output_field=IntegerField()
+    )
+    workloads = (
+        Task.objects.filter(status__in=['not_started', 'in_progress'], assigned_to_user__isnull=False)
+        .order_by()
+        .values_list('group', 'assigned_to_user')
+        .annotate(workload=Sum(priority_weight + deadline_weight))
+    )
+    for group_id, user_id, workload in workloads:
+        GroupMembership.objects.filter(group_id=group_id, user_id=user_id).update(workload=workload)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0002_initial'),
+        ('tasks', '0004_group_task_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupmembership',
+            name='workload',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='groupmembership',
+            index=models.Index(fields=['group', 'workload'], name='groups_grou_group_i_48f6b0_idx'),
+        ),
+        migrations.RunPython(populate_workloads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-19 15:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0004_group_deletion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='groupmembership',
+            index=models.Index(fields=['group', 'joined_at'], name='groups_grou_group_i_5429ab_idx'),
+        ),
+    ]
@@ -1,7 +1,14 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 
 
+class ActiveGroupManager(models.Manager):
+    """Groups that have not been deleted"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Group(models.Model):
     """Group model with creator-admin relationship"""
     name = models.CharField(max_length=100)
@@ -21,6 +28,13 @@ class Group(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Set when the group is deleted; its rows are then purged in the
+    # background (see groups.deletion) and the group itself removed last
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ActiveGroupManager()
+    all_objects = models.Manager()
+
     class Meta:
         ordering = ['name']
 
@@ -40,10 +54,49 @@ class Group(models.Model):
         )
         return membership, created
 
+    def add_members(self, users, added_by=None):
+        """Add several members with one insert; return the new memberships.
+
+        Users who are already members are skipped. bulk_create does not send
+        post_save, so receivers get the members_bulk_added signal instead.
+        """
+        from .signals import members_bulk_added
+        with transaction.atomic():
+            existing = set(
+                GroupMembership.objects.filter(group=self, user__in=users)
+                .values_list('user_id', flat=True)
+            )
+            user_ids = [user.pk for user in users if user.pk not in existing]
+            GroupMembership.objects.bulk_create(
+                [
+                    GroupMembership(group=self, user_id=user_id, added_by=added_by or self.creator)
+                    for user_id in user_ids
+                ],
+                ignore_conflicts=True
+            )
+            # Rows inserted with ignore_conflicts come back without a primary key
+            memberships = list(GroupMembership.objects.filter(group=self, user_id__in=user_ids))
+            if memberships:
+                members_bulk_added.send(sender=Group, group=self, memberships=memberships)
+        return memberships
+
     def remove_member(self, user):
         """Remove a member from the group"""
         GroupMembership.objects.filter(group=self, user=user).delete()
 
+    def least_loaded_member(self):
+        """Return the member with the lowest weighted open workload"""
+        from tasks.stats import refresh_overdue
+        # Bring the deadline buckets of the workloads up to date
+        refresh_overdue(self)
+        membership = (
+            GroupMembership.objects.filter(group=self)
+            .select_related('user')
+            .order_by('workload', 'id')
+            .first()
+        )
+        return membership.user if membership else None
+
 
 class GroupMembership(models.Model):
     """Through model for Group-User relationship"""
@@ -57,9 +110,69 @@ class GroupMembership(models.Model):
     )
     joined_at = models.DateTimeField(auto_now_add=True)
 
+    # Weighted open workload of the member's tasks in this group, kept up to
+    # date by the task statistics handlers (see tasks.stats)
+    workload = models.IntegerField(default=0)
+
     class Meta:
         unique_together = ['group', 'user']
         ordering = ['joined_at']
+        indexes = [
+            models.Index(fields=['group', 'workload']),
+            models.Index(fields=['group', 'joined_at']),
+        ]
 
     def __str__(self):
         return f"{self.user.user_id} in {self.group.name}"
+
+
+class GroupDeletion(models.Model):
+    """Progress of purging a deleted group's tasks, swaps and notifications"""
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    # No database constraint: the group row is deleted at the end of the purge
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='deletion'
+    )
+    group_name = models.CharField(max_length=100)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='group_deletions'
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    # Kind of rows being deleted, e.g. "tasks"
+    step = models.CharField(max_length=20, blank=True)
+    # Rows to delete, counted when the purge starts, and rows deleted so far
+    total = models.PositiveIntegerField(null=True, blank=True)
+    purged = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Deletion of {self.group_name} ({self.status})"
+
+    @property
+    def progress(self):
+        """Share of the rows purged, from 0 to 1"""
+        if self.status == 'completed':
+            return 1.0
+        if not self.total:
+            return 0.0
+        return min(self.purged / self.total, 1.0)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Group, GroupMembership
+from .models import Group, GroupDeletion, GroupMembership
 from users.serializers import UserSearchSerializer
 
 
@@ -13,16 +13,38 @@ class GroupMembershipSerializer(serializers.ModelSerializer):
         fields = ['user', 'added_by', 'joined_at']
 
 
+class MemberWorkloadSerializer(serializers.ModelSerializer):
+    """Serializer for a member's weighted open workload"""
+    user = UserSearchSerializer(read_only=True)
+    open_tasks = serializers.SerializerMethodField()
+    overdue_tasks = serializers.SerializerMethodField()
+
+    class Meta:
+        model = GroupMembership
+        fields = ['user', 'workload', 'open_tasks', 'overdue_tasks']
+
+    def _stats(self, obj):
+        return self.context.get('stats', {}).get(obj.user_id)
+
+    def get_open_tasks(self, obj):
+        stats = self._stats(obj)
+        return stats.open if stats else 0
+
+    def get_overdue_tasks(self, obj):
+        stats = self._stats(obj)
+        return stats.overdue if stats else 0
+
+
 class GroupSerializer(serializers.ModelSerializer):
     """Serializer for group details"""
     creator = UserSearchSerializer(read_only=True)
-    members = UserSearchSerializer(many=True, read_only=True)
     member_count = serializers.SerializerMethodField()
     is_admin = serializers.SerializerMethodField()
     
     class Meta:
         model = Group
-        fields = ['id', 'name', 'description', 'creator', 'members', 'member_count', 
+        # Members are listed, a page at a time, by the group_members endpoint
+        fields = ['id', 'name', 'description', 'creator', 'member_count',
                  'is_admin', 'created_at', 'updated_at']
         read_only_fields = ['id', 'creator', 'created_at', 'updated_at']
     
@@ -81,3 +103,31 @@ class AddMemberSerializer(serializers.Serializer):
             return user
         except User.DoesNotExist:
             raise serializers.ValidationError("User with this ID does not exist")
+
+
+class AddMembersSerializer(serializers.Serializer):
+    """Serializer for adding several members to a group at once"""
+    user_ids = serializers.ListField(
+        child=serializers.CharField(max_length=8),
+        allow_empty=False
+    )
+
+    def validate_user_ids(self, value):
+        from django.conf import settings
+        limit = getattr(settings, 'GROUP_ADD_MEMBERS_MAX', 500)
+        # Keep the first occurrence of repeated ids
+        value = list(dict.fromkeys(value))
+        if len(value) > limit:
+            raise serializers.ValidationError(f"At most {limit} users can be added at once")
+        return value
+
+
+class GroupDeletionSerializer(serializers.ModelSerializer):
+    """Serializer for the progress of a group deletion"""
+    group = serializers.IntegerField(source='group_id', read_only=True)
+    progress = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = GroupDeletion
+        fields = ['id', 'group', 'group_name', 'status', 'step', 'total', 'purged',
+                  'progress', 'error', 'created_at', 'started_at', 'finished_at']
@@ -0,0 +1,12 @@
+from django.dispatch import Signal
+
+
+# Sent before rows of a deleted group are removed with a raw bulk delete,
+# which skips pre_delete and post_delete. ``sender`` is the model and
+# receivers get the primary keys about to be deleted as ``ids``.
+pre_purge = Signal()
+
+# Sent after memberships are inserted with bulk_create, which skips
+# post_save. ``sender`` is the group and receivers get the new
+# GroupMembership instances as ``memberships``.
+members_bulk_added = Signal()
@@ -1,3 +1,222 @@
-from django.test import TestCase
+import csv
+import io
+import json
 
-# Create your tests here.
+from django.db.models.signals import pre_delete
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from notifications.models import Notification
+from tasks.models import GroupTaskStats, Task, TaskSwap, TaskVisibility
+from users.models import User
+from .deletion import purge_group
+from .models import Group, GroupDeletion, GroupMembership
+
+
+def create_user(name):
+    return User.objects.create_user(
+        email=f'{name}@example.com', username=name, password='x', first_name=name.title(), last_name='Test'
+    )
+
+
+def auth(user):
+    return {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+
+@override_settings(RATE_LIMIT_ENABLED=False, GROUP_PURGE_IN_BACKGROUND=False)
+class GroupDeletionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.alice = create_user('admin'), create_user('alice')
+        cls.group = Group.objects.create(name='Chores', creator=cls.admin)
+        for user in (cls.admin, cls.alice):
+            cls.group.add_member(user)
+        tasks = [
+            Task.objects.create(group=cls.group, created_by=cls.admin, assigned_to_user=user, title='Task')
+            for user in (cls.admin, cls.alice, cls.alice)
+        ]
+        cls.swap = TaskSwap.objects.create(requester_task=tasks[0], target_task=tasks[1],
+                                           requester=cls.admin, target_user=cls.alice)
+        Notification.create_swap_request(cls.swap)
+        Notification.create_task_assignments(tasks[2], [cls.alice.pk])
+        # A group that must survive the purge
+        cls.other = Group.objects.create(name='Garden', creator=cls.alice)
+        cls.other.add_member(cls.alice)
+        Task.objects.create(group=cls.other, created_by=cls.alice, assigned_to_user=cls.alice, title='Weeds')
+
+    def delete(self, user):
+        return self.client.delete(f'/api/groups/{self.group.id}/', **auth(user))
+
+    def test_only_the_admin_can_delete(self):
+        self.assertEqual(self.delete(self.alice).status_code, 403)
+        self.assertTrue(Group.objects.filter(pk=self.group.pk).exists())
+
+    def test_group_disappears_at_once_and_is_purged(self):
+        response = self.delete(self.admin)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'pending')
+        self.assertFalse(Group.objects.filter(pk=self.group.pk).exists())
+        self.assertEqual(self.client.get(f'/api/groups/{self.group.id}/', **auth(self.admin)).status_code, 404)
+        # Nothing is purged yet
+        self.assertEqual(Task.objects.filter(group=self.group).count(), 3)
+        self.assertEqual(Notification.objects.count(), 2)
+
+        # Rows are removed with raw deletes, without loading them for the collector
+        deleted = []
+
+        def receiver(sender, **kwargs):
+            deleted.append(sender)
+
+        pre_delete.connect(receiver)
+        self.addCleanup(pre_delete.disconnect, receiver)
+        deletion = purge_group(GroupDeletion.objects.get(pk=response.json()['id']), batch_size=2)
+        self.assertEqual(deleted, [])
+        self.assertEqual(deletion.status, 'completed')
+        self.assertFalse(Group.all_objects.filter(pk=self.group.pk).exists())
+        self.assertFalse(Task.objects.filter(group_id=self.group.pk).exists())
+        self.assertFalse(TaskSwap.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+        self.assertFalse(GroupMembership.objects.filter(group_id=self.group.pk).exists())
+        self.assertFalse(TaskVisibility.objects.filter(group_id=self.group.pk).exists())
+        self.assertFalse(GroupTaskStats.objects.filter(group_id=self.group.pk).exists())
+        # Rows of other groups are left alone
+        self.assertEqual(Task.objects.filter(group=self.other).count(), 1)
+        self.assertTrue(GroupMembership.objects.filter(group=self.other).exists())
+
+    def test_progress_endpoint_reports_completion(self):
+        deletion_id = self.delete(self.admin).json()['id']
+        url = f'/api/groups/deletions/{deletion_id}/'
+        self.assertEqual(self.client.get(url, **auth(self.admin)).json()['status'], 'pending')
+        self.assertEqual(self.client.get(url, **auth(self.alice)).status_code, 404)
+
+        purge_group(GroupDeletion.objects.get(pk=deletion_id))
+        progress = self.client.get(url, **auth(self.admin)).json()
+        self.assertEqual((progress['status'], progress['progress'], progress['group_name']),
+                         ('completed', 1.0, 'Chores'))
+        self.assertIsNotNone(progress['finished_at'])
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class AddMembersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.alice, cls.bob, cls.carol = [
+            create_user(name) for name in ('admin', 'alice', 'bob', 'carol')
+        ]
+        cls.group = Group.objects.create(name='Chores', creator=cls.admin)
+        for user in (cls.admin, cls.alice):
+            cls.group.add_member(user)
+
+    def add_members(self, user, user_ids):
+        return self.client.post(f'/api/groups/{self.group.id}/add-members/', {'user_ids': user_ids},
+                                content_type='application/json', **auth(user))
+
+    def test_added_skipped_and_unknown(self):
+        response = self.add_members(
+            self.admin, [self.bob.user_id, self.alice.user_id, 'NOBODY00', self.carol.user_id, self.bob.user_id]
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'added': [self.bob.user_id, self.carol.user_id],
+            'skipped': [self.alice.user_id],
+            'unknown': ['NOBODY00'],
+        })
+        self.assertEqual(set(self.group.members.all()), {self.admin, self.alice, self.bob, self.carol})
+        # Only the users added are invited
+        self.assertEqual(
+            set(Notification.objects.filter(notification_type='group_invitation')
+                .values_list('recipient', flat=True)),
+            {self.bob.pk, self.carol.pk},
+        )
+
+    def test_only_the_admin_can_add_members(self):
+        self.assertEqual(self.add_members(self.alice, [self.bob.user_id]).status_code, 403)
+        # The group is hidden from non-members
+        self.assertEqual(self.add_members(self.bob, [self.carol.user_id]).status_code, 404)
+        self.assertFalse(self.group.members.filter(pk__in=[self.bob.pk, self.carol.pk]).exists())
+
+    def test_empty_and_oversized_lists_are_refused(self):
+        self.assertEqual(self.add_members(self.admin, []).status_code, 400)
+        with self.settings(GROUP_ADD_MEMBERS_MAX=1):
+            response = self.add_members(self.admin, [self.bob.user_id, self.carol.user_id])
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class GroupMembersTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [create_user(f'user{index}') for index in range(5)]
+        cls.group = Group.objects.create(name='Chores', creator=cls.users[0])
+        for user in cls.users:
+            cls.group.add_member(user)
+
+    def get(self, url=None, **params):
+        url = url or f'/api/groups/{self.group.id}/members/'
+        response = self.client.get(url, params, **auth(self.users[0]))
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def collect(self, **params):
+        """Follow the next links, joining a member and removing one after the first page"""
+        page = self.get(page_size=2, **params)
+        members = [item['user']['user_id'] for item in page['results']]
+        self.group.add_member(create_user('late'))
+        self.group.remove_member(self.users[2])
+        while page['next']:
+            page = self.get(page['next'])
+            members += [item['user']['user_id'] for item in page['results']]
+        return members
+
+    def test_pages_are_stable_while_members_change(self):
+        members = self.collect()
+        user_ids = [user.user_id for user in self.users] + [User.objects.get(username='late').user_id]
+        # The removed member was not read yet and the new one joined after the cursor
+        self.assertEqual(members, user_ids[:2] + user_ids[3:])
+
+    def test_newest_first(self):
+        user_ids = [user.user_id for user in reversed(self.users)]
+        self.assertEqual(self.collect(ordering='-joined_at'), user_ids[:2] + user_ids[3:])
+
+    def test_invalid_ordering_is_refused(self):
+        response = self.client.get(f'/api/groups/{self.group.id}/members/', {'ordering': 'user__last_name'},
+                                   **auth(self.users[0]))
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(RATE_LIMIT_ENABLED=False)
+class GroupExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.alice = create_user('admin'), create_user('alice')
+        cls.group = Group.objects.create(name='Chores', creator=cls.admin)
+        for user in (cls.admin, cls.alice):
+            cls.group.add_member(user)
+        cls.tasks = [
+            Task.objects.create(group=cls.group, created_by=cls.admin, assigned_to_user=cls.alice, title=title)
+            for title in ('Dishes', 'Laundry, "whites"')
+        ]
+
+    def export(self, user, **params):
+        return self.client.get(f'/api/groups/{self.group.id}/export/', params, **auth(user))
+
+    def test_csv(self):
+        response = self.export(self.admin, format='csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([(row['id'], row['title'], row['assigned_to_user_id']) for row in rows],
+                         [(str(task.id), task.title, self.alice.user_id) for task in self.tasks])
+
+    def test_ndjson(self):
+        response = self.export(self.admin, format='ndjson', dataset='tasks')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn(f'group-{self.group.id}-tasks.ndjson', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], [task.title for task in self.tasks])
+
+    def test_only_the_admin_can_export(self):
+        self.assertEqual(self.export(self.alice, format='csv').status_code, 403)
+        self.assertEqual(self.export(self.admin, format='csv', dataset='users').status_code, 400)
@@ -4,7 +4,13 @@ from . import views
 urlpatterns = [
     path('', views.GroupListCreateView.as_view(), name='group-list-create'),
     path('<int:group_id>/', views.GroupDetailView.as_view(), name='group-detail'),
+    path('deletions/<int:deletion_id>/', views.group_deletion, name='group-deletion'),
     path('<int:group_id>/members/', views.group_members, name='group-members'),
     path('<int:group_id>/add-member/', views.add_member, name='group-add-member'),
+    path('<int:group_id>/add-members/', views.add_members, name='group-add-members'),
     path('<int:group_id>/remove-member/<str:user_id>/', views.remove_member, name='group-remove-member'),
+    path('<int:group_id>/export/', views.export_group, name='group-export'),
+    path('<int:group_id>/import/', views.import_group_tasks, name='group-import'),
+    path('<int:group_id>/stats/', views.group_stats, name='group-stats'),
+    path('<int:group_id>/workload/', views.group_workload, name='group-workload'),
 ]
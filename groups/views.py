@@ -1,18 +1,52 @@
 from rest_framework import generics, status, permissions
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
+from django.db import transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from .models import Group, GroupMembership
+from core.metrics import record_fanout
+from core.routers import ReplicaReadMixin
+from notifications.models import Notification
+from tasks.exports import (
+    CSVStreamRenderer,
+    NDJSONStreamRenderer,
+    group_export_rows,
+    stream_csv,
+    stream_ndjson
+)
+from users.models import User
+from .models import Group, GroupDeletion, GroupMembership
 from .serializers import (
     GroupSerializer,
     GroupCreateSerializer,
     GroupListSerializer,
     AddMemberSerializer,
-    GroupMembershipSerializer
+    AddMembersSerializer,
+    GroupMembershipSerializer,
+    GroupDeletionSerializer,
+    MemberWorkloadSerializer
 )
 
 
-class GroupListCreateView(generics.ListCreateAPIView):
+class MemberCursorPagination(CursorPagination):
+    """Members in join order; pages stay consistent while members join or leave"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('joined_at', 'id')
+    # Cursors of the next and previous links keep the ordering parameter
+    orderings = {
+        'joined_at': ('joined_at', 'id'),
+        '-joined_at': ('-joined_at', '-id'),
+    }
+
+    def get_ordering(self, request, queryset, view):
+        return self.orderings.get(request.query_params.get('ordering'), self.ordering)
+
+
+class GroupListCreateView(ReplicaReadMixin, generics.ListCreateAPIView):
     """List user's groups and create new groups"""
     permission_classes = [permissions.IsAuthenticated]
 
@@ -29,6 +63,7 @@ class GroupDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Group detail, update, and delete"""
     serializer_class = GroupSerializer
     permission_classes = [permissions.IsAuthenticated]
+    lookup_url_kwarg = 'group_id'
 
     def get_queryset(self):
         return Group.objects.filter(members=self.request.user)
@@ -40,11 +75,28 @@ class GroupDetailView(generics.RetrieveUpdateDestroyAPIView):
             raise permissions.PermissionDenied("Only group admin can update group")
         serializer.save()
 
-    def perform_destroy(self, instance):
+    def destroy(self, request, *args, **kwargs):
+        group = self.get_object()
         # Only group admin can delete
-        if not instance.is_admin(self.request.user):
-            raise permissions.PermissionDenied("Only group admin can delete group")
-        instance.delete()
+        if not group.is_admin(request.user):
+            return Response({'error': 'Only group admin can delete group'},
+                           status=status.HTTP_403_FORBIDDEN)
+        deletion = self.perform_destroy(group)
+        return Response(GroupDeletionSerializer(deletion).data, status=status.HTTP_202_ACCEPTED)
+
+    def perform_destroy(self, instance):
+        # The group disappears at once; its tasks, swaps and notifications
+        # are purged in the background
+        from .deletion import delete_group
+        return delete_group(instance, self.request.user)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def group_deletion(request, deletion_id):
+    """Get the progress of a group deletion requested by the user"""
+    deletion = get_object_or_404(GroupDeletion, id=deletion_id, requested_by=request.user)
+    return Response(GroupDeletionSerializer(deletion).data)
 
 
 @api_view(['POST'])
@@ -77,6 +129,44 @@ def add_member(request, group_id):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def add_members(request, group_id):
+    """Add several members to the group by user ID"""
+    group = get_object_or_404(Group, id=group_id, members=request.user)
+
+    # Check if user is admin
+    if not group.is_admin(request.user):
+        return Response({'error': 'Only group admin can add members'},
+                       status=status.HTTP_403_FORBIDDEN)
+
+    serializer = AddMembersSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    user_ids = serializer.validated_data['user_ids']
+    users = {user.user_id: user for user in User.objects.filter(user_id__in=user_ids)}
+
+    with transaction.atomic():
+        memberships = group.add_members(list(users.values()), request.user)
+        added = {membership.user_id for membership in memberships}
+        recipients = [user for user in users.values() if user.pk in added]
+        Notification.create_group_invitations(group, recipients, request.user)
+    record_fanout('group_invitation', len(recipients))
+
+    result = {'added': [], 'skipped': [], 'unknown': []}
+    for user_id in user_ids:
+        user = users.get(user_id)
+        if user is None:
+            result['unknown'].append(user_id)
+        elif user.pk in added:
+            result['added'].append(user_id)
+        else:
+            # Already a member
+            result['skipped'].append(user_id)
+    return Response(result)
+
+
 @api_view(['DELETE'])
 @permission_classes([permissions.IsAuthenticated])
 def remove_member(request, group_id, user_id):
@@ -112,8 +202,144 @@ def remove_member(request, group_id, user_id):
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def group_members(request, group_id):
-    """Get group members"""
+    """Get group members, filtered by user ID or name and paginated by cursor"""
+    group = get_object_or_404(Group, id=group_id, members=request.user)
+
+    ordering = request.query_params.get('ordering', 'joined_at')
+    if ordering not in MemberCursorPagination.orderings:
+        return Response({'error': 'ordering must be one of: joined_at, -joined_at'},
+                       status=status.HTTP_400_BAD_REQUEST)
+
+    memberships = GroupMembership.objects.filter(group=group).select_related('user', 'added_by')
+    query = request.query_params.get('q', '').strip()
+    if query:
+        memberships = memberships.filter(
+            Q(user__user_id__icontains=query) |
+            Q(user__first_name__icontains=query) |
+            Q(user__last_name__icontains=query)
+        )
+
+    paginator = MemberCursorPagination()
+    page = paginator.paginate_queryset(memberships, request)
+    serializer = GroupMembershipSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+@renderer_classes([CSVStreamRenderer, NDJSONStreamRenderer])
+def export_group(request, group_id):
+    """Stream every task (or swap) in the group as CSV or NDJSON"""
     group = get_object_or_404(Group, id=group_id, members=request.user)
-    memberships = GroupMembership.objects.filter(group=group)
-    serializer = GroupMembershipSerializer(memberships, many=True)
+
+    # Check if user is admin
+    if not group.is_admin(request.user):
+        return Response({'error': 'Only group admin can export group data'},
+                       status=status.HTTP_403_FORBIDDEN)
+
+    dataset = request.query_params.get('dataset', 'tasks')
+    if dataset not in ('tasks', 'swaps'):
+        return Response({'error': 'dataset must be one of: tasks, swaps'},
+                       status=status.HTTP_400_BAD_REQUEST)
+
+    columns, rows = group_export_rows(group, dataset)
+    renderer = request.accepted_renderer
+    if renderer.format == 'csv':
+        content = stream_csv(columns, rows)
+    else:
+        content = stream_ndjson(columns, rows)
+
+    response = StreamingHttpResponse(
+        content, content_type=f'{renderer.media_type}; charset={renderer.charset}'
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="group-{group.id}-{dataset}.{renderer.format}"'
+    )
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def import_group_tasks(request, group_id):
+    """Import tasks into the group from an uploaded CSV or NDJSON file"""
+    group = get_object_or_404(Group, id=group_id, members=request.user)
+
+    # Check if user is admin
+    if not group.is_admin(request.user):
+        return Response({'error': 'Only group admin can import tasks'},
+                       status=status.HTTP_403_FORBIDDEN)
+
+    upload = request.FILES.get('file')
+    if upload is None:
+        return Response({'error': 'A file upload is required'},
+                       status=status.HTTP_400_BAD_REQUEST)
+
+    from tasks.imports import IMPORT_FORMATS, TaskImporter
+    fmt = request.data.get('format') or (
+        'ndjson' if upload.name.endswith(('.ndjson', '.jsonl')) else 'csv'
+    )
+    if fmt not in IMPORT_FORMATS:
+        return Response({'error': 'format must be one of: csv, ndjson'},
+                       status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        start_line = int(request.data.get('start_line', 1))
+    except (TypeError, ValueError):
+        return Response({'error': 'start_line must be an integer'},
+                       status=status.HTTP_400_BAD_REQUEST)
+
+    # Uploaded files are iterated line by line, never read whole
+    importer = TaskImporter(group, request.user, start_line=start_line)
+    result = importer.run(upload, fmt)
+    return Response(result)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def group_stats(request, group_id):
+    """Get task counters for the group, served from the statistics table"""
+    group = get_object_or_404(Group, id=group_id, members=request.user)
+
+    from tasks.models import GroupTaskStats
+    from tasks.serializers import GroupTaskStatsSerializer
+    from tasks.stats import refresh_overdue
+    refresh_overdue(group)
+
+    rows = list(GroupTaskStats.objects.filter(group=group).select_related('assignee'))
+    totals = next((row for row in rows if row.assignee_id is None), None)
+    if totals is None:
+        totals = GroupTaskStats(group=group)
+    data = GroupTaskStatsSerializer(totals).data
+    data.pop('assignee')
+    data['as_of'] = totals.overdue_as_of
+    data['assignees'] = GroupTaskStatsSerializer(
+        [row for row in rows if row.assignee_id is not None], many=True
+    ).data
+    return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def group_workload(request, group_id):
+    """Get members ordered by weighted open workload (admin only)"""
+    group = get_object_or_404(Group, id=group_id, members=request.user)
+
+    # Check if user is admin
+    if not group.is_admin(request.user):
+        return Response({'error': 'Only group admin can view member workload'},
+                       status=status.HTTP_403_FORBIDDEN)
+
+    from tasks.models import GroupTaskStats
+    from tasks.stats import refresh_overdue
+    refresh_overdue(group)
+    stats = {
+        row.assignee_id: row
+        for row in GroupTaskStats.objects.filter(group=group, assignee__isnull=False)
+    }
+    memberships = (
+        GroupMembership.objects.filter(group=group)
+        .select_related('user')
+        .order_by('workload', 'id')
+    )
+    serializer = MemberWorkloadSerializer(memberships, many=True, context={'stats': stats})
     return Response(serializer.data)
@@ -0,0 +1,21 @@
+from django.contrib import admin
+from django.utils import timezone
+from core.admin import LargeTableAdmin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin):
+    list_display = ['id', 'name', 'status', 'priority', 'attempts', 'run_at', 'finished_at']
+    list_filter = ['status', 'name']
+    search_fields = ['name']
+    date_hierarchy = 'created_at'
+    readonly_fields = ['attempts', 'leased_until', 'worker', 'error', 'created_at', 'finished_at']
+    actions = ['requeue']
+
+    def requeue(self, request, queryset):
+        count = queryset.filter(status='failed').update(
+            status='queued', attempts=0, run_at=timezone.now(), finished_at=None
+        )
+        self.message_user(request, f'{count} jobs queued again.')
+    requeue.short_description = 'Run selected failed jobs again'
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from jobs.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Delete finished jobs older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            default=getattr(settings, 'JOB_RETENTION_DAYS', 7),
+                            help='Keep jobs finished in the last this many days')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        jobs = Job.objects.filter(finished_at__lt=cutoff)
+
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                ids = list(jobs.order_by('finished_at').values_list('id', flat=True)[:options['batch_size']])
+                if not ids:
+                    break
+                Job.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+
+        self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} jobs'))
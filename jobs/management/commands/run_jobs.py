@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from core.metrics import enable_export
+from jobs.queue import job_settings
+from jobs.worker import run_pool
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Jobs run at once (default JOB_WORKERS)')
+        parser.add_argument('--pool', choices=['thread', 'process'], default=None,
+                            help='Run workers as threads or processes (default JOB_POOL)')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no job is due instead of polling')
+
+    def handle(self, *args, **options):
+        config = job_settings()
+        workers = options['workers'] or config['WORKERS']
+        pool = options['pool'] or config['POOL']
+        if options['verbosity']:
+            self.stdout.write(f'Running jobs with {workers} {pool} workers')
+        # Jobs record metrics (e.g. notification fan-out) that /metrics reports
+        enable_export()
+        run_pool(workers, pool, options['once'])
@@ -0,0 +1,49 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """A call of a registered job function, run by ``python manage.py run_jobs``.
+
+    Queued jobs are claimed highest ``priority`` first, then by ``run_at``. A
+    claimed job is leased to one worker until ``leased_until``; if the worker
+    dies the lease expires and the job is queued again. See jobs.worker.
+    """
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    run_at = models.DateTimeField(default=timezone.now)
+
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    leased_until = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Claim order of the queued jobs
+            models.Index(fields=['-priority', 'run_at', 'id'], condition=models.Q(status='queued'),
+                         name='job_queued'),
+            # Leases to recover
+            models.Index(fields=['leased_until'], condition=models.Q(status='running'),
+                         name='job_running'),
+            # Finished jobs to prune
+            models.Index(fields=['finished_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.id}: {self.name} ({self.status})"
@@ -0,0 +1,117 @@
+"""A job queue in the application database.
+
+Functions decorated with ``@job('app.name')`` in an app's ``jobs`` module are
+registered when Django starts. ``enqueue()`` stores a call of one as a
+``Job`` row in the current transaction, so the job exists if and only if the
+change it belongs to commits; ``enqueue_on_commit()`` waits for the commit
+instead, keeping the insert out of the request's transaction. Workers
+started with ``python manage.py run_jobs`` run the jobs (see jobs.worker).
+
+Job arguments are keyword arguments stored as JSON, so pass ids rather than
+model instances. A job may run more than once (it is retried after an
+error, or after its worker died), so it should be safe to repeat. A job
+runs in a transaction unless registered with ``atomic=False``, for jobs
+whose writes go through the write coalescer (core.coalescer), which only
+group-commits writes made outside a transaction.
+
+With ``JOB_RUN_INLINE`` (the default with ``DEBUG``) jobs run right after
+the commit in the process that queued them, as a worker would run them,
+with their arguments round-tripped through JSON. They are not
+retried; errors are logged.
+"""
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Registered job functions by name
+registry = {}
+
+
+def job_settings():
+    return {
+        'WORKERS': getattr(settings, 'JOB_WORKERS', 4),
+        'POOL': getattr(settings, 'JOB_POOL', 'thread'),
+        'POLL_INTERVAL': getattr(settings, 'JOB_POLL_INTERVAL', 1.0),
+        'LEASE_SECONDS': getattr(settings, 'JOB_LEASE_SECONDS', 300),
+        'MAX_ATTEMPTS': getattr(settings, 'JOB_MAX_ATTEMPTS', 5),
+        'BACKOFF_BASE': getattr(settings, 'JOB_BACKOFF_BASE', 5),
+        'BACKOFF_MAX': getattr(settings, 'JOB_BACKOFF_MAX', 600),
+        'RUN_INLINE': getattr(settings, 'JOB_RUN_INLINE', False),
+    }
+
+
+def job(name, atomic=True):
+    """Register the decorated function as the job ``name``"""
+    def register(fn):
+        if registry.get(name, fn) is not fn:
+            raise ValueError(f'Job {name!r} is already registered')
+        registry[name] = fn
+        fn.job_name = name
+        fn.job_atomic = atomic
+        return fn
+    return register
+
+
+def call(fn, kwargs):
+    """Run a job function, in a transaction unless it was registered with atomic=False"""
+    if not fn.job_atomic:
+        return fn(**kwargs)
+    with transaction.atomic():
+        return fn(**kwargs)
+
+
+def _job_name(fn):
+    name = fn if isinstance(fn, str) else getattr(fn, 'job_name', None)
+    if name not in registry:
+        raise ValueError(f'Not a registered job: {fn!r}')
+    return name
+
+
+def enqueue(fn, *, priority=0, run_at=None, delay=None, max_attempts=None, **kwargs):
+    """Queue a call of the job ``fn`` (a registered function or its name).
+
+    The job runs at ``run_at``, or ``delay`` seconds from now, or as soon as
+    a worker is free; higher ``priority`` jobs run first. Returns the Job,
+    or None when ``JOB_RUN_INLINE`` runs jobs right after the commit instead.
+    """
+    name = _job_name(fn)
+    if job_settings()['RUN_INLINE']:
+        # Arguments a worker could not read fail here too
+        stored = json.loads(json.dumps(kwargs, cls=DjangoJSONEncoder))
+        transaction.on_commit(lambda: run_inline(name, stored))
+        return None
+    if run_at is None:
+        run_at = timezone.now() + timedelta(seconds=delay or 0)
+    return Job.objects.create(
+        name=name, kwargs=kwargs, priority=priority, run_at=run_at,
+        max_attempts=max_attempts or job_settings()['MAX_ATTEMPTS']
+    )
+
+
+def run_inline(name, kwargs):
+    """Run a job in this process like a worker, logging instead of retrying errors"""
+    try:
+        call(registry[name], kwargs)
+    except Exception:
+        logger.exception('Inline job %s failed', name)
+
+
+def enqueue_on_commit(fn, **options):
+    """Queue a job once the current transaction commits (right away outside one).
+
+    Takes the arguments of ``enqueue()``. Nothing is queued if the
+    transaction rolls back.
+    """
+    _job_name(fn)
+    # Fail in the caller, not after the commit, on arguments JSON cannot store
+    json.dumps(options, cls=DjangoJSONEncoder)
+    transaction.on_commit(lambda: enqueue(fn, **options))
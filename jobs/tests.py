@@ -0,0 +1,96 @@
+import threading
+from datetime import date
+from unittest import mock
+
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core.coalescer import WriteCoalescer
+from groups.models import Group
+from notifications.jobs import swap_requested
+from notifications.models import Notification
+from tasks.models import Task, TaskSwap
+from users.models import User
+from .models import Job
+from .queue import enqueue, job
+from .worker import work
+
+calls = []
+
+
+@job('tests.rename_group')
+def rename_group(group_id, name, day):
+    calls.append(day)
+    Group.objects.filter(pk=group_id).update(name=name)
+    if name == 'fail':
+        raise RuntimeError('job failed')
+
+
+@override_settings(JOB_RUN_INLINE=True)
+class InlineJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(
+            email='admin@example.com', username='admin', password='x', first_name='Admin', last_name='Test'
+        )
+        cls.group = Group.objects.create(name='Chores', creator=user)
+
+    def setUp(self):
+        calls.clear()
+
+    def test_arguments_are_passed_as_json(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            queued = enqueue(rename_group, group_id=self.group.pk, name='Renamed', day=date(2024, 12, 2))
+            self.assertIsNone(queued)
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, ['2024-12-02'])
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.name, 'Renamed')
+
+    def test_failing_job_is_logged_and_rolled_back(self):
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                enqueue(rename_group, group_id=self.group.pk, name='fail', day=None)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.name, 'Chores')
+
+    def test_arguments_json_cannot_store_are_refused(self):
+        with self.assertRaises(TypeError):
+            enqueue(rename_group, group_id=self.group.pk, name='Renamed', day=object())
+
+
+@override_settings(JOB_RUN_INLINE=False)
+class WorkerCoalescingTests(TransactionTestCase):
+    def setUp(self):
+        users = [
+            User.objects.create_user(
+                email=f'{name}@example.com', username=name, password='x', first_name=name.title(), last_name='Test'
+            )
+            for name in ('admin', 'alice', 'bob')
+        ]
+        group = Group.objects.create(name='Chores', creator=users[0])
+        tasks = {}
+        for user in users:
+            group.add_member(user)
+            tasks[user] = Task.objects.create(group=group, created_by=users[0], assigned_to_user=user, title='Task')
+        for requester, target in ((users[1], users[2]), (users[2], users[1])):
+            swap = TaskSwap.objects.create(requester_task=tasks[requester], target_task=tasks[target],
+                                           requester=requester, target_user=target)
+            enqueue(swap_requested, swap_id=swap.pk)
+
+    def test_inserts_of_concurrent_jobs_share_a_batch(self):
+        # Commits once both workers' inserts are queued
+        coalescer = WriteCoalescer(max_batch=2, max_delay=10)
+        self.addCleanup(coalescer.stop)
+        batches = []
+        commit = coalescer._commit
+        coalescer._commit = lambda batch: (batches.append(len(batch)), commit(batch))
+        stop = threading.Event()
+        workers = [threading.Thread(target=work, args=(f'test:{index}', stop, True)) for index in range(2)]
+        with mock.patch('core.coalescer.get_coalescer', return_value=coalescer):
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join(timeout=30)
+        self.assertEqual(batches, [2])
+        self.assertEqual(Notification.objects.filter(notification_type='swap_requested').count(), 2)
+        self.assertEqual(set(Job.objects.values_list('status', flat=True)), {'done'})
@@ -0,0 +1,170 @@
+"""Running queued jobs.
+
+Each worker thread (or process) of ``python manage.py run_jobs`` loops:
+
+1. ``claim`` picks the next due job, highest priority first, and leases it
+   with a conditional UPDATE, so a job is taken by one worker only.
+2. ``execute`` runs the job function, in a transaction unless it was
+   registered with ``atomic=False``. On success the job is marked ``done``;
+   on an error it is queued again with exponential backoff, or marked
+   ``failed`` after ``max_attempts`` attempts.
+3. While idle, ``recover_expired`` queues again the jobs whose lease ran
+   out, which belonged to workers that died.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.db import close_old_connections, connection, connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+from .queue import call, job_settings, registry
+
+logger = logging.getLogger(__name__)
+
+# Due jobs read per claim; workers racing for the first one try the next
+CLAIM_CANDIDATES = 10
+
+
+def worker_name(index):
+    return f'{socket.gethostname()}:{os.getpid()}:{index}'
+
+
+def backoff(attempts):
+    """Seconds to wait before the next attempt after ``attempts`` attempts"""
+    config = job_settings()
+    return min(config['BACKOFF_BASE'] * 2 ** (attempts - 1), config['BACKOFF_MAX'])
+
+
+def recover_expired():
+    """Queue again the jobs of dead workers; return the number recovered"""
+    now = timezone.now()
+    expired = Job.objects.filter(status='running', leased_until__lt=now)
+    failed = expired.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', leased_until=None, error='Lease expired', finished_at=now
+    )
+    return failed + expired.update(status='queued', leased_until=None, error='Lease expired')
+
+
+def claim(worker):
+    """Lease the next due job to ``worker``; None if there is none"""
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(status='queued', run_at__lte=now)
+        .order_by('-priority', 'run_at', 'id').values_list('id', flat=True)[:CLAIM_CANDIDATES]
+    )
+    lease = now + timedelta(seconds=job_settings()['LEASE_SECONDS'])
+    for job_id in candidates:
+        if Job.objects.filter(id=job_id, status='queued').update(
+            status='running', leased_until=lease, worker=worker, attempts=F('attempts') + 1
+        ):
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def execute(job):
+    """Run a claimed job and record the outcome; return True on success"""
+    # Only the worker holding the lease records the outcome
+    leased = Job.objects.filter(id=job.pk, status='running', attempts=job.attempts)
+    try:
+        fn = registry.get(job.name)
+        if fn is None:
+            raise LookupError(f'Not a registered job: {job.name}')
+        call(fn, job.kwargs)
+    except Exception:
+        now = timezone.now()
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            logger.error('Job %s (%s) failed after %d attempts', job.pk, job.name, job.attempts,
+                         exc_info=True)
+            leased.update(status='failed', leased_until=None, error=error, finished_at=now)
+        else:
+            logger.warning('Job %s (%s) failed, attempt %d of %d', job.pk, job.name,
+                           job.attempts, job.max_attempts, exc_info=True)
+            leased.update(status='queued', leased_until=None, error=error,
+                          run_at=now + timedelta(seconds=backoff(job.attempts)))
+        return False
+    leased.update(status='done', leased_until=None, error='', finished_at=timezone.now())
+    return True
+
+
+def work(worker, stop, once=False):
+    """Run jobs until ``stop`` is set, or the queue is empty when ``once``"""
+    interval = job_settings()['POLL_INTERVAL']
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            job = claim(worker)
+            if job is not None:
+                execute(job)
+                continue
+            if recover_expired():
+                continue
+            if once:
+                break
+            stop.wait(interval)
+    finally:
+        connection.close()
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def run_pool(workers, pool='thread', once=False):
+    """Run ``workers`` workers in threads or processes until interrupted.
+
+    SIGINT and SIGTERM stop the workers after their current job.
+    """
+    signal.signal(signal.SIGTERM, _interrupt)
+    if pool == 'process':
+        # Children must not share the parent's database connections
+        connections.close_all()
+        stop = None
+        runners = [
+            multiprocessing.Process(target=_process_main, args=(index, once),
+                                    name=f'job-worker-{index}')
+            for index in range(workers)
+        ]
+    else:
+        stop = threading.Event()
+        runners = [
+            threading.Thread(target=work, args=(worker_name(index), stop, once),
+                             name=f'job-worker-{index}')
+            for index in range(workers)
+        ]
+    for runner in runners:
+        runner.start()
+    try:
+        while any(runner.is_alive() for runner in runners):
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        if stop is not None:
+            stop.set()
+        else:
+            for runner in runners:
+                runner.terminate()
+        for runner in runners:
+            runner.join()
+
+
+def _process_main(index, once):
+    import django
+    django.setup()
+    from core.metrics import registry as metrics
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stop.set())
+    try:
+        work(worker_name(index), stop, once)
+    finally:
+        # Worker processes exit without running atexit handlers
+        metrics.flush()
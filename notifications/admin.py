@@ -1,23 +1,26 @@
 from django.contrib import admin
+from core.admin import LargeTableAdmin
 from .models import Notification
 
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(LargeTableAdmin):
     list_display = ['title', 'recipient', 'notification_type', 'is_read', 'created_at']
     list_filter = ['notification_type', 'is_read', 'created_at']
+    list_select_related = ['recipient']
     search_fields = ['title', 'message', 'recipient__user_id', 'recipient__email']
+    autocomplete_fields = ['recipient', 'related_task', 'related_group', 'related_swap']
+    date_hierarchy = 'created_at'
     readonly_fields = ['created_at', 'read_at']
 
     actions = ['mark_as_read', 'mark_as_unread']
 
     def mark_as_read(self, request, queryset):
-        for notification in queryset:
-            notification.mark_as_read()
-        self.message_user(request, f'{queryset.count()} notifications marked as read.')
+        count = queryset.mark_read()
+        self.message_user(request, f'{count} notifications marked as read.')
     mark_as_read.short_description = 'Mark selected notifications as read'
 
     def mark_as_unread(self, request, queryset):
-        queryset.update(is_read=False, read_at=None)
-        self.message_user(request, f'{queryset.count()} notifications marked as unread.')
+        count = queryset.mark_unread()
+        self.message_user(request, f'{count} notifications marked as unread.')
     mark_as_unread.short_description = 'Mark selected notifications as unread'
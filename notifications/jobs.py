@@ -0,0 +1,67 @@
+"""Background jobs creating notifications, queued by the views after commit.
+
+Each job reads the current rows and skips the recipients it already
+notified, so running it again (after a retry) notifies nobody twice. The
+single-notification jobs run outside a transaction, so that the inserts of
+concurrent workers are group-committed by the write coalescer.
+"""
+from core.coalescer import wait
+from jobs.queue import job
+
+from .models import Notification
+
+
+def _notified(notification_type, **related):
+    return set(
+        Notification.objects.filter(notification_type=notification_type, **related)
+        .values_list('recipient_id', flat=True)
+    )
+
+
+@job('notifications.task_assigned')
+def task_assigned(task_id):
+    """Notify the assignee of a new task, or the members of its group but the creator"""
+    from core.metrics import record_fanout
+    from tasks.models import Task
+    task = Task.objects.select_related('group').filter(
+        pk=task_id, group__deleted_at__isnull=True
+    ).first()
+    if task is None:
+        return
+    if task.assigned_to_user_id:
+        recipients = [task.assigned_to_user_id]
+    elif task.assigned_to_group_id:
+        recipients = list(
+            task.assigned_to_group.members.exclude(id=task.created_by_id)
+            .order_by('id').values_list('id', flat=True)
+        )
+    else:
+        return
+    notified = _notified('task_assigned', related_task=task)
+    recipients = [recipient for recipient in recipients if recipient not in notified]
+    Notification.create_task_assignments(task, recipients)
+    record_fanout('task_assigned', len(recipients))
+
+
+def _swap(swap_id):
+    from tasks.models import TaskSwap
+    return TaskSwap.objects.select_related(
+        'requester_task', 'target_task', 'requester', 'target_user'
+    ).filter(pk=swap_id, requester_task__group__deleted_at__isnull=True).first()
+
+
+@job('notifications.swap_requested', atomic=False)
+def swap_requested(swap_id):
+    """Notify the target user of a swap request"""
+    swap = _swap(swap_id)
+    if swap is not None and swap.target_user_id not in _notified('swap_requested', related_swap=swap):
+        # Fail the job, and so retry it, if the insert is not committed
+        wait(Notification.create_swap_request(swap))
+
+
+@job('notifications.swap_approved', atomic=False)
+def swap_approved(swap_id):
+    """Notify the requester of an approved swap"""
+    swap = _swap(swap_id)
+    if swap is not None and swap.requester_id not in _notified('swap_approved', related_swap=swap):
+        wait(Notification.create_swap_approved(swap))
@@ -0,0 +1,21 @@
+# Generated by Django 5.2 on 2026-10-19 15:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0005_groupmembership_joined_at_index'),
+        ('notifications', '0002_initial'),
+        ('tasks', '0005_task_visibility'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['created_at'], name='notificatio_created_46ad24_idx'),
+        ),
+    ]
@@ -1,7 +1,39 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 
 
+class NotificationQuerySet(models.QuerySet):
+    # Changed notifications are logged for sync this many at a time
+    log_chunk_size = 1000
+
+    def mark_read(self, read_at=None):
+        """Mark the unread notifications as read in one UPDATE"""
+        from django.utils import timezone
+        return self._set_read(self.filter(is_read=False), True, read_at or timezone.now())
+
+    def mark_unread(self):
+        """Mark the read notifications as unread in one UPDATE"""
+        return self._set_read(self.filter(is_read=True), False, None)
+
+    def _set_read(self, queryset, is_read, read_at):
+        from sync.changes import record_each
+        queryset = queryset.order_by()
+        with transaction.atomic():
+            # Queryset updates send no signals, so log the change for sync
+            # here, one chunk of the selection at a time
+            last = 0
+            while True:
+                changed = list(
+                    queryset.filter(pk__gt=last).order_by('pk')
+                    .values_list('id', 'recipient_id')[:self.log_chunk_size]
+                )
+                if not changed:
+                    break
+                record_each('notification', changed)
+                last = changed[-1][0]
+            return queryset.update(is_read=is_read, read_at=read_at)
+
+
 class Notification(models.Model):
     """Notification model for task assignments, swaps, and reminders"""
 
@@ -51,24 +83,49 @@ class Notification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     read_at = models.DateTimeField(null=True, blank=True)
 
+    objects = NotificationQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Default ordering of the admin changelist and its date hierarchy
+            models.Index(fields=['created_at']),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.recipient.user_id}"
 
     def mark_as_read(self):
-        """Mark notification as read"""
+        """Mark notification as read.
+
+        The update goes through the write coalescer; the returned future
+        resolves once it is committed (None if already read).
+        """
         if not self.is_read:
             from django.utils import timezone
+            from core.coalescer import coalesced_write
             self.is_read = True
             self.read_at = timezone.now()
-            self.save()
+            return coalesced_write(
+                Notification.objects.filter(pk=self.pk).mark_read,
+                read_at=self.read_at
+            )
+        return None
+
+    @classmethod
+    def _create(cls, **fields):
+        """Queue a notification insert on the write coalescer.
+
+        Returns the future of the insert, resolving to the notification once
+        it is committed.
+        """
+        from core.coalescer import coalesced_insert
+        return coalesced_insert(cls(**fields))
 
     @classmethod
     def create_task_assigned(cls, task, recipient):
         """Create notification for task assignment"""
-        return cls.objects.create(
+        return cls._create(
             recipient=recipient,
             notification_type='task_assigned',
             title=f'New task assigned: {task.title}',
@@ -77,10 +134,46 @@ class Notification(models.Model):
             related_group=task.group
         )
 
+    @classmethod
+    def _bulk_create(cls, notifications):
+        """Insert notifications in batches, sending post_save for each"""
+        from core.coalescer import bulk_insert
+        return bulk_insert(cls, notifications, batch_size=500)
+
+    @classmethod
+    def create_task_assignments(cls, task, recipient_ids):
+        """Create task assignment notifications for many users with one insert"""
+        return cls._bulk_create([
+            cls(
+                recipient_id=recipient_id,
+                notification_type='task_assigned',
+                title=f'New task assigned: {task.title}',
+                message=f'You have been assigned a new task: {task.title}',
+                related_task=task,
+                related_group=task.group
+            )
+            for recipient_id in recipient_ids
+        ])
+
+    @classmethod
+    def create_group_invitations(cls, group, recipients, invited_by):
+        """Create group invitation notifications with one insert"""
+        notifications = [
+            cls(
+                recipient=recipient,
+                notification_type='group_invitation',
+                title=f'Added to group: {group.name}',
+                message=f'{invited_by.first_name} added you to the group "{group.name}"',
+                related_group=group
+            )
+            for recipient in recipients
+        ]
+        return cls._bulk_create(notifications)
+
     @classmethod
     def create_swap_request(cls, swap_request):
         """Create notification for swap request"""
-        return cls.objects.create(
+        return cls._create(
             recipient=swap_request.target_user,
             notification_type='swap_requested',
             title=f'Task swap request: {swap_request.requester_task.title} ↔ {swap_request.target_task.title}',
@@ -92,7 +185,7 @@ class Notification(models.Model):
     @classmethod
     def create_swap_approved(cls, swap_request):
         """Create notification for approved swap"""
-        return cls.objects.create(
+        return cls._create(
             recipient=swap_request.requester,
             notification_type='swap_approved',
             title=f'Swap approved: {swap_request.requester_task.title} ↔ {swap_request.target_task.title}',
@@ -2,11 +2,13 @@ from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
+from core.coalescer import wait
+from core.routers import ReplicaReadMixin
 from .models import Notification
 from .serializers import NotificationSerializer
 
 
-class NotificationListView(generics.ListAPIView):
+class NotificationListView(ReplicaReadMixin, generics.ListAPIView):
     """List user's notifications"""
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -20,7 +22,9 @@ class NotificationListView(generics.ListAPIView):
 def mark_notification_read(request, notification_id):
     """Mark notification as read"""
     notification = get_object_or_404(Notification, id=notification_id, recipient=request.user)
-    notification.mark_as_read()
+    update = notification.mark_as_read()
+    if update is not None:
+        wait(update)  # Report success only once the update is committed
     return Response(NotificationSerializer(notification).data)
 
 
@@ -28,10 +32,8 @@ def mark_notification_read(request, notification_id):
 @permission_classes([permissions.IsAuthenticated])
 def mark_all_read(request):
     """Mark all notifications as read"""
-    notifications = Notification.objects.filter(recipient=request.user, is_read=False)
-    for notification in notifications:
-        notification.mark_as_read()
-    return Response({'message': f'Marked {notifications.count()} notifications as read'})
+    count = Notification.objects.filter(recipient=request.user).mark_read()
+    return Response({'message': f'Marked {count} notifications as read'})
 
 
 @api_view(['GET'])
@@ -0,0 +1,102 @@
+"""Writing the per-user change log read by the sync endpoint.
+
+Every change is fanned out to one ``ChangeLog`` row per user who can see the
+object, so a sync only reads the user's own rows after their token. The
+sequence is the table's autoincrement key: SQLite admits one writer at a
+time, so sequence order is commit order and a token never skips a change
+that commits later.
+"""
+from django.db import connections, router
+from django.utils import timezone
+
+UPSERT = 'upsert'
+DELETE = 'delete'
+
+
+def _insert(kind, op, changes):
+    """Insert (object_id, user_id) changes.
+
+    Fan-outs can reach a hundred thousand rows (a member joining a big group
+    sees every membership), where building ChangeLog instances for
+    bulk_create costs several times the insert itself, so rows go straight
+    to executemany.
+    """
+    from .models import ChangeLog
+    connection = connections[router.db_for_write(ChangeLog)]
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(name) for name in ('user_id', 'kind', 'object_id', 'op', 'created_at'))
+    sql = f'INSERT INTO {quote(ChangeLog._meta.db_table)} ({columns}) VALUES (%s, %s, %s, %s, %s)'
+    created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    rows = [(user_id, kind, object_id, op, created_at) for object_id, user_id in changes]
+    if rows:
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+
+
+def record(kind, object_ids, user_ids, op=UPSERT):
+    """Log a change of the objects for each of the users"""
+    user_ids = set(user_ids) - {None}
+    _insert(kind, op, ((object_id, user_id) for object_id in object_ids for user_id in user_ids))
+
+
+def record_each(kind, changes, op=UPSERT):
+    """Log changes given as (object_id, user_id) pairs"""
+    _insert(kind, op, changes)
+
+
+def group_members(group_id):
+    from groups.models import GroupMembership
+    return list(GroupMembership.objects.filter(group_id=group_id).values_list('user_id', flat=True))
+
+
+def task_assignees(state):
+    """Users whose task list includes a task, from its stats snapshot"""
+    if state is None:
+        return set()
+    if state['assigned_to_group_id']:
+        return set(group_members(state['assigned_to_group_id']))
+    return {state['assigned_to_user_id']} - {None}
+
+
+def swap_participants(swap):
+    """Requester, target user and the admin of the requester task's group"""
+    from groups.models import Group
+    admin_id = Group.objects.filter(tasks__id=swap.requester_task_id).values_list(
+        'creator_id', flat=True
+    ).first()
+    return {swap.requester_id, swap.target_user_id, admin_id} - {None}
+
+
+def group_assigned_tasks(group_id):
+    from tasks.models import Task
+    return list(Task.objects.filter(assigned_to_group_id=group_id).values_list('id', flat=True))
+
+
+def member_joined(membership):
+    """Log a new membership for the group and the group's state for the new member"""
+    members_joined(membership.group_id, [membership])
+
+
+def members_joined(group_id, memberships):
+    """Log new memberships for the group and the group's state for the new members"""
+    from groups.models import GroupMembership
+    new_ids = [membership.pk for membership in memberships]
+    new_members = [membership.user_id for membership in memberships]
+    members = group_members(group_id)
+    record('membership', new_ids, members)
+    record('group', [group_id], members)
+    others = GroupMembership.objects.filter(group_id=group_id).exclude(pk__in=new_ids)
+    record('membership', others.values_list('id', flat=True), new_members)
+    record('task', group_assigned_tasks(group_id), new_members)
+
+
+def member_leaving(membership):
+    """Log a membership removal, revoking what the member saw through the group"""
+    others = set(group_members(membership.group_id)) - {membership.user_id}
+    record('membership', [membership.pk], others, DELETE)
+    record('group', [membership.group_id], others)
+    # A group tombstone also drops the group's memberships on the client
+    record('group', [membership.group_id], [membership.user_id], DELETE)
+    # Tasks assigned to the member directly stay in their list
+    record('task', group_assigned_tasks(membership.group_id), [membership.user_id], DELETE)
+
@@ -0,0 +1,17 @@
+"""Background jobs writing the change log.
+
+Bulk membership changes fan out to members squared rows (every member sees
+every new membership and the reverse), too many to write in the request.
+"""
+from jobs.queue import job
+
+from . import changes
+
+
+@job('sync.members_joined')
+def members_joined(group_id, membership_ids):
+    """Log memberships added in bulk that still exist"""
+    from groups.models import GroupMembership
+    memberships = list(GroupMembership.objects.filter(group_id=group_id, pk__in=membership_ids))
+    if memberships:
+        changes.members_joined(group_id, memberships)
@@ -0,0 +1,50 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from sync.models import ChangeLog, SyncHorizon
+
+
+class Command(BaseCommand):
+    help = 'Delete sync change log entries older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            default=getattr(settings, 'SYNC_RETENTION_DAYS', 30),
+                            help='Keep changes from the last this many days')
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        # Sequence numbers grow with time, so everything below the first
+        # change to keep can go
+        keep = (
+            ChangeLog.objects.filter(created_at__gte=cutoff)
+            .order_by('id').values_list('id', flat=True).first()
+        )
+        horizon = keep - 1 if keep is not None else (
+            ChangeLog.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        )
+        current = SyncHorizon.current()
+        if horizon <= current:
+            self.stdout.write(self.style.SUCCESS('Nothing to prune'))
+            return
+
+        # Move the horizon first so tokens in the pruned range get 410 at once
+        SyncHorizon.objects.update_or_create(pk=1, defaults={'seq': horizon})
+
+        deleted = 0
+        start = current
+        while start < horizon:
+            end = min(start + options['batch_size'], horizon)
+            with transaction.atomic():
+                count, _ = ChangeLog.objects.filter(id__gt=start, id__lte=end).delete()
+            deleted += count
+            start = end
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Pruned {deleted} changes up to sequence {horizon}'
+        ))
@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.db import models
+
+
+class ChangeLog(models.Model):
+    """One change to an object a user can see, in commit order.
+
+    The primary key is the change sequence that sync tokens refer to. Rows are
+    written by the signal handlers in sync.signals and removed by the
+    ``prune_changelog`` command.
+    """
+
+    KINDS = [
+        ('task', 'Task'),
+        ('group', 'Group'),
+        ('membership', 'Group Membership'),
+        ('swap', 'Task Swap'),
+        ('notification', 'Notification'),
+    ]
+
+    OPS = [
+        ('upsert', 'Created or Changed'),
+        ('delete', 'Deleted or No Longer Visible'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='changes'
+    )
+    kind = models.CharField(max_length=20, choices=KINDS)
+    object_id = models.BigIntegerField()
+    op = models.CharField(max_length=10, choices=OPS, default='upsert')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.id}: {self.op} {self.kind} {self.object_id} for {self.user_id}"
+
+
+class SyncHorizon(models.Model):
+    """Highest change sequence removed by ``prune_changelog`` (a single row).
+
+    Tokens older than the horizon may have missed changes and must resync.
+    """
+    seq = models.BigIntegerField(default=0)
+    pruned_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Sync horizon: {self.seq}"
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=1).values_list('seq', flat=True).first() or 0
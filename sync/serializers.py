@@ -0,0 +1,8 @@
+from groups.serializers import GroupMembershipSerializer
+
+
+class SyncMembershipSerializer(GroupMembershipSerializer):
+    """Group membership with the ids a client needs to apply it"""
+
+    class Meta(GroupMembershipSerializer.Meta):
+        fields = ['id', 'group'] + GroupMembershipSerializer.Meta.fields
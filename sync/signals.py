@@ -0,0 +1,143 @@
+from collections import defaultdict
+
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from groups.models import Group, GroupMembership
+from groups.signals import members_bulk_added, pre_purge
+from notifications.models import Notification
+from tasks import stats, visibility
+from tasks.models import Task, TaskSwap
+from tasks.signals import tasks_bulk_created, tasks_bulk_updated
+
+from . import changes
+from .changes import DELETE
+
+# These receivers run after the tasks app's (sync is installed later), so the
+# task snapshot they read in pre_save is already loaded.
+
+
+def _task_state(task):
+    state = stats.snapshot_task(task)
+    if state is None:
+        state = Task.objects.filter(pk=task.pk).values(*stats.SNAPSHOT_FIELDS).first()
+    return state
+
+
+def _deleting_group(origin):
+    """Whether a cascade started from deleting groups"""
+    return isinstance(origin, Group) or getattr(origin, 'model', None) is Group
+
+
+@receiver(pre_save, sender=Task)
+def remember_task_assignees(sender, instance, raw=False, **kwargs):
+    if not raw and not instance._state.adding:
+        instance._sync_state = getattr(instance, '_stats_snapshot', None)
+
+
+@receiver(post_save, sender=Task)
+def log_task_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new = _task_state(instance)
+    assignees = changes.task_assignees(new)
+    changes.record('task', [instance.pk], assignees)
+    old = None if created else getattr(instance, '_sync_state', None)
+    if old is not None and visibility.visibility_changed(old, new):
+        changes.record('task', [instance.pk], changes.task_assignees(old) - assignees, DELETE)
+
+
+@receiver(tasks_bulk_created, sender=Task)
+@receiver(tasks_bulk_updated, sender=Task)
+def log_tasks_bulk_write(sender, tasks, **kwargs):
+    by_group, by_user = defaultdict(list), defaultdict(list)
+    for task in tasks:
+        if task.assigned_to_group_id:
+            by_group[task.assigned_to_group_id].append(task.pk)
+        else:
+            by_user[task.assigned_to_user_id].append(task.pk)
+    for group_id, task_ids in by_group.items():
+        changes.record('task', task_ids, changes.group_members(group_id))
+    for user_id, task_ids in by_user.items():
+        changes.record('task', task_ids, [user_id])
+
+
+@receiver(pre_delete, sender=Task)
+def log_task_delete(sender, instance, **kwargs):
+    changes.record('task', [instance.pk], changes.task_assignees(_task_state(instance)), DELETE)
+
+
+@receiver(post_save, sender=Group)
+def log_group_save(sender, instance, created, raw=False, **kwargs):
+    # A new group becomes visible through its creator's membership
+    if not raw and not created:
+        changes.record('group', [instance.pk], changes.group_members(instance.pk))
+
+
+@receiver(pre_delete, sender=Group)
+def log_group_delete(sender, instance, **kwargs):
+    changes.record('group', [instance.pk], changes.group_members(instance.pk), DELETE)
+
+
+@receiver(pre_purge, sender=TaskSwap)
+def log_swaps_purge(sender, ids, **kwargs):
+    # The group is already deleted, so its admin is read through the task
+    rows = TaskSwap.objects.filter(id__in=ids).values_list(
+        'id', 'requester_id', 'target_user_id', 'requester_task__group__creator_id'
+    )
+    changes.record_each(
+        'swap', [(row[0], user_id) for row in rows for user_id in set(row[1:])], DELETE
+    )
+
+
+@receiver(pre_purge, sender=Notification)
+def log_notifications_purge(sender, ids, **kwargs):
+    changes.record_each(
+        'notification',
+        Notification.objects.filter(id__in=ids).values_list('id', 'recipient_id'),
+        DELETE
+    )
+
+
+@receiver(post_save, sender=GroupMembership)
+def log_member_join(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        changes.member_joined(instance)
+
+
+@receiver(members_bulk_added, sender=Group)
+def log_members_bulk_join(sender, group, memberships, **kwargs):
+    from jobs.queue import enqueue
+    from .jobs import members_joined
+    # Queued in the transaction that adds the members
+    enqueue(members_joined, group_id=group.pk,
+            membership_ids=[membership.pk for membership in memberships])
+
+
+@receiver(pre_delete, sender=GroupMembership)
+def log_member_leave(sender, instance, origin=None, **kwargs):
+    # Members of a deleted group get the group tombstone instead
+    if not _deleting_group(origin):
+        changes.member_leaving(instance)
+
+
+@receiver(post_save, sender=TaskSwap)
+def log_swap_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        changes.record('swap', [instance.pk], changes.swap_participants(instance))
+
+
+@receiver(pre_delete, sender=TaskSwap)
+def log_swap_delete(sender, instance, **kwargs):
+    changes.record('swap', [instance.pk], changes.swap_participants(instance), DELETE)
+
+
+@receiver(post_save, sender=Notification)
+def log_notification_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        changes.record('notification', [instance.pk], [instance.recipient_id])
+
+
+@receiver(pre_delete, sender=Notification)
+def log_notification_delete(sender, instance, **kwargs):
+    changes.record('notification', [instance.pk], [instance.recipient_id], DELETE)
@@ -0,0 +1,85 @@
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from groups.models import Group
+from tasks.models import Task
+from users.models import User
+from .models import SyncHorizon
+
+
+@override_settings(RATE_LIMIT_ENABLED=False, SYNC_PAGE_SIZE=1000)
+class SyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='alice@example.com', username='alice', password='x', first_name='Alice', last_name='Test'
+        )
+        cls.group = Group.objects.create(name='Chores', creator=cls.user)
+        cls.group.add_member(cls.user)
+        cls.task = cls.create_task('Dishes')
+
+    @classmethod
+    def create_task(cls, title):
+        return Task.objects.create(group=cls.group, created_by=cls.user, assigned_to_user=cls.user, title=title)
+
+    def sync(self, since=None, status=200):
+        response = self.client.get(
+            '/api/sync/', {} if since is None else {'since': since},
+            HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}'
+        )
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def sync_all(self, since=None):
+        """Follow has_more; return the pages"""
+        pages = [self.sync(since)]
+        while pages[-1]['has_more']:
+            pages.append(self.sync(pages[-1]['token']))
+        return pages
+
+    def test_delta_returns_only_later_changes(self):
+        token = self.sync()['token']
+        self.assertEqual(self.sync(token)['changes']['tasks'], [])
+        task = self.create_task('Bins')
+        data = self.sync(token)
+        self.assertEqual([item['id'] for item in data['changes']['tasks']], [task.id])
+        self.assertGreater(int(data['token']), int(token))
+        self.assertEqual(self.sync(data['token'])['changes']['tasks'], [])
+
+    def test_deletes_are_tombstones(self):
+        token = self.sync()['token']
+        task_id = self.task.id
+        self.task.delete()
+        data = self.sync(token)
+        self.assertEqual(data['deleted']['tasks'], [task_id])
+        self.assertEqual(data['changes']['tasks'], [])
+
+    def test_tokens_outside_the_log_are_refused(self):
+        token = int(self.sync()['token'])
+        self.sync(token + 1, status=410)
+        self.sync('12:tasks', status=400)
+        self.sync('abc', status=400)
+        SyncHorizon.objects.create(pk=1, seq=token)
+        self.sync(token - 1, status=410)
+        self.sync(token)
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_delta_pages_continue(self):
+        token = self.sync_all()[-1]['token']
+        created = [self.create_task(f'Task {index}').id for index in range(5)]
+        pages = self.sync_all(token)
+        self.assertEqual(len(pages), 3)
+        self.assertEqual(sorted(item['id'] for page in pages for item in page['changes']['tasks']), created)
+
+    @override_settings(SYNC_PAGE_SIZE=2)
+    def test_snapshot_pages_continue(self):
+        created = [self.task.id] + [self.create_task(f'Task {index}').id for index in range(3)]
+        head = self.sync_all()[-1]['token']
+        pages = self.sync_all()
+        # 4 tasks, 1 group and 1 membership
+        self.assertEqual(len(pages), 3)
+        self.assertEqual([item['id'] for page in pages for item in page['changes']['tasks']], created)
+        self.assertEqual(sum(len(page['changes']['groups']) for page in pages), 1)
+        self.assertEqual(sum(len(page['changes']['memberships']) for page in pages), 1)
+        # The last page hands over to the delta sync from where the snapshot started
+        self.assertEqual(pages[-1]['token'], head)
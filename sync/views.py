@@ -0,0 +1,185 @@
+from django.conf import settings
+from django.db.models import Q
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from groups.models import Group, GroupMembership
+from groups.serializers import GroupListSerializer
+from notifications.models import Notification
+from notifications.serializers import NotificationSerializer
+from tasks.models import Task, TaskSwap
+from tasks.serializers import TaskSerializer, TaskSwapSerializer
+
+from .models import ChangeLog, SyncHorizon
+from .serializers import SyncMembershipSerializer
+
+
+# Relations read by TaskSerializer; prefetched members also serve the
+# member counts and group assignment checks
+TASK_RELATED = ('assigned_to_user', 'assigned_to_group__creator', 'created_by', 'group__creator')
+TASK_PREFETCH = ('assigned_to_group__members', 'group__members')
+
+
+def _nested(prefix, names):
+    return [f'{prefix}__{name}' for name in names]
+
+
+def visible_tasks(user):
+    return (
+        Task.objects.filter(
+            visibility__user=user, visibility__assigned=True, group__deleted_at__isnull=True
+        )
+        .select_related(*TASK_RELATED)
+        .prefetch_related(*TASK_PREFETCH)
+    )
+
+
+def visible_groups(user):
+    return Group.objects.filter(members=user).select_related('creator').prefetch_related('members')
+
+
+def visible_memberships(user):
+    return GroupMembership.objects.filter(
+        group__members=user, group__deleted_at__isnull=True
+    ).select_related('user', 'added_by')
+
+
+def visible_swaps(user):
+    return TaskSwap.objects.filter(
+        Q(requester=user) |
+        Q(target_user=user) |
+        Q(requester_task__group__creator=user),
+        requester_task__group__deleted_at__isnull=True
+    ).distinct().select_related(
+        'requester', 'target_user',
+        *_nested('requester_task', TASK_RELATED), *_nested('target_task', TASK_RELATED)
+    ).prefetch_related(
+        *_nested('requester_task', TASK_PREFETCH), *_nested('target_task', TASK_PREFETCH)
+    )
+
+
+def visible_notifications(user):
+    return Notification.objects.filter(recipient=user)
+
+
+# Change log kind: (response key, objects the user can see, serializer)
+SYNC_KINDS = {
+    'task': ('tasks', visible_tasks, TaskSerializer),
+    'group': ('groups', visible_groups, GroupListSerializer),
+    'membership': ('memberships', visible_memberships, SyncMembershipSerializer),
+    'swap': ('swaps', visible_swaps, TaskSwapSerializer),
+    'notification': ('notifications', visible_notifications, NotificationSerializer),
+}
+
+
+def _head():
+    """Latest change sequence; sequence numbers are never reused"""
+    latest = ChangeLog.objects.order_by('-id').values_list('id', flat=True).first() or 0
+    return max(latest, SyncHorizon.current())
+
+
+def _snapshot_page(user, context, kind, after, page_size):
+    """One page of everything the user can see, in kind and then id order.
+
+    Starts after object ``after`` of ``kind``. Returns the serialized
+    objects by response key and the (kind, id) position to continue from,
+    or None after the last page.
+    """
+    changes = {key: [] for key, _, _ in SYNC_KINDS.values()}
+    kinds = list(SYNC_KINDS)
+    remaining = page_size
+    for name in kinds[kinds.index(kind):]:
+        key, queryset, serializer = SYNC_KINDS[name]
+        start = after if name == kind else 0
+        objects = list(queryset(user).filter(id__gt=start).order_by('id')[:remaining + 1])
+        page = objects[:remaining]
+        changes[key] = serializer(page, many=True, context=context).data
+        if len(objects) > remaining:
+            return changes, (name, page[-1].id if page else start)
+        remaining -= len(page)
+    return changes, None
+
+
+def _parse_token(token):
+    """Return (sequence, snapshot position or None), or None if malformed.
+
+    Delta tokens are a change sequence; the tokens of a paged snapshot are
+    "<sequence>:<kind>:<id>", the sequence being the head when the snapshot
+    started.
+    """
+    parts = token.split(':')
+    if len(parts) not in (1, 3) or not all(part.isascii() and part.isdigit() for part in parts[::2]):
+        return None
+    if len(parts) == 1:
+        return int(parts[0]), None
+    if parts[1] not in SYNC_KINDS:
+        return None
+    return int(parts[0]), (parts[1], int(parts[2]))
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def sync(request):
+    """Objects created, changed or deleted since a sync token.
+
+    Without a token, returns everything the user can see, a page at a time.
+    Either way the response carries the token for the next call.
+    """
+    head = _head()
+    context = {'request': request}
+    page_size = getattr(settings, 'SYNC_PAGE_SIZE', 1000)
+    since = request.query_params.get('since')
+    parsed = (head, (next(iter(SYNC_KINDS)), 0)) if since is None else _parse_token(since)
+    if parsed is None:
+        return Response({'error': 'Invalid sync token'},
+                       status=status.HTTP_400_BAD_REQUEST)
+    since, position = parsed
+    # A token from the future was not issued by this server (or its data was
+    # restored from a backup); the client's state cannot be trusted
+    if since < SyncHorizon.current() or since > head:
+        return Response({'error': 'Sync token has expired; sync again without a token'},
+                       status=status.HTTP_410_GONE)
+
+    if position is not None:
+        changes, position = _snapshot_page(request.user, context, *position, page_size)
+        # Changes made while paging are read by the delta sync from the
+        # snapshot's starting sequence
+        return Response({
+            'token': f'{since}:{position[0]}:{position[1]}' if position else str(since),
+            'has_more': position is not None,
+            'changes': changes,
+            'deleted': {key: [] for key, _, _ in SYNC_KINDS.values()},
+        })
+
+    entries = list(
+        ChangeLog.objects.filter(user=request.user, id__gt=since, id__lte=head)
+        .order_by('id')
+        .values_list('id', 'kind', 'object_id', 'op')[:page_size + 1]
+    )
+    has_more = len(entries) > page_size
+    entries = entries[:page_size]
+
+    # Only the latest change of each object matters
+    latest = {}
+    for _, kind, object_id, op in entries:
+        latest[kind, object_id] = op
+
+    changes, deleted = {}, {}
+    for kind, (key, queryset, serializer) in SYNC_KINDS.items():
+        upserted = [object_id for (k, object_id), op in latest.items() if k == kind and op == 'upsert']
+        objects = list(queryset(request.user).filter(id__in=upserted)) if upserted else []
+        found = {obj.id for obj in objects}
+        changes[key] = serializer(objects, many=True, context=context).data
+        # Objects that are gone or no longer visible become tombstones too
+        deleted[key] = sorted(
+            object_id for (k, object_id), op in latest.items()
+            if k == kind and (op == 'delete' or object_id not in found)
+        )
+
+    return Response({
+        'token': str(entries[-1][0] if has_more else head),
+        'has_more': has_more,
+        'changes': changes,
+        'deleted': deleted,
+    })
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,9 +45,17 @@ INSTALLED_APPS = [
     'groups',
     'tasks',
     'notifications',
+    'core',
+    'sync',
+    'webhooks',
+    'jobs',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.QueryInstrumentationMiddleware',
+    'core.profiling.ProfilingMiddleware',
+    'core.routers.ReplicaStickinessMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -55,6 +64,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.idempotency.IdempotencyMiddleware',
 ]
 
 ROOT_URLCONF = 'task_sphere_backend.urls'
@@ -84,9 +94,65 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        # Reuse connections across requests instead of reopening per request
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Transactions take the write lock up front, so two transactions
+            # never deadlock upgrading read locks (immediate "database is locked")
+            'transaction_mode': 'IMMEDIATE',
+            # busy_timeout: seconds to wait for the write lock before failing
+            'timeout': 20,
+            # WAL lets readers run alongside the writer; the other pragmas trade
+            # fsyncs on every commit and small page caches for memory
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA cache_size=-64000;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
+    },
+    # Local read replica: a copy of the primary kept current by the
+    # sync_replicas command. Used only when listed in READ_REPLICAS.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'init_command': (
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA cache_size=-64000;'
+                'PRAGMA temp_store=MEMORY;'
+            ),
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Cache shared by the worker processes of a host (replica stickiness and the
+# calendar feed rely on it). Point CACHE_DIR at a tmpfs such as /dev/shm, or
+# switch to Redis or Memcached when serving from several hosts.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR', str(BASE_DIR / 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Aliases that list endpoints may read from (e.g. READ_REPLICAS=replica).
+# After a write, a user's reads stay on the primary for REPLICA_STICKY_SECONDS;
+# the writes are recorded in the default cache, which must be shared between
+# worker processes (checked as core.E001).
+READ_REPLICAS = [alias for alias in os.environ.get('READ_REPLICAS', '').split(',') if alias]
+REPLICA_STICKY_SECONDS = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -141,9 +207,161 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 20
+    'PAGE_SIZE': 20,
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.ratelimit.TokenBucketThrottle',
+    ],
+}
+
+# Token-bucket rate limits by URL name (see core.ratelimit): per authenticated
+# user, per client IP and for the route as a whole, as "<count>/<period>".
+# Buckets are shared by the workers of a host through RATE_LIMIT_FILE
+# (defaults to /dev/shm/task_sphere_ratelimit).
+RATE_LIMITS = {
+    'user-login': {'ip': '10/minute', 'route': '20/second'},
+    'user-register': {'ip': '5/minute', 'route': '10/second'},
+    'token-refresh': {'ip': '30/minute', 'route': '50/second'},
+    'user-search': {'user': '60/minute', 'ip': '120/minute'},
+}
+RATE_LIMIT_FILE = os.environ.get('RATE_LIMIT_FILE')
+RATE_LIMIT_SLOTS = 65536
+
+# Group commit of small independent writes (notification inserts and read
+# flags); see core.coalescer. Queued writes are committed together every
+# MAX_DELAY_MS or once MAX_BATCH are waiting.
+WRITE_COALESCER = {
+    'ENABLED': True,
+    'MAX_BATCH': 200,
+    'MAX_DELAY_MS': 5,
+}
+
+# Requests slower than this are logged to task_sphere.slow_requests with
+# their SQL statements (see core.middleware.QueryInstrumentationMiddleware)
+SLOW_REQUEST_THRESHOLD_MS = 500
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'task_sphere.slow_requests': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
 }
 
+# On-demand request profiling (see core.profiling.ProfilingMiddleware).
+# Requests sending "X-Profile: <PROFILING_TOKEN>" are profiled, as well as a
+# random PROFILING_SAMPLE_RATE share of all requests.
+PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_DIR = BASE_DIR / 'profiles'
+PROFILING_MAX_FILES = 50
+
+# Prometheus metrics served at /metrics (see core.metrics). Each server
+# worker process writes its samples to METRICS_DIR every
+# METRICS_FLUSH_INTERVAL seconds so that a scrape covers all workers; the
+# files of exited workers are folded into one archive file. Management
+# commands do not write there. Scrapes must send METRICS_TOKEN as a bearer
+# token; without a token the endpoint is only served when DEBUG is on.
+METRICS_DIR = os.environ.get('METRICS_DIR', str(BASE_DIR / 'metrics'))
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Delta sync (see sync.views). A sync returns at most SYNC_PAGE_SIZE changes
+# (or objects, for a sync from scratch); prune_changelog drops changes older
+# than SYNC_RETENTION_DAYS, after which older tokens get 410 and clients must
+# resync from scratch.
+SYNC_PAGE_SIZE = 1000
+SYNC_RETENTION_DAYS = 30
+
+# Batch endpoint (see core.batch): at most BATCH_MAX_REQUESTS sub-requests per
+# call, served in order on the request's thread.
+BATCH_MAX_REQUESTS = 20
+
+# POSTs sent with an Idempotency-Key header (see core.idempotency): responses
+# are replayed to retries for IDEMPOTENCY_TTL seconds, and a retry waits up to
+# IDEMPOTENCY_WAIT_SECONDS for a request with the same key still running.
+IDEMPOTENCY_TTL = 24 * 3600
+IDEMPOTENCY_WAIT_SECONDS = 10
+IDEMPOTENCY_LOCK_TIMEOUT = 60
+
+# Deleted groups are hidden at once and their rows purged in batches of
+# GROUP_PURGE_BATCH_SIZE (see groups.deletion), on a thread of the web process
+# unless GROUP_PURGE_IN_BACKGROUND is off and purge_deleted_groups runs instead.
+GROUP_PURGE_BATCH_SIZE = 500
+GROUP_PURGE_IN_BACKGROUND = True
+
+# Most user ids accepted by one POST /api/groups/<id>/add-members/ call
+GROUP_ADD_MEMBERS_MAX = 500
+
+# Admin changelists of unfiltered tables with at least this many rows show an
+# estimated count instead of running COUNT(*) (see core.admin)
+ADMIN_ESTIMATED_COUNT_MIN = 10000
+
+# Occurrences of recurring tasks are created RECURRENCE_HORIZON_DAYS ahead by
+# generate_recurring_tasks, RECURRENCE_BATCH_SIZE at a time. Reads of a date
+# range create at most RECURRENCE_REQUEST_LIMIT missing ones within the
+# horizon. Cron rules must leave RECURRENCE_MIN_INTERVAL_MINUTES between
+# occurrences.
+RECURRENCE_HORIZON_DAYS = 14
+RECURRENCE_BATCH_SIZE = 500
+RECURRENCE_REQUEST_LIMIT = 200
+RECURRENCE_MIN_INTERVAL_MINUTES = 60
+
+# Calendar range queries span at most CALENDAR_MAX_RANGE_DAYS. The iCalendar
+# feed lists tasks due from the day CALENDAR_FEED_PAST_DAYS ago on and is kept
+# in the default cache per user and version for CALENDAR_FEED_CACHE_SECONDS
+# (see tasks.calendar)
+CALENDAR_MAX_RANGE_DAYS = 366
+CALENDAR_FEED_PAST_DAYS = 90
+CALENDAR_FEED_CACHE_SECONDS = 86400
+
+# Webhooks: events are written to an outbox in the transaction of the change
+# and delivered by `python manage.py dispatch_webhooks` in signed JSON batches
+# of up to WEBHOOK_BATCH_SIZE events, WEBHOOK_MAX_WORKERS endpoints at a time.
+# Failed batches are retried with exponential backoff (WEBHOOK_BACKOFF_BASE
+# seconds, doubling up to WEBHOOK_BACKOFF_MAX) and dead-lettered after
+# WEBHOOK_MAX_ATTEMPTS attempts. WEBHOOK_TIMEOUT is the socket timeout of a
+# request; the dispatcher renews an endpoint's lease every WEBHOOK_TIMEOUT
+# seconds while its request goes on. `prune_webhook_events` removes delivered
+# events older than WEBHOOK_RETENTION_DAYS. Endpoint hosts must resolve to
+# public addresses unless WEBHOOK_ALLOW_PRIVATE_ADDRESSES is set (e.g. to use
+# run_webhook_receiver locally).
+WEBHOOK_BATCH_SIZE = 50
+WEBHOOK_MAX_WORKERS = 8
+WEBHOOK_TIMEOUT = 10
+WEBHOOK_MAX_ATTEMPTS = 8
+WEBHOOK_BACKOFF_BASE = 10
+WEBHOOK_BACKOFF_MAX = 3600
+WEBHOOK_RETENTION_DAYS = 7
+WEBHOOK_ALLOW_PRIVATE_ADDRESSES = os.environ.get('WEBHOOK_ALLOW_PRIVATE_ADDRESSES') == '1'
+
+# Background jobs: stored in the database and run by `python manage.py
+# run_jobs` with JOB_WORKERS threads or processes (JOB_POOL). A claimed job is
+# leased for JOB_LEASE_SECONDS; a failing job is retried with exponential
+# backoff (JOB_BACKOFF_BASE seconds, doubling up to JOB_BACKOFF_MAX) up to
+# JOB_MAX_ATTEMPTS times. `prune_jobs` removes jobs finished more than
+# JOB_RETENTION_DAYS ago. JOB_RUN_INLINE runs jobs right after the commit
+# instead, in the process that queued them; it defaults to DEBUG so that
+# development needs no worker. Without it, nothing is notified unless
+# run_jobs is running.
+JOB_WORKERS = 4
+JOB_POOL = 'thread'
+JOB_POLL_INTERVAL = 1.0
+JOB_LEASE_SECONDS = 300
+JOB_MAX_ATTEMPTS = 5
+JOB_BACKOFF_BASE = 5
+JOB_BACKOFF_MAX = 600
+JOB_RETENTION_DAYS = 7
+JOB_RUN_INLINE = os.environ.get('JOB_RUN_INLINE', '1' if DEBUG else '0') == '1'
+
 # JWT Configuration
 from datetime import timedelta
 
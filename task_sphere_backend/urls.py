@@ -16,6 +16,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from core.views import batch, metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -23,4 +24,9 @@ urlpatterns = [
     path('api/groups/', include('groups.urls')),
     path('api/tasks/', include('tasks.urls')),
     path('api/notifications/', include('notifications.urls')),
+    path('api/ops/', include('core.urls')),
+    path('api/sync/', include('sync.urls')),
+    path('api/webhooks/', include('webhooks.urls')),
+    path('api/batch/', batch, name='batch'),
+    path('metrics', metrics, name='metrics'),
 ]
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'task_sphere_backend.settings')
 
 application = get_wsgi_application()
+
+# Only server processes contribute to the metrics of all workers
+from core.metrics import enable_export  # noqa: E402
+
+enable_export()
@@ -1,12 +1,16 @@
 from django.contrib import admin
-from .models import Task, TaskSwap
+from core.admin import LargeTableAdmin
+from .models import Task, TaskRecurrence, TaskSwap
 
 
 @admin.register(Task)
-class TaskAdmin(admin.ModelAdmin):
+class TaskAdmin(LargeTableAdmin):
     list_display = ['title', 'priority', 'status', 'assigned_to_user', 'assigned_to_group', 'created_by', 'deadline', 'created_at']
     list_filter = ['priority', 'status', 'created_at', 'deadline']
+    list_select_related = ['assigned_to_user', 'assigned_to_group', 'created_by']
     search_fields = ['title', 'description', 'created_by__user_id', 'assigned_to_user__user_id']
+    autocomplete_fields = ['assigned_to_user', 'assigned_to_group', 'group', 'created_by']
+    date_hierarchy = 'created_at'
     readonly_fields = ['created_at', 'updated_at']
 
     fieldsets = (
@@ -22,10 +26,35 @@ class TaskAdmin(admin.ModelAdmin):
         }),
     )
 
+    actions = ['mark_completed', 'mark_cancelled']
+
+    def mark_completed(self, request, queryset):
+        count = queryset.set_status('completed')
+        self.message_user(request, f'{count} tasks marked as completed.')
+    mark_completed.short_description = 'Mark selected tasks as completed'
+
+    def mark_cancelled(self, request, queryset):
+        count = queryset.set_status('cancelled')
+        self.message_user(request, f'{count} tasks marked as cancelled.')
+    mark_cancelled.short_description = 'Mark selected tasks as cancelled'
+
+
+@admin.register(TaskRecurrence)
+class TaskRecurrenceAdmin(admin.ModelAdmin):
+    list_display = ['title', 'group', 'frequency', 'interval', 'cron', 'active', 'starts_at', 'ends_at', 'generated_until']
+    list_filter = ['frequency', 'active']
+    list_select_related = ['group']
+    search_fields = ['title', 'group__name']
+    autocomplete_fields = ['assigned_to_user', 'assigned_to_group', 'group', 'created_by']
+    readonly_fields = ['generated_until', 'created_at', 'updated_at']
+
 
 @admin.register(TaskSwap)
-class TaskSwapAdmin(admin.ModelAdmin):
+class TaskSwapAdmin(LargeTableAdmin):
     list_display = ['requester_task', 'target_task', 'requester', 'target_user', 'status', 'admin_approved', 'user_approved', 'created_at']
     list_filter = ['status', 'admin_approved', 'user_approved', 'created_at']
+    list_select_related = ['requester_task', 'target_task', 'requester', 'target_user']
     search_fields = ['requester_task__title', 'target_task__title', 'requester__user_id', 'target_user__user_id']
+    autocomplete_fields = ['requester_task', 'target_task', 'requester', 'target_user']
+    date_hierarchy = 'created_at'
     readonly_fields = ['created_at', 'updated_at', 'admin_approved_at', 'user_approved_at']
@@ -0,0 +1,173 @@
+"""Calendar views of the tasks a user sees.
+
+``calendar_tasks`` reads a user's tasks by deadline with one range scan of
+the (user, assigned, deadline) index of the visibility table.
+
+The iCalendar feed (``/api/tasks/calendar/feed/<token>.ics``) is polled by
+calendar apps, which cannot send a JWT, so it is found by a secret token. It
+lists the tasks due from the start of the day ``CALENDAR_FEED_PAST_DAYS``
+ago. Its version is that day and the user's latest task or group change in
+the sync change log, so it only moves when something the user sees changes
+or, once a day, when old tasks leave the window. Clients sending the version
+back in ``If-None-Match`` get ``304 Not Modified`` after two indexed queries;
+other requests get the feed from the default cache, which is shared by the
+workers, keyed by user and version. Only the first request after a change
+reads the tasks, streaming the feed to the client and storing it,
+compressed, as it goes.
+"""
+import zlib
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Task
+
+# Sync change kinds that can change the feed
+FEED_CHANGE_KINDS = ('task', 'group')
+# Events rendered per chunk of the streamed feed
+FEED_CHUNK_SIZE = 200
+
+ICS_PRIORITIES = {'urgent': 1, 'high': 3, 'medium': 5, 'low': 9}
+
+
+def calendar_settings():
+    return {
+        'MAX_RANGE_DAYS': getattr(settings, 'CALENDAR_MAX_RANGE_DAYS', 366),
+        'FEED_PAST_DAYS': getattr(settings, 'CALENDAR_FEED_PAST_DAYS', 90),
+        'FEED_CACHE_SECONDS': getattr(settings, 'CALENDAR_FEED_CACHE_SECONDS', 86400),
+    }
+
+
+def calendar_tasks(user, start, end):
+    """Tasks assigned to the user with a deadline in [start, end)"""
+    return Task.objects.filter(
+        visibility__user=user,
+        visibility__assigned=True,
+        visibility__deadline__gte=start,
+        visibility__deadline__lt=end,
+        group__deleted_at__isnull=True
+    ).order_by('deadline', 'id')
+
+
+def feed_window_start():
+    """Midnight, in the project time zone, of the first day the feed lists"""
+    day = timezone.localdate() - timedelta(days=calendar_settings()['FEED_PAST_DAYS'])
+    return datetime.combine(day, time.min, tzinfo=timezone.get_default_timezone())
+
+
+def feed_version(user_id, since):
+    """'<first day>.<sequence of the user's latest change that can affect the feed>'"""
+    from sync.models import ChangeLog, SyncHorizon
+    latest = (
+        ChangeLog.objects.filter(user_id=user_id, kind__in=FEED_CHANGE_KINDS)
+        .order_by('-id').values_list('id', flat=True).first()
+    )
+    # Pruned changes are below the horizon, so the version never goes back
+    return f'{since:%Y%m%d}.{latest or SyncHorizon.current()}'
+
+
+def feed_etag(user_id, version):
+    return f'"{user_id}-{version}"'
+
+
+def _cache_key(user_id, version):
+    return f'calendar-feed:{user_id}:{version}'
+
+
+def cached_feed(user_id, version):
+    """The stored feed of this version, or None"""
+    body = cache.get(_cache_key(user_id, version))
+    return zlib.decompress(body) if body is not None else None
+
+
+def _escape(text):
+    return (
+        text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+
+def _fold(line):
+    """Split a content line into 75-octet lines, as RFC 5545 requires"""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Do not split a UTF-8 sequence
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start, limit = end, 74  # Continuation lines start with a space
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _timestamp(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _event(row):
+    task_id, title, description, status, priority, deadline, updated_at, group_name = row
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:task-{task_id}@tasksphere',
+        f'DTSTAMP:{_timestamp(updated_at)}',
+        f'LAST-MODIFIED:{_timestamp(updated_at)}',
+        f'DTSTART:{_timestamp(deadline)}',
+        f'SUMMARY:{_escape(title)}',
+        f'CATEGORIES:{_escape(group_name)}',
+        f'PRIORITY:{ICS_PRIORITIES.get(priority, 0)}',
+        f"STATUS:{'CANCELLED' if status == 'cancelled' else 'CONFIRMED'}",
+    ]
+    if description:
+        lines.append(f'DESCRIPTION:{_escape(description)}')
+    lines.append('END:VEVENT')
+    return ''.join(_fold(line) for line in lines)
+
+
+def feed_rows(user_id, since):
+    """(id, title, description, status, priority, deadline, updated_at, group name) of the feed's tasks"""
+    return Task.objects.filter(
+        visibility__user_id=user_id,
+        visibility__assigned=True,
+        visibility__deadline__gte=since,
+        group__deleted_at__isnull=True
+    ).order_by('deadline', 'id').values_list(
+        'id', 'title', 'description', 'status', 'priority', 'deadline', 'updated_at', 'group__name'
+    ).iterator(chunk_size=2000)
+
+
+def stream_feed(user_id, version, since):
+    """Yield the feed in chunks and store it in the cache once it is complete"""
+    compressor = zlib.compressobj()
+    compressed = []
+
+    def emit(text):
+        data = text.encode()
+        compressed.append(compressor.compress(data))
+        return data
+
+    yield emit(''.join(_fold(line) for line in [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//TaskSphere//Tasks//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        'X-WR-CALNAME:TaskSphere',
+        'REFRESH-INTERVAL;VALUE=DURATION:PT1H',
+        'X-PUBLISHED-TTL:PT1H',
+    ]))
+    events = []
+    for row in feed_rows(user_id, since):
+        events.append(_event(row))
+        if len(events) >= FEED_CHUNK_SIZE:
+            yield emit(''.join(events))
+            events = []
+    yield emit(''.join(events) + 'END:VCALENDAR\r\n')
+
+    compressed.append(compressor.flush())
+    cache.set(_cache_key(user_id, version), b''.join(compressed),
+              calendar_settings()['FEED_CACHE_SECONDS'])
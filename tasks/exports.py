@@ -0,0 +1,110 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+from .models import Task, TaskSwap
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+# (column name, ORM lookup) pairs; lookups are fetched with values_list() so
+# no model instances are built while exporting
+TASK_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('title', 'title'),
+    ('description', 'description'),
+    ('priority', 'priority'),
+    ('status', 'status'),
+    ('deadline', 'deadline'),
+    ('assigned_to_user_id', 'assigned_to_user__user_id'),
+    ('assigned_to_group_id', 'assigned_to_group_id'),
+    ('created_by_user_id', 'created_by__user_id'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+]
+
+SWAP_EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('requester_task_id', 'requester_task_id'),
+    ('target_task_id', 'target_task_id'),
+    ('requester_user_id', 'requester__user_id'),
+    ('target_user_id', 'target_user__user_id'),
+    ('status', 'status'),
+    ('admin_approved', 'admin_approved'),
+    ('user_approved', 'user_approved'),
+    ('admin_approved_at', 'admin_approved_at'),
+    ('user_approved_at', 'user_approved_at'),
+    ('rejection_reason', 'rejection_reason'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+]
+
+
+class CSVStreamRenderer(BaseRenderer):
+    """Selects CSV output for streaming exports (?format=csv)"""
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only used for error payloads; export rows are streamed by the view
+        return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+class NDJSONStreamRenderer(BaseRenderer):
+    """Selects newline-delimited JSON output for streaming exports (?format=ndjson)"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder).encode()
+
+
+class _Echo:
+    """File-like object whose write() returns the value instead of buffering it"""
+
+    def write(self, value):
+        return value
+
+
+def _export_rows(queryset, columns, chunk_size=EXPORT_CHUNK_SIZE):
+    lookups = [lookup for _, lookup in columns]
+    return queryset.order_by('id').values_list(*lookups).iterator(chunk_size=chunk_size)
+
+
+def group_export_rows(group, dataset):
+    """Return (columns, row iterator) for a group's tasks or swap history"""
+    if dataset == 'swaps':
+        queryset = TaskSwap.objects.filter(requester_task__group=group)
+        columns = SWAP_EXPORT_COLUMNS
+    else:
+        queryset = Task.objects.filter(group=group)
+        columns = TASK_EXPORT_COLUMNS
+    return columns, _export_rows(queryset, columns)
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(columns, rows):
+    """Yield CSV lines, one row at a time"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in columns])
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+def stream_ndjson(columns, rows):
+    """Yield one JSON object per line"""
+    names = [name for name, _ in columns]
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(names, row))) + '\n'
@@ -0,0 +1,232 @@
+import csv
+import json
+
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Task
+from .signals import tasks_bulk_created
+
+
+IMPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+IMPORT_FORMATS = ('csv', 'ndjson')
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+# FK fields are resolved from the lookup tables below, so full_clean() must not
+# re-validate them with one query per row
+UNVALIDATED_FIELDS = ['assigned_to_user', 'assigned_to_group', 'created_by', 'group']
+
+
+class _DecodedLines:
+    """Iterator decoding byte lines, dropping a leading UTF-8 BOM.
+
+    ``line_no`` is the number of lines read so far. A line that is not valid
+    UTF-8 is replaced by a blank line and its error kept in ``errors`` under
+    its line number.
+    """
+
+    def __init__(self, lines):
+        self.lines = iter(lines)
+        self.line_no = 0
+        self.errors = {}
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self.lines)
+        self.line_no += 1
+        if isinstance(line, bytes):
+            try:
+                line = line.decode('utf-8')
+            except UnicodeDecodeError as exc:
+                self.errors[self.line_no] = ValueError(f'Invalid UTF-8: {exc.reason}')
+                line = '\n'
+        if self.line_no == 1:
+            line = line.lstrip('\ufeff')
+        return line
+
+    def pop_errors(self, up_to=None):
+        """Yield (line number, error) for the decode errors up to a line, in order"""
+        for line_no in sorted(self.errors):
+            if up_to is not None and line_no > up_to:
+                break
+            yield line_no, self.errors.pop(line_no)
+
+
+def iter_csv_records(lines):
+    """Yield (line number, record) pairs from CSV lines with a header row.
+
+    Undecodable and malformed lines are yielded as exceptions.
+    """
+    decoded = _DecodedLines(lines)
+    reader = csv.DictReader(decoded)
+    while True:
+        try:
+            record = next(reader)
+        except StopIteration:
+            break
+        except csv.Error as exc:
+            # The reader starts over on the next line
+            record = exc
+        # Undecodable lines read as blank lines, which the reader skips
+        yield from decoded.pop_errors(decoded.line_no - 1)
+        yield decoded.line_no, record
+    yield from decoded.pop_errors()
+
+
+def iter_ndjson_records(lines):
+    """Yield (line number, record) pairs from newline-delimited JSON"""
+    decoded = _DecodedLines(lines)
+    for line in decoded:
+        line_no = decoded.line_no
+        if line_no in decoded.errors:
+            yield line_no, decoded.errors.pop(line_no)
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield line_no, exc
+            continue
+        if not isinstance(record, dict):
+            record = ValueError('Each line must be a JSON object')
+        yield line_no, record
+
+
+class TaskImporter:
+    """Incrementally import tasks into a group from CSV or NDJSON lines.
+
+    Records are validated with the same rules as ``Task.clean`` and inserted in
+    batches, each batch in its own transaction. ``next_line`` in the result is
+    the first line that was not committed and can be passed back as
+    ``start_line`` to resume an interrupted import. Imported tasks do not send
+    assignment notifications.
+    """
+
+    def __init__(self, group, created_by, batch_size=IMPORT_BATCH_SIZE, start_line=1):
+        self.group = group
+        self.created_by = created_by
+        self.batch_size = batch_size
+        self.start_line = start_line
+        # One lookup table for every assignee in the file
+        self.members = {
+            member.user_id: member
+            for member in group.members.only('id', 'user_id')
+        }
+
+    def run(self, lines, fmt):
+        if fmt == 'csv':
+            records = iter_csv_records(lines)
+        else:
+            records = iter_ndjson_records(lines)
+
+        result = {
+            'created': 0,
+            'failed': 0,
+            'errors': [],
+            'errors_truncated': False,
+            'next_line': self.start_line,
+            'complete': False,
+        }
+        batch = []
+        batch_start = None
+        last_line = self.start_line - 1
+
+        for line_no, record in records:
+            if line_no < self.start_line:
+                continue
+            if batch_start is None:
+                batch_start = line_no
+            last_line = line_no
+
+            task, errors = self.build_task(record)
+            if errors:
+                self._report_error(result, line_no, errors)
+            else:
+                batch.append(task)
+
+            if len(batch) >= self.batch_size:
+                if not self._commit(batch, result, batch_start):
+                    return result
+                result['next_line'] = last_line + 1
+                batch = []
+                batch_start = None
+
+        if batch and not self._commit(batch, result, batch_start):
+            return result
+        result['next_line'] = last_line + 1
+        result['complete'] = True
+        return result
+
+    def build_task(self, record):
+        """Return (task, None) for a valid record, or (None, errors)"""
+        if isinstance(record, Exception):
+            return None, [str(record)]
+
+        assigned_user_id = str(record.get('assigned_to_user_id') or '').strip()
+        assign_to_group = str(record.get('assign_to_group') or '').strip().lower() in TRUE_VALUES
+        # Rows produced by the group export carry the group id instead of a flag
+        if record.get('assigned_to_group_id') not in (None, ''):
+            assign_to_group = True
+
+        assigned_to_user = None
+        if assigned_user_id:
+            assigned_to_user = self.members.get(assigned_user_id)
+            if assigned_to_user is None:
+                return None, [f'User {assigned_user_id} is not a member of the group']
+
+        deadline = record.get('deadline') or None
+        if deadline:
+            parsed = parse_datetime(str(deadline))
+            if parsed is None:
+                return None, [f'Invalid deadline: {deadline}']
+            if timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            deadline = parsed
+
+        task = Task(
+            title=record.get('title') or '',
+            description=record.get('description') or '',
+            priority=record.get('priority') or 'medium',
+            status=record.get('status') or 'not_started',
+            deadline=deadline,
+            assigned_to_user=assigned_to_user,
+            assigned_to_group=self.group if assign_to_group else None,
+            created_by=self.created_by,
+            group=self.group,
+        )
+        try:
+            task.full_clean(exclude=UNVALIDATED_FIELDS)
+        except ValidationError as exc:
+            return None, [
+                message if field == NON_FIELD_ERRORS else f'{field}: {message}'
+                for field, messages in exc.message_dict.items()
+                for message in messages
+            ]
+        return task, None
+
+    def _report_error(self, result, line_no, errors):
+        result['failed'] += 1
+        if len(result['errors']) < MAX_REPORTED_ERRORS:
+            result['errors'].append({'line': line_no, 'errors': errors})
+        else:
+            result['errors_truncated'] = True
+
+    def _commit(self, batch, result, batch_start):
+        try:
+            with transaction.atomic():
+                Task.objects.bulk_create(batch)
+                tasks_bulk_created.send(sender=Task, tasks=batch)
+        except DatabaseError as exc:
+            # Nothing from this batch was stored; resume from its first line
+            result['next_line'] = batch_start
+            result['errors'].append({'line': batch_start, 'errors': [f'Batch failed: {exc}']})
+            return False
+        result['created'] += len(batch)
+        return True
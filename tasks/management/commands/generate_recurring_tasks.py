@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from tasks.recurrence import due_rules, horizon_end, materialize, recurrence_settings
+
+
+class Command(BaseCommand):
+    help = 'Create the occurrences of recurring tasks due within the horizon'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horizon-days', type=int, default=None,
+                            help='Days ahead to materialize (default RECURRENCE_HORIZON_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Rules read and tasks created per batch (default RECURRENCE_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        until = horizon_end(options['horizon_days'])
+        batch_size = options['batch_size'] or recurrence_settings()['BATCH_SIZE']
+        rules_done = created = 0
+        last_id = 0
+        while True:
+            # Rules are read in id order, one batch at a time
+            rules = list(due_rules(until).filter(id__gt=last_id).order_by('id')[:batch_size])
+            if not rules:
+                break
+            for rule in rules:
+                done = False
+                while not done:
+                    tasks, done = materialize(rule, until, batch_size)
+                    created += len(tasks)
+                rules_done += 1
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{rule.title}: materialized until {until:%Y-%m-%d %H:%M}')
+            last_id = rules[-1].id
+
+        self.stdout.write(self.style.SUCCESS(f'Created {created} tasks for {rules_done} recurring tasks'))
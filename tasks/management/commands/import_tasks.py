@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from groups.models import Group
+from tasks.imports import IMPORT_BATCH_SIZE, IMPORT_FORMATS, TaskImporter
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Import tasks into a group from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('group_id', type=int)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=IMPORT_FORMATS,
+                            help='File format (defaults to the file extension)')
+        parser.add_argument('--created-by',
+                            help='user_id recorded as task creator (defaults to the group admin)')
+        parser.add_argument('--start-line', type=int, default=1,
+                            help='Resume from this line (the next_line of a previous run)')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            group = Group.objects.get(id=options['group_id'])
+        except Group.DoesNotExist:
+            raise CommandError(f"Group {options['group_id']} does not exist")
+
+        created_by = group.creator
+        if options['created_by']:
+            try:
+                created_by = User.objects.get(user_id=options['created_by'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['created_by']} does not exist")
+
+        path = options['path']
+        fmt = options['format'] or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv')
+
+        importer = TaskImporter(
+            group,
+            created_by,
+            batch_size=options['batch_size'],
+            start_line=options['start_line'],
+        )
+        # Lines are decoded one at a time, so a bad line is reported like any other
+        with open(path, 'rb') as lines:
+            result = importer.run(lines, fmt)
+
+        for error in result['errors']:
+            self.stderr.write(f"line {error['line']}: {'; '.join(error['errors'])}")
+        if result['errors_truncated']:
+            self.stderr.write('(further errors not shown)')
+
+        self.stdout.write(f"Created {result['created']} tasks, {result['failed']} lines failed")
+        if not result['complete']:
+            raise CommandError(
+                f"Import stopped; resume with --start-line {result['next_line']}"
+            )
+        self.stdout.write(self.style.SUCCESS('Import complete'))
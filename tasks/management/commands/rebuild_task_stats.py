@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from groups.models import Group
+from tasks.stats import rebuild_group_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the group task statistics table from the task table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', type=int, action='append', dest='groups',
+                            help='Only rebuild this group (can be repeated)')
+
+    def handle(self, *args, **options):
+        groups = Group.objects.order_by('id')
+        if options['groups']:
+            groups = groups.filter(id__in=options['groups'])
+
+        rebuilt = 0
+        for group in groups.iterator():
+            totals = rebuild_group_stats(group)
+            rebuilt += 1
+            if options['verbosity'] > 1:
+                self.stdout.write(f'{group.name}: {totals.total} tasks, {totals.overdue} overdue')
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt statistics for {rebuilt} groups'))
@@ -0,0 +1,85 @@
+# Generated by Django 5.2 on 2026-10-19 14:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.utils import timezone
+
+
+def populate_group_task_stats(apps, schema_editor):
+    Group = apps.get_model('groups', 'Group')
+    Task = apps.get_model('tasks', 'Task')
+    GroupTaskStats = apps.get_model('tasks', 'GroupTaskStats')
+    now = timezone.now()
+    aggregates = {
+        'total': Count('id'),
+        'overdue': Count('id', filter=Q(
+            status__in=['not_started', 'in_progress'], deadline__isnull=False, deadline__lte=now
+        )),
+    }
+    for value in ['not_started', 'in_progress', 'completed', 'cancelled']:
+        aggregates[f'status_{value}'] = Count('id', filter=Q(status=value))
+    for value in ['low', 'medium', 'high', 'urgent']:
+        aggregates[f'priority_{value}'] = Count('id', filter=Q(priority=value))
+
+    for group in Group.objects.iterator():
+        tasks = Task.objects.filter(group=group).order_by()
+        rows = [GroupTaskStats(group=group, overdue_as_of=now, **tasks.aggregate(**aggregates))]
+        for counts in tasks.filter(assigned_to_user__isnull=False).values('assigned_to_user').annotate(**aggregates):
+            assignee_id = counts.pop('assigned_to_user')
+            rows.append(GroupTaskStats(group=group, assignee_id=assignee_id, **counts))
+        GroupTaskStats.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0002_initial'),
+        ('tasks', '0003_alter_taskswap_unique_together_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupTaskStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.IntegerField(default=0)),
+                ('status_not_started', models.IntegerField(default=0)),
+                ('status_in_progress', models.IntegerField(default=0)),
+                ('status_completed', models.IntegerField(default=0)),
+                ('status_cancelled', models.IntegerField(default=0)),
+                ('priority_low', models.IntegerField(default=0)),
+                ('priority_medium', models.IntegerField(default=0)),
+                ('priority_high', models.IntegerField(default=0)),
+                ('priority_urgent', models.IntegerField(default=0)),
+                ('overdue', models.IntegerField(default=0)),
+                ('overdue_as_of', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['group', 'deadline'], name='tasks_task_group_i_f58f5a_idx'),
+        ),
+        migrations.AddField(
+            model_name='grouptaskstats',
+            name='assignee',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='task_stats', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='grouptaskstats',
+            name='group',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_stats', to='groups.group'),
+        ),
+        migrations.AddConstraint(
+            model_name='grouptaskstats',
+            constraint=models.UniqueConstraint(fields=('group', 'assignee'), name='unique_group_assignee_stats'),
+        ),
+        migrations.AddConstraint(
+            model_name='grouptaskstats',
+            constraint=models.UniqueConstraint(condition=models.Q(('assignee__isnull', True)), fields=('group',), name='unique_group_totals_stats'),
+        ),
+        migrations.RunPython(populate_group_task_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2 on 2026-10-19 15:06
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_task_visibility(apps, schema_editor):
+    Group = apps.get_model('groups', 'Group')
+    GroupMembership = apps.get_model('groups', 'GroupMembership')
+    Task = apps.get_model('tasks', 'Task')
+    TaskVisibility = apps.get_model('tasks', 'TaskVisibility')
+
+    for group in Group.objects.iterator():
+        members = list(GroupMembership.objects.filter(group=group).values_list('user_id', flat=True))
+        rows = []
+        for task_id, user_id, assigned_group_id in Task.objects.filter(group=group).values_list(
+            'id', 'assigned_to_user_id', 'assigned_to_group_id'
+        ).iterator():
+            users = {}
+            if user_id:
+                users[user_id] = True
+            if assigned_group_id:
+                users.update(dict.fromkeys(members, True))
+            users.setdefault(group.creator_id, False)
+            rows.extend(
+                TaskVisibility(user_id=user, task_id=task_id, group_id=group.id, assigned=assigned)
+                for user, assigned in users.items()
+            )
+        TaskVisibility.objects.bulk_create(rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0003_groupmembership_workload'),
+        ('tasks', '0004_group_task_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskVisibility',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('assigned', models.BooleanField(default=True)),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='groups.group')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visibility', to='tasks.task')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_visibility', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'assigned', 'task'], name='tasks_taskv_user_id_c171e7_idx'), models.Index(fields=['group', 'user'], name='tasks_taskv_group_i_05c15e_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'task'), name='unique_task_visibility')],
+            },
+        ),
+        migrations.RunPython(populate_task_visibility, migrations.RunPython.noop),
+    ]
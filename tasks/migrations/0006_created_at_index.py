@@ -0,0 +1,24 @@
+# Generated by Django 5.2 on 2026-10-19 15:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0005_groupmembership_joined_at_index'),
+        ('tasks', '0005_task_visibility'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['created_at'], name='tasks_task_created_be1ba2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskswap',
+            index=models.Index(fields=['created_at'], name='tasks_tasks_created_b41b2a_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-19 15:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_task_deadlines(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    TaskVisibility = apps.get_model('tasks', 'TaskVisibility')
+    TaskVisibility.objects.filter(task__deadline__isnull=False).update(
+        deadline=Subquery(Task.objects.filter(pk=OuterRef('task_id')).values('deadline')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('groups', '0005_groupmembership_joined_at_index'),
+        ('tasks', '0007_task_recurrence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarFeed',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='taskvisibility',
+            name='deadline',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(copy_task_deadlines, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='taskvisibility',
+            index=models.Index(condition=models.Q(('assigned', True)), fields=['user', 'deadline'], name='task_visibility_calendar'),
+        ),
+        migrations.AddField(
+            model_name='calendarfeed',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='calendar_feed', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
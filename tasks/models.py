@@ -1,8 +1,36 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from groups.models import Group
 
 
+class TaskQuerySet(models.QuerySet):
+    # Changed tasks are passed to tasks_bulk_updated receivers this many at a time
+    bulk_update_chunk_size = 1000
+
+    def set_status(self, status):
+        """Set the status of the tasks in one UPDATE; return the number changed"""
+        from django.utils import timezone
+        from . import stats
+        from .signals import tasks_bulk_updated
+        changed = self.exclude(status=status).select_related(None).order_by()
+        with transaction.atomic():
+            stats.apply_status_update(changed, status)
+            # Queryset updates send no post_save. Receivers read the tasks as
+            # they are before the update, one chunk at a time.
+            last = 0
+            while True:
+                tasks = list(
+                    changed.filter(pk__gt=last).order_by('pk')
+                    .only('id', 'title', 'status', 'group', 'assigned_to_user', 'assigned_to_group')
+                    [:self.bulk_update_chunk_size]
+                )
+                if not tasks:
+                    break
+                tasks_bulk_updated.send(sender=self.model, tasks=tasks, changes={'status': status})
+                last = tasks[-1].pk
+            return changed.update(status=status, updated_at=timezone.now())
+
+
 class Task(models.Model):
     """Task model with individual and group assignment capabilities"""
 
@@ -56,15 +84,50 @@ class Task(models.Model):
         related_name='tasks'
     )
 
+    # Set on occurrences of a recurring task; occurrence_at is the scheduled
+    # time, which stays put when the deadline is edited
+    recurrence = models.ForeignKey(
+        'TaskRecurrence',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='occurrences'
+    )
+    occurrence_at = models.DateTimeField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TaskQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['recurrence', 'occurrence_at'], name='unique_task_occurrence'),
+        ]
+        indexes = [
+            models.Index(fields=['group', 'deadline']),
+            # Default ordering of the admin changelist and its date hierarchy
+            models.Index(fields=['created_at']),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # Keep what the post_save receivers write (statistics, visibility,
+        # sync log, webhook outbox) in the transaction of the change
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded state so saves can be applied as deltas
+        from .stats import snapshot_task
+        instance._stats_snapshot = snapshot_task(instance)
+        return instance
+
     def clean(self):
         """Ensure task is assigned to either user or group, not both"""
         from django.core.exceptions import ValidationError
@@ -82,6 +145,92 @@ class Task(models.Model):
         return False
 
 
+class TaskRecurrence(models.Model):
+    """Template and schedule of a recurring task.
+
+    Occurrences are created as tasks lazily, up to a rolling horizon or the
+    end of a date range being read; ``generated_until`` is the time up to
+    which they were created. See tasks.recurrence.
+    """
+
+    FREQUENCY_CHOICES = [
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+        ('cron', 'Cron'),
+    ]
+
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='recurrences'
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='created_recurrences'
+    )
+
+    # Template of the occurrences
+    title = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    priority = models.CharField(max_length=10, choices=Task.PRIORITY_CHOICES, default='medium')
+    assigned_to_user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='assigned_recurrences'
+    )
+    assigned_to_group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='assigned_recurrences'
+    )
+
+    # Schedule: every `interval` days, every `interval` weeks on `weekdays`
+    # (0 is Monday; the weekday of starts_at if empty), or a cron expression.
+    # Occurrences are at the time of day of starts_at unless cron says otherwise.
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='weekly')
+    interval = models.PositiveSmallIntegerField(default=1)
+    weekdays = models.JSONField(default=list, blank=True)
+    cron = models.CharField(max_length=100, blank=True)
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField(null=True, blank=True)
+
+    active = models.BooleanField(default=True)
+    generated_until = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Rules the scheduler has to materialize
+            models.Index(fields=['active', 'generated_until']),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.frequency})"
+
+    def build_task(self, occurrence_at):
+        """Unsaved task for the occurrence at the given time"""
+        return Task(
+            title=self.title,
+            description=self.description,
+            priority=self.priority,
+            deadline=occurrence_at,
+            assigned_to_user_id=self.assigned_to_user_id,
+            assigned_to_group_id=self.assigned_to_group_id,
+            created_by_id=self.created_by_id,
+            group_id=self.group_id,
+            recurrence=self,
+            occurrence_at=occurrence_at,
+        )
+
+
 class TaskSwap(models.Model):
     """Task swap model with approval workflow"""
 
@@ -138,10 +287,19 @@ class TaskSwap(models.Model):
     class Meta:
         ordering = ['-created_at']
         # unique_together = ['requester_task', 'target_task', 'requester']  # Temporarily disabled for migration
+        indexes = [
+            # Default ordering of the admin changelist and its date hierarchy
+            models.Index(fields=['created_at']),
+        ]
 
     def __str__(self):
         return f"Swap: {self.requester_task.title} ↔ {self.target_task.title} ({self.requester.user_id} ↔ {self.target_user.user_id})"
 
+    def save(self, *args, **kwargs):
+        # Keep the sync log and webhook outbox rows in the change's transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
     def approve_by_admin(self, admin_user):
         """Approve swap by group admin"""
         if self.requester_task.group.is_admin(admin_user):
@@ -194,3 +352,137 @@ class TaskSwap(models.Model):
             # Save both tasks
             self.requester_task.save()
             self.target_task.save()
+
+
+class GroupTaskStats(models.Model):
+    """Incrementally maintained task counters for a group.
+
+    The row with no assignee holds the totals for the whole group; one row per
+    assignee holds the counters for tasks assigned to that user. Rows are kept
+    up to date by the task signal handlers and can be rebuilt with the
+    ``rebuild_task_stats`` command.
+    """
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='task_stats'
+    )
+    assignee = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='task_stats'
+    )
+
+    total = models.IntegerField(default=0)
+    status_not_started = models.IntegerField(default=0)
+    status_in_progress = models.IntegerField(default=0)
+    status_completed = models.IntegerField(default=0)
+    status_cancelled = models.IntegerField(default=0)
+    priority_low = models.IntegerField(default=0)
+    priority_medium = models.IntegerField(default=0)
+    priority_high = models.IntegerField(default=0)
+    priority_urgent = models.IntegerField(default=0)
+
+    # Open tasks whose deadline is at or before overdue_as_of; the cut-off is
+    # only stored on the group row and applies to every row of the group
+    overdue = models.IntegerField(default=0)
+    overdue_as_of = models.DateTimeField(null=True, blank=True)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'assignee'], name='unique_group_assignee_stats'),
+            models.UniqueConstraint(
+                fields=['group'],
+                condition=models.Q(assignee__isnull=True),
+                name='unique_group_totals_stats'
+            ),
+        ]
+
+    def __str__(self):
+        if self.assignee_id:
+            return f"Stats: {self.group_id} / {self.assignee_id}"
+        return f"Stats: {self.group_id}"
+
+    @property
+    def open(self):
+        return self.status_not_started + self.status_in_progress
+
+
+class TaskVisibility(models.Model):
+    """Materialized (user, task) pairs used by the task permission checks.
+
+    ``assigned`` rows are tasks assigned to the user or to a group they belong
+    to, which make up the user's task list. The other rows are tasks the user
+    can open as admin of the task's group. Kept up to date by tasks.visibility.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='task_visibility'
+    )
+    task = models.ForeignKey(
+        Task,
+        on_delete=models.CASCADE,
+        related_name='visibility'
+    )
+    # Copy of task.group, so membership changes touch only the group's rows
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    assigned = models.BooleanField(default=True)
+    # Copy of task.deadline, so a user's calendar is one index range scan
+    deadline = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'task'], name='unique_task_visibility'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'assigned', 'task']),
+            models.Index(fields=['group', 'user']),
+            # Calendar range scans; assigned=True is not an indexable equality
+            # on SQLite, so the index is partial instead of (user, assigned, ...)
+            models.Index(
+                fields=['user', 'deadline'],
+                condition=models.Q(assigned=True),
+                name='task_visibility_calendar'
+            ),
+        ]
+
+    def __str__(self):
+        return f"Visibility: {self.user_id} / {self.task_id}"
+
+
+class CalendarFeed(models.Model):
+    """Secret token in the URL of a user's iCalendar feed (see tasks.calendar)"""
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='calendar_feed'
+    )
+    token = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Calendar feed: {self.user_id}"
+
+    @staticmethod
+    def new_token():
+        import secrets
+        return secrets.token_urlsafe(32)
+
+    @classmethod
+    def for_user(cls, user):
+        feed, _ = cls.objects.get_or_create(user=user, defaults={'token': cls.new_token()})
+        return feed
+
+    def rotate(self):
+        """Replace the token, so the old feed URL stops working"""
+        self.token = self.new_token()
+        self.save(update_fields=['token'])
@@ -0,0 +1,234 @@
+"""Recurring tasks, materialized lazily.
+
+A ``TaskRecurrence`` holds a task template and a schedule: every ``interval``
+days, every ``interval`` weeks on some weekdays, or a five-field cron
+expression, evaluated in the project time zone. Occurrences become ordinary
+``Task`` rows (with ``recurrence`` and ``occurrence_at`` set) only when they
+are needed:
+
+- ``python manage.py generate_recurring_tasks``, run by a scheduler,
+  materializes the occurrences of the next ``RECURRENCE_HORIZON_DAYS``;
+- reads of a date range (``materialize_range``) materialize the occurrences
+  the scheduler has not created yet, up to the end of the range or the
+  horizon, at most ``RECURRENCE_REQUEST_LIMIT`` per request. Later
+  occurrences are left to the scheduler, so a read never fills months of a
+  rule.
+
+Each rule remembers how far it was materialized (``generated_until``), so an
+occurrence is created once: running the generator again, or deleting an
+occurrence, does not bring it back. The unique (recurrence, occurrence_at)
+constraint covers two processes materializing the same rule at once.
+"""
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import IntegrityError, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task, TaskRecurrence
+from .signals import tasks_bulk_created
+
+# (name, lowest value, highest value) of the cron fields
+CRON_FIELDS = [
+    ('minute', 0, 59),
+    ('hour', 0, 23),
+    ('day of month', 1, 31),
+    ('month', 1, 12),
+    ('day of week', 0, 7),
+]
+
+
+def recurrence_settings():
+    return {
+        'HORIZON_DAYS': getattr(settings, 'RECURRENCE_HORIZON_DAYS', 14),
+        'BATCH_SIZE': getattr(settings, 'RECURRENCE_BATCH_SIZE', 500),
+        'REQUEST_LIMIT': getattr(settings, 'RECURRENCE_REQUEST_LIMIT', 200),
+        'MIN_INTERVAL_MINUTES': getattr(settings, 'RECURRENCE_MIN_INTERVAL_MINUTES', 60),
+    }
+
+
+def horizon_end(days=None):
+    """End of the window the scheduler keeps materialized"""
+    return timezone.now() + timedelta(days=days or recurrence_settings()['HORIZON_DAYS'])
+
+
+def parse_cron(expression):
+    """'0 9 * * 1-5' -> (minutes, hours, days, months, weekdays, day restricted, weekday restricted).
+
+    Supports ``*``, values, ``a-b`` ranges, ``/step`` and comma separated
+    lists. Weekdays count from Sunday (0 or 7). Raises ValueError.
+    """
+    fields = expression.split()
+    if len(fields) != len(CRON_FIELDS):
+        raise ValueError('Cron expressions have five fields: minute hour day month weekday')
+    sets = []
+    for text, (name, low, high) in zip(fields, CRON_FIELDS):
+        values = set()
+        for item in text.split(','):
+            spec, _, step = item.partition('/')
+            try:
+                step = int(step) if step else 1
+                if spec == '*':
+                    start, end = low, high
+                elif '-' in spec:
+                    start, end = (int(value) for value in spec.split('-', 1))
+                else:
+                    start = int(spec)
+                    end = high if step > 1 else start
+            except ValueError:
+                raise ValueError(f'Invalid cron {name} field: {text!r}')
+            if step < 1 or not low <= start <= end <= high:
+                raise ValueError(f'Invalid cron {name} field: {text!r}')
+            values.update(range(start, end + 1, step))
+        sets.append(values)
+    minutes, hours, days, months, weekdays = sets
+    weekdays = {day % 7 for day in weekdays}
+    return (sorted(minutes), sorted(hours), days, months, weekdays,
+            fields[2] != '*', fields[4] != '*')
+
+
+def validate_cron(expression):
+    """Parse a cron expression for a new rule, rejecting too frequent schedules.
+
+    Occurrences must be at least ``RECURRENCE_MIN_INTERVAL_MINUTES`` apart.
+    Raises ValueError.
+    """
+    cron = parse_cron(expression)
+    minutes, hours = cron[0], cron[1]
+    times = [hour * 60 + minute for hour in hours for minute in minutes]
+    # Including the gap from the last time of a day to the first of the next
+    gap = min([b - a for a, b in zip(times, times[1:])] + [times[0] + 24 * 60 - times[-1]])
+    min_interval = recurrence_settings()['MIN_INTERVAL_MINUTES']
+    if gap < min_interval:
+        raise ValueError(f'Occurrences must be at least {min_interval} minutes apart')
+    return cron
+
+
+def _cron_times(cron, day):
+    """Local times on the given date matched by a parsed cron expression"""
+    minutes, hours, days, months, weekdays, day_restricted, weekday_restricted = cron
+    if day.month not in months:
+        return []
+    day_match = day.day in days
+    weekday_match = (day.weekday() + 1) % 7 in weekdays
+    # As in cron, a restricted day of month and day of week match either one
+    if day_restricted and weekday_restricted:
+        matches = day_match or weekday_match
+    else:
+        matches = day_match and weekday_match
+    if not matches:
+        return []
+    return [(hour, minute) for hour in hours for minute in minutes]
+
+
+def _day_times(rule, day, start, cron):
+    """Local (hour, minute) pairs of the rule's occurrences on a date"""
+    if cron is not None:
+        return _cron_times(cron, day)
+    time_of_day = [(start.hour, start.minute)]
+    if rule.frequency == 'daily':
+        return time_of_day if (day - start.date()).days % rule.interval == 0 else []
+    weekdays = rule.weekdays or [start.weekday()]
+    if day.weekday() not in weekdays:
+        return []
+    weeks = (day - timedelta(days=day.weekday()) - (start.date() - timedelta(days=start.weekday()))).days // 7
+    return time_of_day if weeks % rule.interval == 0 else []
+
+
+def occurrences(rule, after, until):
+    """Occurrence times of the rule after ``after`` and up to ``until``, in order"""
+    tz = timezone.get_default_timezone()
+    start = timezone.localtime(rule.starts_at, tz)
+    cron = parse_cron(rule.cron) if rule.frequency == 'cron' else None
+    if rule.ends_at is not None:
+        until = min(until, rule.ends_at)
+    after = max(after, rule.starts_at - timedelta(microseconds=1))
+    day = timezone.localtime(after, tz).date()
+    last_day = timezone.localtime(until, tz).date()
+    while day <= last_day:
+        for hour, minute in _day_times(rule, day, start, cron):
+            at = datetime(day.year, day.month, day.day, hour, minute, start.second,
+                          start.microsecond, tzinfo=tz)
+            if after < at <= until:
+                yield at
+        day += timedelta(days=1)
+
+
+def materialize(rule, until, limit=None):
+    """Create the rule's missing occurrences up to ``until``.
+
+    Creates at most ``limit`` (``RECURRENCE_BATCH_SIZE``) tasks and returns
+    (tasks, done); when ``done`` is false, call again for the next batch.
+    """
+    limit = limit or recurrence_settings()['BATCH_SIZE']
+    db = router.db_for_write(Task)
+    try:
+        with transaction.atomic(using=db):
+            rule = TaskRecurrence.objects.select_for_update().filter(pk=rule.pk, active=True).first()
+            after = rule.starts_at - timedelta(microseconds=1) if rule else None
+            if rule is None or (rule.generated_until or after) >= until:
+                return [], True
+            times = list(islice(occurrences(rule, rule.generated_until or after, until), limit + 1))
+            done = len(times) <= limit
+            times = times[:limit]
+            existing = set(
+                Task.objects.using(db).filter(recurrence=rule, occurrence_at__in=times)
+                .values_list('occurrence_at', flat=True)
+            )
+            tasks = [rule.build_task(at) for at in times if at not in existing]
+            if tasks:
+                Task.objects.bulk_create(tasks)
+                tasks_bulk_created.send(sender=Task, tasks=tasks)
+            rule.generated_until = until if done else times[-1]
+            rule.save(update_fields=['generated_until'])
+    except IntegrityError:
+        # Another process materialized the same occurrences
+        return [], True
+    return tasks, done
+
+
+def due_rules(until):
+    """Active rules with occurrences up to ``until`` that were not materialized"""
+    return TaskRecurrence.objects.filter(active=True, group__deleted_at__isnull=True).filter(
+        Q(generated_until__isnull=True) | Q(generated_until__lt=until)
+    ).filter(
+        Q(ends_at__isnull=True) | Q(generated_until__isnull=True) | Q(generated_until__lt=F('ends_at'))
+    )
+
+
+def materialize_range(rules, end):
+    """Materialize the given rules up to ``end`` before a range is read.
+
+    ``end`` is capped at the horizon, and at most ``RECURRENCE_REQUEST_LIMIT``
+    tasks are created; ``generate_recurring_tasks`` creates the rest.
+    Returns the number of tasks created.
+    """
+    config = recurrence_settings()
+    end = min(end, horizon_end())
+    remaining = config['REQUEST_LIMIT']
+    for rule in rules.filter(pk__in=due_rules(end).values('pk')):
+        done = False
+        while not done and remaining > 0:
+            tasks, done = materialize(rule, end, min(remaining, config['BATCH_SIZE']))
+            remaining -= len(tasks)
+        if remaining <= 0:
+            break
+    return config['REQUEST_LIMIT'] - remaining
+
+
+def reschedule(rule):
+    """Drop the rule's future occurrences nobody started, to regenerate them.
+
+    Used after the template or schedule changed; returns the number of tasks
+    deleted.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        _, deleted = Task.objects.filter(
+            recurrence=rule, occurrence_at__gt=now, status='not_started'
+        ).delete()
+        rule.generated_until = max(now, rule.starts_at - timedelta(microseconds=1))
+        rule.save(update_fields=['generated_until'])
+    return deleted.get(Task._meta.label, 0)
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Task, TaskSwap
+from .models import Task, TaskRecurrence, TaskSwap, GroupTaskStats
 from users.serializers import UserSearchSerializer
 from groups.serializers import GroupListSerializer
 
@@ -17,8 +17,9 @@ class TaskSerializer(serializers.ModelSerializer):
         model = Task
         fields = ['id', 'title', 'description', 'priority', 'status', 'deadline',
                  'assigned_to_user', 'assigned_to_group', 'created_by', 'group',
-                 'can_edit', 'can_swap', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_by', 'group', 'created_at', 'updated_at']
+                 'can_edit', 'can_swap', 'recurrence', 'occurrence_at', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'created_by', 'group', 'recurrence', 'occurrence_at',
+                            'created_at', 'updated_at']
     
     def get_can_edit(self, obj):
         request = self.context.get('request')
@@ -37,21 +38,28 @@ class TaskCreateSerializer(serializers.ModelSerializer):
     """Serializer for creating tasks"""
     assigned_to_user_id = serializers.CharField(max_length=8, required=False, allow_blank=True)
     assign_to_group = serializers.BooleanField(default=False)
+    auto_assign = serializers.BooleanField(default=False)
     
     class Meta:
         model = Task
-        fields = ['title', 'description', 'priority', 'deadline', 'assigned_to_user_id', 'assign_to_group']
+        fields = ['title', 'description', 'priority', 'deadline', 'assigned_to_user_id',
+                 'assign_to_group', 'auto_assign']
     
     def validate(self, attrs):
         assigned_to_user_id = attrs.get('assigned_to_user_id')
         assign_to_group = attrs.get('assign_to_group', False)
+        auto_assign = attrs.get('auto_assign', False)
+        modes = [bool(assigned_to_user_id), assign_to_group, auto_assign]
         
-        if not assigned_to_user_id and not assign_to_group:
+        if not any(modes):
             raise serializers.ValidationError("Task must be assigned to either a user or the group")
         
         if assigned_to_user_id and assign_to_group:
             raise serializers.ValidationError("Task cannot be assigned to both user and group")
         
+        if sum(modes) > 1:
+            raise serializers.ValidationError("auto_assign cannot be combined with another assignment")
+        
         return attrs
     
     def validate_assigned_to_user_id(self, value):
@@ -73,6 +81,72 @@ class TaskUpdateSerializer(serializers.ModelSerializer):
         fields = ['title', 'description', 'priority', 'status', 'deadline']
 
 
+class CalendarTaskSerializer(serializers.ModelSerializer):
+    """Compact serializer for calendar entries"""
+    class Meta:
+        model = Task
+        fields = ['id', 'title', 'priority', 'status', 'deadline', 'group', 'recurrence',
+                 'occurrence_at']
+
+
+class TaskRecurrenceSerializer(serializers.ModelSerializer):
+    """Serializer for recurring task details"""
+    assigned_to_user = UserSearchSerializer(read_only=True)
+    assigned_to_group = GroupListSerializer(read_only=True)
+    created_by = UserSearchSerializer(read_only=True)
+
+    class Meta:
+        model = TaskRecurrence
+        fields = ['id', 'group', 'title', 'description', 'priority', 'assigned_to_user',
+                 'assigned_to_group', 'frequency', 'interval', 'weekdays', 'cron',
+                 'starts_at', 'ends_at', 'active', 'generated_until', 'created_by',
+                 'created_at', 'updated_at']
+
+
+class TaskRecurrenceWriteSerializer(serializers.ModelSerializer):
+    """Serializer for creating and updating recurring tasks"""
+    assigned_to_user_id = serializers.CharField(max_length=8, required=False, allow_blank=True)
+    assign_to_group = serializers.BooleanField(required=False)
+    weekdays = serializers.ListField(
+        child=serializers.IntegerField(min_value=0, max_value=6), required=False
+    )
+    interval = serializers.IntegerField(min_value=1, max_value=366, required=False)
+
+    class Meta:
+        model = TaskRecurrence
+        fields = ['title', 'description', 'priority', 'assigned_to_user_id', 'assign_to_group',
+                 'frequency', 'interval', 'weekdays', 'cron', 'starts_at', 'ends_at', 'active']
+
+    def validate_assigned_to_user_id(self, value):
+        if value:
+            from users.models import User
+            try:
+                return User.objects.get(user_id=value)
+            except User.DoesNotExist:
+                raise serializers.ValidationError("User with this ID does not exist")
+        return None
+
+    def validate(self, attrs):
+        if attrs.get('assigned_to_user_id') and attrs.get('assign_to_group'):
+            raise serializers.ValidationError("Task cannot be assigned to both user and group")
+        if self.instance is None and not (attrs.get('assigned_to_user_id') or attrs.get('assign_to_group')):
+            raise serializers.ValidationError("Task must be assigned to either a user or the group")
+
+        def current(name, default=None):
+            return attrs.get(name, getattr(self.instance, name, default))
+
+        if current('frequency', 'weekly') == 'cron':
+            from .recurrence import validate_cron
+            try:
+                validate_cron(current('cron', ''))
+            except ValueError as exc:
+                raise serializers.ValidationError({'cron': str(exc)})
+        ends_at = current('ends_at')
+        if ends_at is not None and ends_at <= current('starts_at'):
+            raise serializers.ValidationError({'ends_at': "ends_at must be after starts_at"})
+        return attrs
+
+
 class TaskSwapSerializer(serializers.ModelSerializer):
     """Serializer for task swap details"""
     requester_task = TaskSerializer(read_only=True)
@@ -119,3 +193,21 @@ class TaskSwapCreateSerializer(serializers.Serializer):
             return Task.objects.get(id=value)
         except Task.DoesNotExist:
             raise serializers.ValidationError("Task with this ID does not exist")
+
+
+class GroupTaskStatsSerializer(serializers.ModelSerializer):
+    """Serializer for one row of the group task statistics table"""
+    assignee = UserSearchSerializer(read_only=True)
+    by_status = serializers.SerializerMethodField()
+    by_priority = serializers.SerializerMethodField()
+    open = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = GroupTaskStats
+        fields = ['assignee', 'total', 'open', 'overdue', 'by_status', 'by_priority']
+
+    def get_by_status(self, obj):
+        return {value: getattr(obj, f'status_{value}') for value, _ in Task.STATUS_CHOICES}
+
+    def get_by_priority(self, obj):
+        return {value: getattr(obj, f'priority_{value}') for value, _ in Task.PRIORITY_CHOICES}
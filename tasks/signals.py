@@ -0,0 +1,85 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from groups.models import Group, GroupMembership
+from groups.signals import members_bulk_added
+
+from . import stats, visibility
+from .models import Task
+
+
+# Sent after tasks are inserted with bulk_create, which skips post_save.
+# Receivers get the saved instances as ``tasks``.
+tasks_bulk_created = Signal()
+
+# Sent when tasks are changed with a queryset update (see
+# TaskQuerySet.set_status), which skips post_save. It is sent in the update's
+# transaction before the UPDATE runs, once per chunk of the changed tasks.
+# Receivers get the chunk as ``tasks``, with their title and assignment fields
+# and the values from before the update loaded, and the new values as
+# ``changes``. The task counters are maintained by the queryset method itself.
+tasks_bulk_updated = Signal()
+
+
+@receiver(pre_save, sender=Task)
+@receiver(pre_delete, sender=Task)
+def load_task_snapshot(sender, instance, raw=False, **kwargs):
+    """Make sure changes of instances not (fully) loaded from the database have a snapshot"""
+    if raw or instance._state.adding or getattr(instance, '_stats_snapshot', None):
+        return
+    current = Task.objects.filter(pk=instance.pk).first()
+    instance._stats_snapshot = stats.snapshot_task(current) if current else None
+
+
+@receiver(post_save, sender=Task)
+def update_derived_tables_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    old = None if created else getattr(instance, '_stats_snapshot', None)
+    new = stats.snapshot_task(instance)
+    if new is None:
+        # Some fields are deferred; read what was saved
+        new = Task.objects.filter(pk=instance.pk).values(*stats.SNAPSHOT_FIELDS).first()
+    if old and update_fields is not None:
+        # Only the listed fields were written
+        saved = {Task._meta.get_field(name).attname for name in update_fields}
+        new = {name: new[name] if name in saved else old[name] for name in old}
+    stats.apply_task_change(old, new)
+    if created:
+        visibility.add_tasks([instance])
+    elif visibility.visibility_changed(old, new):
+        visibility.refresh_task(instance)
+    elif old['deadline'] != new['deadline']:
+        visibility.update_deadline(instance)
+    instance._stats_snapshot = new
+
+
+@receiver(post_delete, sender=Task)
+def update_stats_on_delete(sender, instance, **kwargs):
+    old = getattr(instance, '_stats_snapshot', None) or stats.snapshot_task(instance)
+    stats.apply_task_change(old, None)
+
+
+@receiver(tasks_bulk_created, sender=Task)
+def update_derived_tables_on_bulk_create(sender, tasks, **kwargs):
+    stats.apply_tasks_created(tasks)
+    visibility.add_tasks(tasks)
+
+
+@receiver(post_save, sender=GroupMembership)
+def update_derived_tables_on_join(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        visibility.members_added(instance.group_id, [instance.user_id])
+        stats.refresh_member_workloads(instance.group_id, [instance.user_id])
+
+
+@receiver(members_bulk_added, sender=Group)
+def update_derived_tables_on_bulk_join(sender, group, memberships, **kwargs):
+    user_ids = [membership.user_id for membership in memberships]
+    visibility.members_added(group.pk, user_ids)
+    stats.refresh_member_workloads(group.pk, user_ids)
+
+
+@receiver(post_delete, sender=GroupMembership)
+def update_visibility_on_leave(sender, instance, **kwargs):
+    visibility.member_removed(instance.group_id, instance.user_id)
@@ -0,0 +1,366 @@
+import operator
+from collections import Counter, defaultdict
+from datetime import timedelta
+from functools import reduce
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
+
+
+OPEN_STATUSES = ('not_started', 'in_progress')
+
+# Weighted workload of an open task assigned to a member: its priority weight,
+# plus a weight for how close its deadline is. Deadlines are bucketed against
+# the group's overdue cut-off, so refresh_overdue() moves tasks between
+# buckets as it moves the cut-off.
+PRIORITY_WEIGHTS = {'low': 1, 'medium': 2, 'high': 3, 'urgent': 5}
+DEADLINE_WEIGHTS = {'overdue': 3, 'soon': 2, 'later': 1}
+# Deadlines up to this far after the cut-off are 'soon'
+DEADLINE_SOON = timedelta(days=7)
+
+# Task attributes that affect the counters, plus the group assignment which
+# decides visibility (see tasks.visibility)
+SNAPSHOT_FIELDS = (
+    'group_id', 'assigned_to_user_id', 'assigned_to_group_id', 'status', 'priority', 'deadline'
+)
+
+
+def snapshot_task(task):
+    """Return the counter-relevant state of a task, or None if not fully loaded"""
+    values = task.__dict__
+    if any(name not in values for name in SNAPSHOT_FIELDS):
+        return None
+    return {name: values[name] for name in SNAPSHOT_FIELDS}
+
+
+def is_overdue(state, as_of):
+    return (
+        as_of is not None
+        and state['status'] in OPEN_STATUSES
+        and state['deadline'] is not None
+        and state['deadline'] <= as_of
+    )
+
+
+def contribution(state, as_of):
+    """Counter columns a single task adds to its stats rows"""
+    counts = Counter({
+        'total': 1,
+        f"status_{state['status']}": 1,
+        f"priority_{state['priority']}": 1,
+    })
+    if is_overdue(state, as_of):
+        counts['overdue'] = 1
+    return counts
+
+
+def deadline_weight(deadline, as_of):
+    """Workload weight of a deadline, bucketed against the cut-off ``as_of``"""
+    if deadline is None:
+        return 0
+    if as_of is None:
+        # No cut-off yet: every deadline is in the latest bucket
+        return DEADLINE_WEIGHTS['later']
+    if deadline <= as_of:
+        return DEADLINE_WEIGHTS['overdue']
+    if deadline <= as_of + DEADLINE_SOON:
+        return DEADLINE_WEIGHTS['soon']
+    return DEADLINE_WEIGHTS['later']
+
+
+def task_workload(state, as_of):
+    """Weighted workload a task adds to its assignee's membership"""
+    if not state['assigned_to_user_id'] or state['status'] not in OPEN_STATUSES:
+        return 0
+    return PRIORITY_WEIGHTS.get(state['priority'], 0) + deadline_weight(state['deadline'], as_of)
+
+
+def _priority_weight():
+    return Case(
+        *[When(priority=priority, then=Value(weight)) for priority, weight in PRIORITY_WEIGHTS.items()],
+        default=Value(0),
+        output_field=IntegerField()
+    )
+
+
+def _deadline_buckets(as_of, **lookups):
+    """When clauses of deadline_weight() for the tasks matching ``lookups``"""
+    if as_of is None:
+        return [When(deadline__isnull=False, then=Value(DEADLINE_WEIGHTS['later']), **lookups)]
+    return [
+        When(deadline__lte=as_of, then=Value(DEADLINE_WEIGHTS['overdue']), **lookups),
+        When(deadline__lte=as_of + DEADLINE_SOON, then=Value(DEADLINE_WEIGHTS['soon']), **lookups),
+        When(deadline__isnull=False, then=Value(DEADLINE_WEIGHTS['later']), **lookups),
+    ]
+
+
+def workload_expression(as_of):
+    """SQL equivalent of task_workload() summed over a task queryset"""
+    deadline_weight = Case(*_deadline_buckets(as_of), default=Value(0), output_field=IntegerField())
+    return Sum(
+        _priority_weight() + deadline_weight,
+        filter=Q(status__in=OPEN_STATUSES, assigned_to_user__isnull=False)
+    )
+
+
+def _stats_model():
+    from .models import GroupTaskStats
+    return GroupTaskStats
+
+
+def _overdue_as_of(group_ids, create=False):
+    """Return {group_id: overdue cut-off}, optionally creating missing group rows.
+
+    The group row must exist before a task is counted, otherwise a task whose
+    deadline already passed would never be counted as overdue.
+    """
+    GroupTaskStats = _stats_model()
+    totals = GroupTaskStats.objects.filter(group_id__in=group_ids, assignee__isnull=True)
+    as_of = dict(totals.values_list('group_id', 'overdue_as_of'))
+    missing = set(group_ids) - set(as_of)
+    if create and missing:
+        now = timezone.now()
+        GroupTaskStats.objects.bulk_create(
+            [GroupTaskStats(group_id=group_id, overdue_as_of=now) for group_id in missing],
+            ignore_conflicts=True
+        )
+        as_of.update(totals.filter(group_id__in=missing).values_list('group_id', 'overdue_as_of'))
+    return as_of
+
+
+def _apply(group_id, assignee_id, delta):
+    """Add delta to one stats row, creating the row when counters grow"""
+    delta = {column: value for column, value in delta.items() if value}
+    if not delta:
+        return
+    GroupTaskStats = _stats_model()
+    rows = GroupTaskStats.objects.filter(group_id=group_id, assignee_id=assignee_id)
+    updates = {column: F(column) + value for column, value in delta.items()}
+    if rows.update(**updates):
+        return
+    # A missing row can only be created by an increment; decrements for a row
+    # that no longer exists (e.g. during a cascade delete) are dropped
+    if all(value < 0 for value in delta.values()):
+        return
+    try:
+        with transaction.atomic():
+            GroupTaskStats.objects.create(
+                group_id=group_id,
+                assignee_id=assignee_id,
+                overdue_as_of=None if assignee_id else timezone.now(),
+                **delta
+            )
+    except IntegrityError:
+        rows.update(**updates)
+
+
+def _apply_deltas(deltas, workloads):
+    from groups.models import GroupMembership
+    for (group_id, assignee_id), delta in deltas.items():
+        _apply(group_id, assignee_id, delta)
+    for (group_id, user_id), delta in workloads.items():
+        if delta:
+            GroupMembership.objects.filter(group_id=group_id, user_id=user_id).update(
+                workload=F('workload') + delta
+            )
+
+
+def apply_task_change(old, new):
+    """Apply the difference between two task snapshots (either may be None)"""
+    if old == new:
+        return
+    states = [state for state in (old, new) if state is not None]
+    as_of = _overdue_as_of({state['group_id'] for state in states}, create=new is not None)
+
+    deltas = defaultdict(Counter)
+    workloads = Counter()
+    for state, sign in ((old, -1), (new, 1)):
+        if state is None:
+            continue
+        group_as_of = as_of.get(state['group_id'])
+        counts = contribution(state, group_as_of)
+        keys = [(state['group_id'], None)]
+        if state['assigned_to_user_id']:
+            keys.append((state['group_id'], state['assigned_to_user_id']))
+            workloads[keys[1]] += sign * task_workload(state, group_as_of)
+        for key in keys:
+            for column, value in counts.items():
+                deltas[key][column] += sign * value
+    _apply_deltas(deltas, workloads)
+
+
+def apply_tasks_created(tasks):
+    """Apply counters for tasks inserted with bulk_create"""
+    states = [snapshot_task(task) for task in tasks]
+    as_of = _overdue_as_of({state['group_id'] for state in states}, create=True)
+    deltas = defaultdict(Counter)
+    workloads = Counter()
+    for state in states:
+        group_as_of = as_of.get(state['group_id'])
+        counts = contribution(state, group_as_of)
+        deltas[(state['group_id'], None)].update(counts)
+        if state['assigned_to_user_id']:
+            key = (state['group_id'], state['assigned_to_user_id'])
+            deltas[key].update(counts)
+            workloads[key] += task_workload(state, group_as_of)
+    _apply_deltas(deltas, workloads)
+
+
+def apply_status_update(tasks, status):
+    """Apply counters for setting ``status`` on a task queryset with an UPDATE.
+
+    Call in the update's transaction, before it runs. The tasks are read with
+    one grouped query, so the cost depends on the number of distinct
+    (group, assignee, status, priority) combinations, not on the number of
+    tasks.
+    """
+    tasks = tasks.order_by()
+    group_ids = list(tasks.values_list('group', flat=True).distinct())
+    if not group_ids:
+        return
+    as_of = _overdue_as_of(group_ids)
+    # Deadlines are bucketed against the cut-off of each task's group
+    buckets, overdue = [], []
+    for group_id in group_ids:
+        group_as_of = as_of.get(group_id)
+        buckets.extend(_deadline_buckets(group_as_of, group_id=group_id))
+        if group_as_of is not None:
+            overdue.append(Q(group_id=group_id, deadline__lte=group_as_of))
+    deadline_weight = Case(*buckets, default=Value(0), output_field=IntegerField())
+    overdue_count = Count('id', filter=reduce(operator.or_, overdue)) if overdue else Value(0)
+
+    deltas = defaultdict(Counter)
+    workloads = Counter()
+    for row in tasks.values('group', 'assigned_to_user', 'status', 'priority').annotate(
+        count=Count('id'), overdue=overdue_count, weight=Sum(_priority_weight() + deadline_weight)
+    ):
+        # Overdue tasks and workloads only count while the task is open
+        opened = (row['status'] not in OPEN_STATUSES) - (status not in OPEN_STATUSES)
+        delta = {
+            f"status_{row['status']}": -row['count'],
+            f'status_{status}': row['count'],
+            'overdue': opened * row['overdue'],
+        }
+        deltas[(row['group'], None)].update(delta)
+        if row['assigned_to_user']:
+            key = (row['group'], row['assigned_to_user'])
+            deltas[key].update(delta)
+            workloads[key] += opened * (row['weight'] or 0)
+    _apply_deltas(deltas, workloads)
+
+
+def refresh_overdue(group):
+    """Move the group's overdue cut-off, and with it the deadline buckets, to now.
+
+    Only open tasks whose deadline passed since the previous cut-off, or came
+    within ``DEADLINE_SOON`` of it, are read, using the (group, deadline)
+    index, so the cost depends on how many tasks changed bucket rather than on
+    the size of the group.
+    """
+    from groups.models import GroupMembership
+    from .models import Task
+    GroupTaskStats = _stats_model()
+    now = timezone.now()
+    with transaction.atomic():
+        totals = GroupTaskStats.objects.filter(group=group, assignee__isnull=True).first()
+        previous = totals.overdue_as_of if totals else None
+        if totals is None or (previous and previous >= now):
+            return
+        open_tasks = Task.objects.filter(group=group, status__in=OPEN_STATUSES)
+        crossed = open_tasks.filter(deadline__lte=now)
+        if previous:
+            crossed = crossed.filter(deadline__gt=previous)
+        per_assignee = dict(
+            crossed.order_by().values_list('assigned_to_user').annotate(n=Count('id'))
+        )
+        updated = GroupTaskStats.objects.filter(
+            pk=totals.pk, overdue_as_of=totals.overdue_as_of
+        ).update(
+            overdue=F('overdue') + sum(per_assignee.values()),
+            overdue_as_of=now
+        )
+        if not updated:
+            return  # Another request moved the cut-off first
+        for assignee_id, count in per_assignee.items():
+            if assignee_id:
+                GroupTaskStats.objects.filter(group=group, assignee_id=assignee_id).update(
+                    overdue=F('overdue') + count
+                )
+
+        # Assigned tasks that became overdue or came due soon change weight
+        moved = open_tasks.filter(assigned_to_user__isnull=False, deadline__lte=now + DEADLINE_SOON)
+        if previous:
+            moved = moved.filter(
+                Q(deadline__gt=previous, deadline__lte=now) | Q(deadline__gt=previous + DEADLINE_SOON)
+            )
+        workloads = Counter()
+        for assignee_id, deadline in moved.order_by().values_list('assigned_to_user', 'deadline').iterator():
+            workloads[assignee_id] += deadline_weight(deadline, now) - deadline_weight(deadline, previous)
+        for assignee_id, delta in workloads.items():
+            if delta:
+                GroupMembership.objects.filter(group=group, user_id=assignee_id).update(
+                    workload=F('workload') + delta
+                )
+
+
+def rebuild_group_stats(group):
+    """Recompute every stats row and member workload of a group from the task table"""
+    from groups.models import GroupMembership
+    from .models import Task
+    GroupTaskStats = _stats_model()
+    now = timezone.now()
+    aggregates = {
+        'total': Count('id'),
+        'overdue': Count('id', filter=Q(
+            status__in=OPEN_STATUSES, deadline__isnull=False, deadline__lte=now
+        )),
+    }
+    for value, _ in Task.STATUS_CHOICES:
+        aggregates[f'status_{value}'] = Count('id', filter=Q(status=value))
+    for value, _ in Task.PRIORITY_CHOICES:
+        aggregates[f'priority_{value}'] = Count('id', filter=Q(priority=value))
+
+    tasks = Task.objects.filter(group=group).order_by()
+    rows = [GroupTaskStats(group=group, overdue_as_of=now, **tasks.aggregate(**aggregates))]
+    for counts in (
+        tasks.filter(assigned_to_user__isnull=False)
+        .values('assigned_to_user')
+        .annotate(**aggregates)
+    ):
+        assignee_id = counts.pop('assigned_to_user')
+        rows.append(GroupTaskStats(group=group, assignee_id=assignee_id, **counts))
+
+    workloads = (
+        tasks.filter(assigned_to_user__isnull=False)
+        .values_list('assigned_to_user')
+        .annotate(workload=workload_expression(now))
+    )
+
+    with transaction.atomic():
+        GroupTaskStats.objects.filter(group=group).delete()
+        GroupTaskStats.objects.bulk_create(rows)
+        GroupMembership.objects.filter(group=group).update(workload=0)
+        for user_id, workload in workloads:
+            GroupMembership.objects.filter(group=group, user_id=user_id).update(
+                workload=workload or 0
+            )
+    return rows[0]
+
+
+def refresh_member_workloads(group_id, user_ids):
+    """Recompute the workload of members who (re)joined a group.
+
+    Tasks stay assigned to a member who leaves, so a member added back
+    must not start from zero.
+    """
+    from groups.models import GroupMembership
+    from .models import Task
+    as_of = _overdue_as_of({group_id}).get(group_id)
+    workloads = (
+        Task.objects.filter(group_id=group_id, assigned_to_user__in=user_ids)
+        .order_by().values_list('assigned_to_user').annotate(workload=workload_expression(as_of))
+    )
+    for user_id, workload in workloads:
+        if workload:
+            GroupMembership.objects.filter(group_id=group_id, user_id=user_id).update(workload=workload)
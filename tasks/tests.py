@@ -1,3 +1,387 @@
-from django.test import TestCase
+import csv
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from groups.models import Group, GroupMembership
+from users.models import User
+from .imports import iter_csv_records, iter_ndjson_records
+from .models import CalendarFeed, GroupTaskStats, Task, TaskQuerySet, TaskRecurrence, TaskSwap, TaskVisibility
+from .recurrence import materialize_range, occurrences, parse_cron, validate_cron
+from .signals import tasks_bulk_updated
+from .stats import rebuild_group_stats, refresh_overdue
+from .visibility import rebuild_group_visibility
+
+
+class ImportParsingTests(SimpleTestCase):
+    def test_csv_reports_undecodable_and_malformed_lines(self):
+        lines = [
+            b'\xef\xbb\xbftitle,priority\n',
+            b'first,high\n',
+            b'bad \xff,low\n',
+            b'"' + b'x' * (csv.field_size_limit() + 1) + b'",low\n',
+            b'last,low\n',
+        ]
+        records = list(iter_csv_records(lines))
+        self.assertEqual([line_no for line_no, _ in records], [2, 3, 4, 5])
+        self.assertEqual(records[0][1], {'title': 'first', 'priority': 'high'})
+        self.assertIsInstance(records[1][1], ValueError)
+        self.assertIsInstance(records[2][1], csv.Error)
+        self.assertEqual(records[3][1], {'title': 'last', 'priority': 'low'})
+
+    def test_ndjson_reports_undecodable_lines(self):
+        records = list(iter_ndjson_records([b'{"title": "a"}\n', b'\xff\n', b'\n', b'[1]\n']))
+        self.assertEqual([line_no for line_no, _ in records], [1, 2, 4])
+        self.assertEqual(records[0][1], {'title': 'a'})
+        self.assertIsInstance(records[1][1], ValueError)
+        self.assertIsInstance(records[2][1], ValueError)
+
+
+class ImportCommandTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='x', first_name='Admin', last_name='Test'
+        )
+        cls.group = Group.objects.create(name='Chores', creator=cls.admin)
+        cls.group.add_member(cls.admin)
+
+    def write_file(self, content):
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'wb') as file:
+            file.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def import_tasks(self, path, *args):
+        stdout, stderr = StringIO(), StringIO()
+        try:
+            call_command('import_tasks', self.group.id, path, *args, stdout=stdout, stderr=stderr)
+        finally:
+            self.stdout, self.stderr = stdout.getvalue(), stderr.getvalue()
+
+    def test_undecodable_line_is_reported_and_the_rest_imported(self):
+        path = self.write_file(b'title,priority,assign_to_group\nfirst,high,yes\nbad \xff,low,yes\nlast,low,yes\n')
+        self.import_tasks(path)
+        self.assertIn('line 3: Invalid UTF-8', self.stderr)
+        self.assertIn('Created 2 tasks, 1 lines failed', self.stdout)
+        self.assertEqual(
+            sorted(Task.objects.filter(group=self.group).values_list('title', flat=True)),
+            ['first', 'last'],
+        )
+
+    def test_resume_from_next_line(self):
+        path = self.write_file(b'title,assign_to_group\none,yes\n\xff\nthree,yes\nfour,yes\nfive,yes\n')
+        bulk_create = Task.objects.bulk_create
+        calls = []
+
+        def fail_second_batch(batch):
+            calls.append(len(batch))
+            if len(calls) == 2:
+                raise DatabaseError('disk full')
+            return bulk_create(batch)
+
+        with mock.patch.object(Task.objects, 'bulk_create', side_effect=fail_second_batch):
+            with self.assertRaisesMessage(CommandError, 'resume with --start-line 5'):
+                self.import_tasks(path, '--batch-size', '2')
+        self.assertIn('line 3: Invalid UTF-8', self.stderr)
+        self.assertEqual(sorted(Task.objects.values_list('title', flat=True)), ['one', 'three'])
+
+        self.import_tasks(path, '--batch-size', '2', '--start-line', '5')
+        self.assertIn('Created 2 tasks, 0 lines failed', self.stdout)
+        self.assertEqual(
+            sorted(Task.objects.values_list('title', flat=True)),
+            ['five', 'four', 'one', 'three'],
+        )
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class RecurrenceScheduleTests(SimpleTestCase):
+    def days(self, **fields):
+        rule = TaskRecurrence(starts_at=utc(2024, 12, 2, 9), **fields)
+        return [at.day for at in occurrences(rule, utc(2024, 12, 1), utc(2024, 12, 31))]
+
+    def test_weekday_seven_is_sunday(self):
+        self.assertEqual(parse_cron('0 9 * * 7')[4], {0})
+        self.assertEqual(parse_cron('0 9 * * 5-7')[4], {5, 6, 0})
+
+    def test_value_with_step_runs_to_the_end_of_the_field(self):
+        self.assertEqual(parse_cron('5/15 * * * *')[0], [5, 20, 35, 50])
+        self.assertEqual(parse_cron('0 */6 * * *')[1], [0, 6, 12, 18])
+
+    def test_invalid_fields_are_rejected(self):
+        for expression in ('0 9 * *', '60 * * * *', '0 9 0 * *', '0 9 * * 8', '*/0 * * * *', 'a * * * *'):
+            with self.assertRaises(ValueError, msg=expression):
+                parse_cron(expression)
+
+    def test_day_of_month_or_day_of_week(self):
+        # The 15th (a Sunday) and every Friday
+        self.assertEqual(self.days(frequency='cron', cron='0 9 15 * 5'), [6, 13, 15, 20, 27])
+        # Only the day of week is restricted: Fridays
+        self.assertEqual(self.days(frequency='cron', cron='0 9 * * 5'), [6, 13, 20, 27])
+
+    def test_weekly_interval(self):
+        # Every other week on Monday and Thursday, from Monday Dec 2
+        self.assertEqual(self.days(frequency='weekly', interval=2, weekdays=[0, 3]), [2, 5, 16, 19, 30])
+        self.assertEqual(self.days(frequency='weekly', interval=3), [2, 23])
+
+    def test_daily_interval_and_end(self):
+        self.assertEqual(
+            self.days(frequency='daily', interval=10, ends_at=utc(2024, 12, 22, 9)), [2, 12, 22]
+        )
+
+    @override_settings(RECURRENCE_MIN_INTERVAL_MINUTES=60)
+    def test_too_frequent_cron_is_rejected(self):
+        for expression in ('* * * * *', '*/30 9-17 * * *', '0,30 9 * * *', '*/45 * * * *'):
+            with self.assertRaises(ValueError, msg=expression):
+                validate_cron(expression)
+        validate_cron('0 */2 * * *')
+        validate_cron('0 0,23 * * *')
+
+
+class RecurrenceMaterializeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(
+            email='admin@example.com', username='admin', password='x', first_name='Admin', last_name='Test'
+        )
+        cls.group = Group.objects.create(name='Chores', creator=cls.admin)
+        cls.group.add_member(cls.admin)
+
+    def create_rule(self, **fields):
+        return TaskRecurrence.objects.create(
+            group=self.group, created_by=self.admin, title='Bins', assigned_to_user=self.admin,
+            starts_at=timezone.now() + timedelta(minutes=1), **fields
+        )
+
+    @override_settings(RECURRENCE_HORIZON_DAYS=14)
+    def test_reads_stop_at_the_horizon(self):
+        rule = self.create_rule(frequency='daily')
+        created = materialize_range(TaskRecurrence.objects.all(), timezone.now() + timedelta(days=365))
+        self.assertEqual(created, 14)
+        self.assertEqual(Task.objects.filter(recurrence=rule).count(), 14)
+
+    @override_settings(RECURRENCE_REQUEST_LIMIT=5, RECURRENCE_BATCH_SIZE=3)
+    def test_reads_create_at_most_the_request_limit(self):
+        rules = [self.create_rule(frequency='daily') for _ in range(2)]
+        self.assertEqual(materialize_range(TaskRecurrence.objects.all(), timezone.now() + timedelta(days=14)), 5)
+        self.assertEqual(Task.objects.filter(recurrence__in=rules).count(), 5)
+        # The next read carries on where this one stopped
+        self.assertEqual(materialize_range(TaskRecurrence.objects.all(), timezone.now() + timedelta(days=14)), 5)
+
+
+# Cached feeds must not outlive the test database
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   CALENDAR_FEED_PAST_DAYS=90)
+class CalendarFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='alice@example.com', username='alice', password='x', first_name='Alice', last_name='Test'
+        )
+        group = Group.objects.create(name='Chores', creator=cls.user)
+        group.add_member(cls.user)
+        # Due an hour into the first day of the feed's window
+        first_day = timezone.localdate() - timedelta(days=90)
+        deadline = timezone.make_aware(datetime.combine(first_day, datetime.min.time())) + timedelta(hours=1)
+        cls.task = Task.objects.create(
+            group=group, created_by=cls.user, assigned_to_user=cls.user, title='Old', deadline=deadline
+        )
+        cls.url = reverse('task-calendar-feed', kwargs={'token': CalendarFeed.for_user(cls.user).token})
+
+    def get(self, **headers):
+        response = self.client.get(self.url, **headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body.decode()
+
+    def test_etag_and_cache_follow_the_window(self):
+        response, body = self.get()
+        self.assertIn(f'UID:task-{self.task.id}@', body)
+        etag = response['ETag']
+        response, _ = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        _, cached = self.get()
+        self.assertEqual(cached, body)
+
+        tomorrow = timezone.now() + timedelta(days=1)
+        with mock.patch('django.utils.timezone.now', return_value=tomorrow):
+            response, body = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertNotIn(f'UID:task-{self.task.id}@', body)
+
+
+class DerivedTablesTests(TestCase):
+    """The delta-maintained statistics and visibility rows match a rebuild"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin, cls.alice, cls.bob, cls.carol = [
+            User.objects.create_user(
+                email=f'{name}@example.com', username=name, password='x',
+                first_name=name.title(), last_name='Test'
+            )
+            for name in ('admin', 'alice', 'bob', 'carol')
+        ]
+        cls.group = Group.objects.create(name='Chores', creator=cls.admin)
+        for user in (cls.admin, cls.alice, cls.bob, cls.carol):
+            cls.group.add_member(user)
+
+    def create_task(self, **fields):
+        fields.setdefault('title', 'Task')
+        if 'assigned_to_group' not in fields:
+            fields.setdefault('assigned_to_user', self.alice)
+        return Task.objects.create(group=self.group, created_by=self.admin, **fields)
+
+    def derived_state(self):
+        refresh_overdue(self.group)
+        stats = {
+            row.pop('assignee_id'): row
+            for row in GroupTaskStats.objects.filter(group=self.group).values(
+                'assignee_id', 'total', 'overdue',
+                *[f'status_{value}' for value, _ in Task.STATUS_CHOICES],
+                *[f'priority_{value}' for value, _ in Task.PRIORITY_CHOICES],
+            )
+        }
+        # Rows of assignees whose counters dropped to zero are kept
+        stats = {
+            assignee_id: row for assignee_id, row in stats.items()
+            if assignee_id is None or row['total']
+        }
+        workloads = dict(
+            GroupMembership.objects.filter(group=self.group).values_list('user_id', 'workload')
+        )
+        visibility = set(
+            TaskVisibility.objects.filter(group=self.group)
+            .values_list('user_id', 'task_id', 'assigned', 'deadline')
+        )
+        return stats, workloads, visibility
+
+    def assertMatchesRebuild(self):
+        maintained = self.derived_state()
+        rebuild_group_stats(self.group)
+        rebuild_group_visibility(self.group)
+        self.assertEqual(maintained, self.derived_state())
+
+    def test_create(self):
+        soon = timezone.now() + timedelta(days=1)
+        self.create_task(priority='high', deadline=soon)
+        self.create_task(assigned_to_group=self.group, priority='low')
+        self.create_task(assigned_to_user=self.bob, deadline=timezone.now() - timedelta(days=1))
+        self.assertMatchesRebuild()
+
+    def test_update(self):
+        task = self.create_task(priority='high')
+        group_task = self.create_task(assigned_to_group=self.group)
+        task.status = 'in_progress'
+        task.priority = 'urgent'
+        task.deadline = timezone.now() + timedelta(hours=2)
+        task.save()
+        group_task.assigned_to_group = None
+        group_task.assigned_to_user = self.carol
+        group_task.save()
+        task.status = 'completed'
+        task.save(update_fields=['status'])
+        self.assertMatchesRebuild()
+
+    def test_update_with_deferred_fields(self):
+        self.create_task(priority='medium')
+        task = Task.objects.only('id', 'title', 'status').get()
+        task.status = 'completed'
+        task.save()
+        task = Task.objects.only('id', 'title').get()
+        task.assigned_to_user = self.bob
+        task.save()
+        self.assertMatchesRebuild()
+
+    def test_bulk_status_update(self):
+        for _ in range(3):
+            self.create_task(deadline=timezone.now() + timedelta(days=2))
+        Task.objects.filter(group=self.group).set_status('completed')
+        self.assertMatchesRebuild()
+
+    def test_bulk_status_update_in_chunks(self):
+        other = Group.objects.create(name='Garden', creator=self.admin)
+        other.add_member(self.bob)
+        past = timezone.now() - timedelta(days=1)
+        self.create_task(priority='urgent', deadline=past)
+        self.create_task(assigned_to_user=self.bob, deadline=timezone.now() + timedelta(days=3))
+        self.create_task(assigned_to_group=self.group, deadline=past)
+        self.create_task(status='completed', priority='low')
+        Task.objects.create(title='Weeds', group=other, created_by=self.admin, assigned_to_user=self.bob,
+                            deadline=past)
+        refresh_overdue(self.group)
+        chunks = []
+
+        def receiver(sender, tasks, **kwargs):
+            chunks.append([(task.pk, task.status) for task in tasks])
+
+        tasks_bulk_updated.connect(receiver, sender=Task)
+        self.addCleanup(tasks_bulk_updated.disconnect, receiver, sender=Task)
+        with mock.patch.object(TaskQuerySet, 'bulk_update_chunk_size', 2):
+            self.assertEqual(Task.objects.set_status('cancelled'), 5)
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        # Receivers see the status from before the update
+        self.assertNotIn('cancelled', {status for chunk in chunks for _, status in chunk})
+        self.assertMatchesRebuild()
+        totals = GroupTaskStats.objects.get(group=other, assignee=None)
+        self.assertEqual((totals.status_cancelled, totals.status_not_started), (1, 0))
+        self.assertEqual(GroupMembership.objects.get(group=other, user=self.bob).workload, 0)
+
+        Task.objects.filter(priority='urgent').set_status('in_progress')
+        Task.objects.set_status('completed')
+        self.assertMatchesRebuild()
+
+    def test_delete(self):
+        self.create_task(priority='urgent').delete()
+        self.create_task(assigned_to_group=self.group).delete()
+        self.create_task(assigned_to_user=self.bob)
+        Task.objects.only('id').get().delete()
+        self.assertMatchesRebuild()
+
+    def test_swap(self):
+        mine = self.create_task(assigned_to_user=self.alice, priority='urgent')
+        theirs = self.create_task(assigned_to_user=self.bob, deadline=timezone.now() + timedelta(days=3))
+        swap = TaskSwap.objects.create(
+            requester_task=mine, target_task=theirs, requester=self.alice, target_user=self.bob
+        )
+        self.assertTrue(swap.approve_by_admin(self.admin))
+        self.assertTrue(swap.approve_by_user(self.bob))
+        mine.refresh_from_db()
+        self.assertEqual(mine.assigned_to_user, self.bob)
+        self.assertMatchesRebuild()
+
+    def test_membership_changes(self):
+        self.create_task(assigned_to_group=self.group)
+        self.create_task(assigned_to_user=self.carol, priority='urgent')
+        self.create_task(assigned_to_user=self.bob, deadline=timezone.now() + timedelta(days=1))
+        self.group.remove_member(self.carol)
+        self.group.remove_member(self.bob)
+        self.group.add_member(self.carol)
+        self.group.add_members([self.bob])
+        self.assertMatchesRebuild()
+        self.assertEqual(GroupMembership.objects.get(group=self.group, user=self.carol).workload, 5)
+
+    def test_deadline_buckets_follow_the_cut_off(self):
+        start = timezone.now()
+        for days in (0.1, 3, 10, 30):
+            self.create_task(deadline=start + timedelta(days=days))
+        # overdue 3, due within a week 2, later 1, on top of the medium weight 2
+        membership = GroupMembership.objects.get(group=self.group, user=self.alice)
+        self.assertEqual(membership.workload, 4 * 2 + 2 + 2 + 1 + 1)
+        with mock.patch('django.utils.timezone.now', return_value=start + timedelta(days=8)):
+            refresh_overdue(self.group)
+            membership.refresh_from_db()
+            self.assertEqual(membership.workload, 4 * 2 + 3 + 3 + 2 + 1)
+            self.assertMatchesRebuild()
@@ -6,6 +6,15 @@ urlpatterns = [
     path('', views.TaskListView.as_view(), name='task-list'),
     path('<int:pk>/', views.TaskDetailView.as_view(), name='task-detail'),
     path('groups/<int:group_id>/create/', views.TaskCreateView.as_view(), name='task-create'),
+
+    # Calendar
+    path('calendar/', views.task_calendar, name='task-calendar'),
+    path('calendar/feed/', views.calendar_feed_url, name='task-calendar-feed-url'),
+    path('calendar/feed/<str:token>.ics', views.calendar_feed, name='task-calendar-feed'),
+
+    # Recurring tasks
+    path('groups/<int:group_id>/recurrences/', views.group_recurrences, name='task-recurrence-list'),
+    path('recurrences/<int:recurrence_id>/', views.recurrence_detail, name='task-recurrence-detail'),
     
     # Task swaps
     path('swaps/', views.TaskSwapListView.as_view(), name='task-swap-list'),
@@ -1,20 +1,43 @@
-from rest_framework import generics, status, permissions
+from rest_framework import generics, status, permissions, serializers
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
-from .models import Task, TaskSwap
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.http import parse_etags
+from django.utils import timezone
+from django.views.decorators.http import require_safe
+from django.utils.dateparse import parse_datetime
+from core.routers import ReplicaReadMixin, read_from_primary, replica_reads
+from .models import CalendarFeed, Task, TaskRecurrence, TaskSwap
 from groups.models import Group
 from .serializers import (
+    CalendarTaskSerializer,
     TaskSerializer,
     TaskCreateSerializer,
     TaskUpdateSerializer,
+    TaskRecurrenceSerializer,
+    TaskRecurrenceWriteSerializer,
     TaskSwapSerializer,
     TaskSwapCreateSerializer
 )
 
 
-class TaskListView(generics.ListAPIView):
+def datetime_param(request, name):
+    """Parse an ISO 8601 query parameter; naive values are in the project time zone"""
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise serializers.ValidationError({name: 'Enter a valid ISO 8601 date and time'})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class TaskListView(ReplicaReadMixin, generics.ListAPIView):
     """List tasks assigned to user"""
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -24,11 +47,11 @@ class TaskListView(generics.ListAPIView):
         group_id = self.request.query_params.get('group')
         status_filter = self.request.query_params.get('status')
 
-        # Base queryset - tasks assigned to user or groups user belongs to
+        # Base queryset - tasks assigned to user or groups user belongs to,
+        # read from the visibility table (one row per user and task)
         queryset = Task.objects.filter(
-            Q(assigned_to_user=user) |
-            Q(assigned_to_group__in=user.user_groups.all())
-        ).distinct()
+            visibility__user=user, visibility__assigned=True, group__deleted_at__isnull=True
+        )
 
         # Filter by group if specified
         if group_id:
@@ -38,6 +61,21 @@ class TaskListView(generics.ListAPIView):
         if status_filter:
             queryset = queryset.filter(status=status_filter)
 
+        # Filter by deadline range; recurring tasks due in the range are
+        # created first
+        due_after = datetime_param(self.request, 'due_after')
+        due_before = datetime_param(self.request, 'due_before')
+        if due_after:
+            queryset = queryset.filter(deadline__gte=due_after)
+        if due_before:
+            from .recurrence import materialize_range
+            rules = TaskRecurrence.objects.filter(group__members=user)
+            if group_id:
+                rules = rules.filter(group_id=group_id)
+            if materialize_range(rules, due_before):
+                read_from_primary(self.request)
+            queryset = queryset.filter(deadline__lte=due_before)
+
         return queryset
 
 
@@ -57,6 +95,7 @@ class TaskCreateView(generics.CreateAPIView):
         # Get assignment details
         assigned_to_user_id = serializer.validated_data.get('assigned_to_user_id')
         assign_to_group = serializer.validated_data.get('assign_to_group', False)
+        auto_assign = serializer.validated_data.get('auto_assign', False)
 
         # Prepare task data
         task_data = {
@@ -70,6 +109,9 @@ class TaskCreateView(generics.CreateAPIView):
 
         if assign_to_group:
             task_data['assigned_to_group'] = group
+        elif auto_assign:
+            # Pick the member with the lowest weighted open workload
+            task_data['assigned_to_user'] = group.least_loaded_member()
         elif assigned_to_user_id:
             # Validate user is member of group
             if not group.members.filter(id=assigned_to_user_id.id).exists():
@@ -78,14 +120,10 @@ class TaskCreateView(generics.CreateAPIView):
 
         task = Task.objects.create(**task_data)
 
-        # Create notification for assigned user(s)
-        from notifications.models import Notification
-        if task.assigned_to_user:
-            Notification.create_task_assigned(task, task.assigned_to_user)
-        elif task.assigned_to_group:
-            for member in task.assigned_to_group.members.all():
-                if member != self.request.user:  # Don't notify the creator
-                    Notification.create_task_assigned(task, member)
+        # Notify the assigned user(s) in the background
+        from jobs.queue import enqueue_on_commit
+        from notifications.jobs import task_assigned
+        enqueue_on_commit(task_assigned, task_id=task.pk)
 
 
 class TaskDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -98,12 +136,8 @@ class TaskDetailView(generics.RetrieveUpdateDestroyAPIView):
         return TaskSerializer
 
     def get_queryset(self):
-        user = self.request.user
-        return Task.objects.filter(
-            Q(assigned_to_user=user) |
-            Q(assigned_to_group__in=user.user_groups.all()) |
-            Q(group__creator=user)  # Include tasks in groups user administers
-        ).distinct()
+        # Assigned tasks and tasks in groups the user administers
+        return Task.objects.filter(visibility__user=self.request.user, group__deleted_at__isnull=True)
 
     def perform_update(self, serializer):
         task = self.get_object()
@@ -126,11 +160,154 @@ class TaskDetailView(generics.RetrieveUpdateDestroyAPIView):
         instance.delete()
 
 
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+@replica_reads
+def task_calendar(request):
+    """List the user's tasks with a deadline between from and to"""
+    from datetime import timedelta
+    from .calendar import calendar_settings, calendar_tasks
+    start = datetime_param(request, 'from')
+    end = datetime_param(request, 'to')
+    if start is None or end is None:
+        return Response({'error': 'from and to are required'}, status=status.HTTP_400_BAD_REQUEST)
+    max_days = calendar_settings()['MAX_RANGE_DAYS']
+    if not start < end <= start + timedelta(days=max_days):
+        return Response({'error': f'to must be after from and at most {max_days} days later'},
+                       status=status.HTTP_400_BAD_REQUEST)
+
+    # Recurring tasks due in the range are created first
+    from .recurrence import materialize_range
+    if materialize_range(TaskRecurrence.objects.filter(group__members=request.user), end):
+        read_from_primary(request)
+    tasks = calendar_tasks(request.user, start, end)
+    return Response(CalendarTaskSerializer(tasks, many=True).data)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([permissions.IsAuthenticated])
+def calendar_feed_url(request):
+    """Get the URL of the user's iCalendar feed; POST replaces it with a new one"""
+    feed = CalendarFeed.for_user(request.user)
+    if request.method == 'POST':
+        feed.rotate()
+    url = request.build_absolute_uri(reverse('task-calendar-feed', args=[feed.token]))
+    return Response({'url': url})
+
+
+@require_safe
+def calendar_feed(request, token):
+    """iCalendar feed of the tasks assigned to the token's user"""
+    from core.metrics import record_cache
+    from .calendar import cached_feed, feed_etag, feed_version, feed_window_start, stream_feed
+    user_id = CalendarFeed.objects.filter(token=token).values_list('user_id', flat=True).first()
+    if user_id is None:
+        return HttpResponse(status=404)
+
+    since = feed_window_start()
+    version = feed_version(user_id, since)
+    etag = feed_etag(user_id, version)
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        body = cached_feed(user_id, version)
+        record_cache('calendar_feed', body is not None)
+        content_type = 'text/calendar; charset=utf-8'
+        if body is not None:
+            response = HttpResponse(body, content_type=content_type)
+        else:
+            response = StreamingHttpResponse(
+                stream_feed(user_id, version, since), content_type=content_type
+            )
+    response['ETag'] = etag
+    # Clients revalidate on every poll; the ETag makes that cheap
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def save_recurrence(serializer, group, **kwargs):
+    """Save a recurrence from TaskRecurrenceWriteSerializer data, or return an error message"""
+    assigned_to_user = serializer.validated_data.pop('assigned_to_user_id', None)
+    assign_to_group = serializer.validated_data.pop('assign_to_group', False)
+    if assigned_to_user:
+        if not group.members.filter(id=assigned_to_user.id).exists():
+            return None, 'User must be a member of the group'
+        kwargs.update(assigned_to_user=assigned_to_user, assigned_to_group=None)
+    elif assign_to_group:
+        kwargs.update(assigned_to_user=None, assigned_to_group=group)
+    return serializer.save(group=group, **kwargs), None
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([permissions.IsAuthenticated])
+def group_recurrences(request, group_id):
+    """List or create the recurring tasks of a group"""
+    group = get_object_or_404(Group, id=group_id, members=request.user)
+
+    if request.method == 'GET':
+        recurrences = TaskRecurrence.objects.filter(group=group).select_related(
+            'assigned_to_user', 'assigned_to_group', 'created_by'
+        )
+        return Response(TaskRecurrenceSerializer(recurrences, many=True).data)
+
+    # Check if user is admin
+    if not group.is_admin(request.user):
+        return Response({'error': 'Only group admin can create recurring tasks'},
+                       status=status.HTTP_403_FORBIDDEN)
+
+    serializer = TaskRecurrenceWriteSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    from .recurrence import horizon_end, materialize_range
+    recurrence, error = save_recurrence(serializer, group, created_by=request.user)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+    materialize_range(TaskRecurrence.objects.filter(pk=recurrence.pk), horizon_end())
+    recurrence.refresh_from_db()
+    return Response(TaskRecurrenceSerializer(recurrence).data, status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET', 'PATCH', 'DELETE'])
+@permission_classes([permissions.IsAuthenticated])
+def recurrence_detail(request, recurrence_id):
+    """Get, update or delete a recurring task"""
+    recurrence = get_object_or_404(
+        TaskRecurrence, id=recurrence_id, group__members=request.user, group__deleted_at__isnull=True
+    )
+    if request.method == 'GET':
+        return Response(TaskRecurrenceSerializer(recurrence).data)
+
+    # Check if user is admin
+    if not recurrence.group.is_admin(request.user):
+        return Response({'error': 'Only group admin can change recurring tasks'},
+                       status=status.HTTP_403_FORBIDDEN)
+
+    from .recurrence import horizon_end, materialize_range, reschedule
+    if request.method == 'DELETE':
+        # Past occurrences stay as ordinary tasks
+        reschedule(recurrence)
+        recurrence.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    serializer = TaskRecurrenceWriteSerializer(recurrence, data=request.data, partial=True)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    recurrence, error = save_recurrence(serializer, recurrence.group)
+    if error:
+        return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+    # Future occurrences nobody started are created again from the new rule
+    reschedule(recurrence)
+    materialize_range(TaskRecurrence.objects.filter(pk=recurrence.pk), horizon_end())
+    recurrence.refresh_from_db()
+    return Response(TaskRecurrenceSerializer(recurrence).data)
+
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def create_task_swap(request, task_id):
     """Create task swap request"""
-    requester_task = get_object_or_404(Task, id=task_id)
+    requester_task = get_object_or_404(Task, id=task_id, group__deleted_at__isnull=True)
 
     # Check if user can swap this task (must be assigned to them)
     if not requester_task.is_assigned_to_user(request.user):
@@ -174,9 +351,10 @@ def create_task_swap(request, task_id):
             target_user=target_user
         )
 
-        # Create notification
-        from notifications.models import Notification
-        Notification.create_swap_request(swap)
+        # Notify the target user in the background
+        from jobs.queue import enqueue_on_commit
+        from notifications.jobs import swap_requested
+        enqueue_on_commit(swap_requested, swap_id=swap.pk)
 
         return Response(TaskSwapSerializer(swap, context={'request': request}).data,
                        status=status.HTTP_201_CREATED)
@@ -195,7 +373,8 @@ class TaskSwapListView(generics.ListAPIView):
         return TaskSwap.objects.filter(
             Q(requester=user) |
             Q(target_user=user) |
-            Q(requester_task__group__creator=user)
+            Q(requester_task__group__creator=user),
+            requester_task__group__deleted_at__isnull=True
         ).distinct()
 
 
@@ -203,13 +382,14 @@ class TaskSwapListView(generics.ListAPIView):
 @permission_classes([permissions.IsAuthenticated])
 def approve_swap_admin(request, swap_id):
     """Approve task swap as group admin"""
-    swap = get_object_or_404(TaskSwap, id=swap_id)
+    swap = get_object_or_404(TaskSwap, id=swap_id, requester_task__group__deleted_at__isnull=True)
 
     if swap.approve_by_admin(request.user):
-        # Create notification if fully approved
+        # Notify the requester in the background if fully approved
         if swap.status == 'approved':
-            from notifications.models import Notification
-            Notification.create_swap_approved(swap)
+            from jobs.queue import enqueue_on_commit
+            from notifications.jobs import swap_approved
+            enqueue_on_commit(swap_approved, swap_id=swap.pk)
 
         return Response(TaskSwapSerializer(swap, context={'request': request}).data)
     else:
@@ -221,13 +401,14 @@ def approve_swap_admin(request, swap_id):
 @permission_classes([permissions.IsAuthenticated])
 def approve_swap_user(request, swap_id):
     """Approve task swap as target user"""
-    swap = get_object_or_404(TaskSwap, id=swap_id)
+    swap = get_object_or_404(TaskSwap, id=swap_id, requester_task__group__deleted_at__isnull=True)
 
     if swap.approve_by_user(request.user):
-        # Create notification if fully approved
+        # Notify the requester in the background if fully approved
         if swap.status == 'approved':
-            from notifications.models import Notification
-            Notification.create_swap_approved(swap)
+            from jobs.queue import enqueue_on_commit
+            from notifications.jobs import swap_approved
+            enqueue_on_commit(swap_approved, swap_id=swap.pk)
 
         return Response(TaskSwapSerializer(swap, context={'request': request}).data)
     else:
@@ -239,7 +420,7 @@ def approve_swap_user(request, swap_id):
 @permission_classes([permissions.IsAuthenticated])
 def reject_swap(request, swap_id):
     """Reject task swap request"""
-    swap = get_object_or_404(TaskSwap, id=swap_id)
+    swap = get_object_or_404(TaskSwap, id=swap_id, requester_task__group__deleted_at__isnull=True)
 
     # Can be rejected by admin or target user
     if not (swap.task.group.is_admin(request.user) or swap.target_user == request.user):
@@ -0,0 +1,129 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+# Rows inserted per bulk_create statement
+BATCH_SIZE = 2000
+
+# Task attributes that decide who can see a task
+VISIBILITY_FIELDS = ('group_id', 'assigned_to_user_id', 'assigned_to_group_id')
+
+
+def _model():
+    from .models import TaskVisibility
+    return TaskVisibility
+
+
+def _group_info(group_ids, member_group_ids):
+    """Return ({group_id: creator_id}, {group_id: [member ids]})"""
+    from groups.models import Group, GroupMembership
+    creators = dict(Group.objects.filter(id__in=group_ids).values_list('id', 'creator_id'))
+    members = defaultdict(list)
+    if member_group_ids:
+        for group_id, user_id in GroupMembership.objects.filter(
+            group_id__in=member_group_ids
+        ).values_list('group_id', 'user_id').iterator():
+            members[group_id].append(user_id)
+    return creators, members
+
+
+def _task_rows(task, creators, members):
+    """Visibility rows of one task as {user_id: assigned}"""
+    users = {}
+    if task.assigned_to_user_id:
+        users[task.assigned_to_user_id] = True
+    if task.assigned_to_group_id:
+        for user_id in members[task.assigned_to_group_id]:
+            users[user_id] = True
+    creator_id = creators.get(task.group_id)
+    if creator_id:
+        users.setdefault(creator_id, False)
+    return users
+
+
+def _insert(tasks):
+    TaskVisibility = _model()
+    group_ids = {task.group_id for task in tasks}
+    assigned_groups = {task.assigned_to_group_id for task in tasks if task.assigned_to_group_id}
+    creators, members = _group_info(group_ids, assigned_groups)
+    rows = [
+        TaskVisibility(user_id=user_id, task_id=task.pk, group_id=task.group_id, assigned=assigned,
+                       deadline=task.deadline)
+        for task in tasks
+        for user_id, assigned in _task_rows(task, creators, members).items()
+    ]
+    TaskVisibility.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+
+def visibility_changed(old, new):
+    """Whether a save between two task snapshots changes who can see the task"""
+    if old is None or new is None:
+        return True
+    return any(old.get(name) != new.get(name) for name in VISIBILITY_FIELDS)
+
+
+def refresh_task(task):
+    """Recompute the visibility rows of one task"""
+    with transaction.atomic():
+        _model().objects.filter(task_id=task.pk).delete()
+        _insert([task])
+
+
+def update_deadline(task):
+    """Copy a changed deadline to the task's visibility rows"""
+    _model().objects.filter(task_id=task.pk).update(deadline=task.deadline)
+
+
+def add_tasks(tasks):
+    """Insert visibility rows for newly created tasks"""
+    if tasks:
+        with transaction.atomic():
+            _insert(tasks)
+
+
+def members_added(group_id, user_ids):
+    """Make the group's group-assigned tasks visible to new members"""
+    from .models import Task
+    TaskVisibility = _model()
+    tasks = Task.objects.filter(assigned_to_group_id=group_id).values_list('id', 'deadline')
+    rows = [
+        TaskVisibility(user_id=user_id, task_id=task_id, group_id=group_id, assigned=True,
+                       deadline=deadline)
+        for task_id, deadline in tasks.iterator()
+        for user_id in user_ids
+    ]
+    # A new member may already see a task as the group's admin
+    TaskVisibility.objects.bulk_create(
+        rows,
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=['user', 'task'],
+        update_fields=['assigned']
+    )
+
+
+def member_removed(group_id, user_id):
+    """Drop what a removed member could only see through the group assignment"""
+    from groups.models import Group
+    TaskVisibility = _model()
+    rows = TaskVisibility.objects.filter(
+        user_id=user_id, group_id=group_id, task__assigned_to_group_id=group_id
+    )
+    if Group.objects.filter(id=group_id, creator_id=user_id).exists():
+        rows.update(assigned=False)
+    else:
+        rows.delete()
+
+
+def rebuild_group_visibility(group):
+    """Recompute every visibility row of a group from tasks and memberships"""
+    from .models import Task
+    tasks = list(
+        Task.objects.filter(group=group)
+        .only('deadline', *[name.removesuffix('_id') for name in VISIBILITY_FIELDS])
+        .order_by()
+    )
+    with transaction.atomic():
+        _model().objects.filter(group=group).delete()
+        _insert(tasks)
+    return len(tasks)
@@ -0,0 +1,270 @@
+import random
+import string
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from groups.models import Group, GroupMembership
+from notifications.models import Notification
+from tasks.models import Task, TaskSwap
+
+User = get_user_model()
+
+USER_ID_ALPHABET = string.ascii_uppercase + string.digits
+PRIORITY_WEIGHTS = {'low': 3, 'medium': 5, 'high': 2, 'urgent': 1}
+STATUS_WEIGHTS = {'not_started': 4, 'in_progress': 3, 'completed': 4, 'cancelled': 1}
+SWAP_STATUS_WEIGHTS = {'pending_admin': 3, 'pending_user': 2, 'approved': 2, 'rejected': 1}
+NOTIFICATION_TYPES = ['task_assigned', 'task_updated', 'swap_requested', 'swap_approved', 'deadline_reminder']
+
+# Task ids kept per group to pick swap and notification targets from
+TASK_SAMPLES_PER_GROUP = 50
+
+
+class Command(BaseCommand):
+    help = 'Generate a large, reproducible synthetic dataset for performance testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--min-members', type=int, default=3)
+        parser.add_argument('--max-members', type=int, default=50)
+        parser.add_argument('--membership', choices=['uniform', 'zipf'], default='zipf',
+                            help='How users are spread over groups; zipf makes a few users '
+                                 'members of many groups')
+        parser.add_argument('--tasks-per-group', type=int, default=100,
+                            help='Average number of tasks per group')
+        parser.add_argument('--group-task-ratio', type=float, default=0.1,
+                            help='Share of tasks assigned to the whole group')
+        parser.add_argument('--swaps', type=int, default=1000)
+        parser.add_argument('--notifications-per-user', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--password', default='password123',
+                            help='Password for every generated user (hashed once)')
+        parser.add_argument('--email-prefix', default='load',
+                            help='Generated emails look like <prefix>-<seed>-<n>@example.com')
+
+    def handle(self, *args, **options):
+        if options['min_members'] < 1 or options['max_members'] < options['min_members']:
+            raise CommandError('--min-members must be at least 1 and not above --max-members')
+        if options['users'] < options['max_members']:
+            raise CommandError('--users must be at least --max-members')
+
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.now = timezone.now()
+        started = time.monotonic()
+
+        email_prefix = f"{options['email_prefix']}-{options['seed']}-"
+        if User.objects.filter(email__startswith=email_prefix).exists():
+            raise CommandError(
+                f'Users with emails starting with "{email_prefix}" already exist; '
+                'use another --seed or --email-prefix'
+            )
+
+        user_ids = self.create_users(options['users'], email_prefix, options['password'])
+        groups = self.create_groups(user_ids, options)
+        samples = self.create_tasks(groups, options)
+        self.create_swaps(samples, options['swaps'])
+        self.create_notifications(groups, samples, options['notifications_per_user'])
+
+        self.stdout.write('Rebuilding derived tables...')
+        call_command('rebuild_task_stats', stdout=self.stdout)
+        call_command('rebuild_task_visibility', stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Synthetic data generated in {time.monotonic() - started:.1f}s'
+        ))
+
+    def bulk_insert(self, model, objects):
+        """Insert objects in chunks, one transaction per chunk"""
+        created = []
+        for start in range(0, len(objects), self.chunk_size):
+            with transaction.atomic():
+                created.extend(model.objects.bulk_create(objects[start:start + self.chunk_size]))
+        return created
+
+    def new_user_ids(self, count):
+        """Generate unique user IDs without the per-row lookup of generate_user_id"""
+        taken = set(User.objects.values_list('user_id', flat=True).iterator())
+        ids = []
+        while len(ids) < count:
+            user_id = ''.join(self.rng.choices(USER_ID_ALPHABET, k=8))
+            if user_id not in taken:
+                taken.add(user_id)
+                ids.append(user_id)
+        return ids
+
+    def create_users(self, count, email_prefix, password):
+        self.stdout.write(f'Creating {count} users...')
+        password_hash = make_password(password)
+        users = [
+            User(
+                user_id=user_id,
+                email=f'{email_prefix}{n}@example.com',
+                username=f'{email_prefix}{n}',
+                first_name=f'Load{n}',
+                last_name='User',
+                password=password_hash,
+            )
+            for n, user_id in enumerate(self.new_user_ids(count))
+        ]
+        self.bulk_insert(User, users)
+        return list(
+            User.objects.filter(email__startswith=email_prefix).order_by('id').values_list('id', flat=True)
+        )
+
+    def pick_members(self, user_ids, weights, size):
+        members = set()
+        while len(members) < size:
+            if weights:
+                members.update(self.rng.choices(user_ids, cum_weights=weights, k=size - len(members)))
+            else:
+                members.update(self.rng.sample(user_ids, size - len(members)))
+        return members
+
+    def create_groups(self, user_ids, options):
+        count = options['groups']
+        self.stdout.write(f'Creating {count} groups...')
+        groups = self.bulk_insert(Group, [
+            Group(
+                name=f'Load group {n}',
+                description='Generated by generate_load_data',
+                creator_id=self.rng.choice(user_ids),
+            )
+            for n in range(count)
+        ])
+
+        cum_weights = None
+        if options['membership'] == 'zipf':
+            cum_weights = []
+            total = 0.0
+            for rank in range(1, len(user_ids) + 1):
+                total += 1.0 / rank
+                cum_weights.append(total)
+
+        memberships = []
+        result = []
+        for group in groups:
+            size = self.rng.randint(options['min_members'], options['max_members'])
+            members = self.pick_members(user_ids, cum_weights, size - 1)
+            members.discard(group.creator_id)
+            members = [group.creator_id] + sorted(members)
+            memberships.extend(
+                GroupMembership(group_id=group.id, user_id=user_id, added_by_id=group.creator_id)
+                for user_id in members
+            )
+            result.append((group.id, group.creator_id, members))
+        self.stdout.write(f'Creating {len(memberships)} memberships...')
+        self.bulk_insert(GroupMembership, memberships)
+        return result
+
+    def random_deadline(self):
+        if self.rng.random() < 0.3:
+            return None
+        return self.now + timedelta(minutes=self.rng.randint(-30 * 24 * 60, 60 * 24 * 60))
+
+    def create_tasks(self, groups, options):
+        mean = options['tasks_per_group']
+        priorities, priority_weights = zip(*PRIORITY_WEIGHTS.items())
+        statuses, status_weights = zip(*STATUS_WEIGHTS.items())
+        samples = {}
+        pending = []
+        created = 0
+
+        def flush():
+            nonlocal created
+            with transaction.atomic():
+                for task in Task.objects.bulk_create(pending):
+                    group_samples = samples.setdefault(task.group_id, [])
+                    if len(group_samples) < TASK_SAMPLES_PER_GROUP:
+                        group_samples.append((task.id, task.assigned_to_user_id))
+            created += len(pending)
+            pending.clear()
+            self.stdout.write(f'  {created} tasks')
+
+        self.stdout.write(f'Creating about {mean * len(groups)} tasks...')
+        for group_id, creator_id, members in groups:
+            for n in range(self.rng.randint(mean // 2, mean + mean // 2)):
+                to_group = self.rng.random() < options['group_task_ratio']
+                pending.append(Task(
+                    title=f'Task {group_id}-{n}',
+                    priority=self.rng.choices(priorities, priority_weights)[0],
+                    status=self.rng.choices(statuses, status_weights)[0],
+                    deadline=self.random_deadline(),
+                    assigned_to_user_id=None if to_group else self.rng.choice(members),
+                    assigned_to_group_id=group_id if to_group else None,
+                    created_by_id=creator_id,
+                    group_id=group_id,
+                ))
+                if len(pending) >= self.chunk_size:
+                    flush()
+        if pending:
+            flush()
+        return samples
+
+    def create_swaps(self, samples, count):
+        self.stdout.write(f'Creating up to {count} swaps...')
+        statuses, weights = zip(*SWAP_STATUS_WEIGHTS.items())
+        candidates = [
+            [(task_id, user_id) for task_id, user_id in group_samples if user_id]
+            for group_samples in samples.values()
+        ]
+        candidates = [tasks for tasks in candidates if len({user for _, user in tasks}) > 1]
+        if not candidates:
+            return
+
+        swaps = []
+        for _ in range(count):
+            tasks = self.rng.choice(candidates)
+            (requester_task, requester), (target_task, target_user) = self.rng.sample(tasks, 2)
+            if requester == target_user:
+                continue
+            status = self.rng.choices(statuses, weights)[0]
+            swaps.append(TaskSwap(
+                requester_task_id=requester_task,
+                target_task_id=target_task,
+                requester_id=requester,
+                target_user_id=target_user,
+                status=status,
+                admin_approved=status in ('pending_user', 'approved'),
+                user_approved=status == 'approved',
+            ))
+        self.bulk_insert(TaskSwap, swaps)
+
+    def create_notifications(self, groups, samples, per_user):
+        self.stdout.write('Creating notifications...')
+        user_groups = {}
+        for group_id, _, members in groups:
+            for user_id in members:
+                user_groups.setdefault(user_id, []).append(group_id)
+
+        pending = []
+        for user_id, group_ids in user_groups.items():
+            for _ in range(self.rng.randint(0, per_user * 2)):
+                group_id = self.rng.choice(group_ids)
+                task_id = None
+                if samples.get(group_id):
+                    task_id = self.rng.choice(samples[group_id])[0]
+                is_read = self.rng.random() < 0.6
+                pending.append(Notification(
+                    recipient_id=user_id,
+                    notification_type=self.rng.choice(NOTIFICATION_TYPES),
+                    title=f'Notification for task {task_id}',
+                    message='Generated by generate_load_data',
+                    related_task_id=task_id,
+                    related_group_id=group_id,
+                    is_read=is_read,
+                    read_at=self.now if is_read else None,
+                ))
+                if len(pending) >= self.chunk_size:
+                    self.bulk_insert(Notification, pending)
+                    pending = []
+        if pending:
+            self.bulk_insert(Notification, pending)
@@ -1,3 +1,54 @@
+from datetime import datetime, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
 
-# Create your tests here.
+from groups.models import Group, GroupMembership
+from notifications.models import Notification
+from tasks.models import Task, TaskSwap
+from .models import User
+
+
+class GenerateLoadDataTests(TestCase):
+    NOW = datetime(2026, 1, 5, 12, tzinfo=dt_timezone.utc)
+
+    def generate(self, seed):
+        with mock.patch('users.management.commands.generate_load_data.timezone.now', return_value=self.NOW):
+            call_command('generate_load_data', users=6, groups=2, min_members=2, max_members=4,
+                         tasks_per_group=4, swaps=3, notifications_per_user=2, seed=seed,
+                         stdout=StringIO())
+
+    def dataset(self):
+        """The generated rows, without their database ids"""
+        return {
+            'users': list(User.objects.order_by('id').values_list('user_id', 'email')),
+            'groups': list(Group.objects.order_by('id').values_list('name', 'creator__user_id')),
+            'members': sorted(GroupMembership.objects.values_list('group__name', 'user__user_id')),
+            'tasks': list(Task.objects.order_by('id').values_list(
+                'group__name', 'priority', 'status', 'deadline', 'assigned_to_user__user_id',
+                'assigned_to_group__name',
+            )),
+            'swaps': list(TaskSwap.objects.order_by('id').values_list(
+                'requester__user_id', 'target_user__user_id', 'status',
+            )),
+            'notifications': list(Notification.objects.order_by('id').values_list(
+                'recipient__user_id', 'notification_type', 'related_group__name', 'is_read',
+            )),
+        }
+
+    def test_same_seed_gives_the_same_dataset(self):
+        self.generate(seed=7)
+        first = self.dataset()
+        self.assertEqual(len(first['users']), 6)
+        self.assertEqual(len(first['groups']), 2)
+        self.assertTrue(first['tasks'])
+
+        User.objects.all().delete()
+        self.generate(seed=7)
+        self.assertEqual(self.dataset(), first)
+
+        User.objects.all().delete()
+        self.generate(seed=8)
+        self.assertNotEqual(self.dataset()['users'], first['users'])
@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from django.db import models
+from core.routers import replica_reads
 from .models import User
 from .serializers import (
     UserRegistrationSerializer,
@@ -56,6 +57,7 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@replica_reads
 def search_users(request):
     """Search users by user_id or name"""
     query = request.GET.get('q', '')
@@ -0,0 +1,30 @@
+from django.contrib import admin
+from core.admin import LargeTableAdmin
+from .models import OutboxEvent, WebhookDelivery, WebhookEndpoint
+
+
+@admin.register(WebhookEndpoint)
+class WebhookEndpointAdmin(admin.ModelAdmin):
+    list_display = ['url', 'group', 'active', 'failures', 'retry_at', 'created_at']
+    list_filter = ['active']
+    list_select_related = ['group']
+    search_fields = ['url', 'group__name']
+    autocomplete_fields = ['group', 'created_by']
+    readonly_fields = ['secret', 'failures', 'retry_at', 'leased_until', 'created_at', 'updated_at']
+
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(LargeTableAdmin):
+    list_display = ['id', 'event', 'group', 'created_at', 'dispatched_at']
+    list_filter = ['event']
+    list_select_related = ['group']
+    date_hierarchy = 'created_at'
+    readonly_fields = ['group', 'event', 'payload', 'created_at', 'dispatched_at']
+
+
+@admin.register(WebhookDelivery)
+class WebhookDeliveryAdmin(LargeTableAdmin):
+    list_display = ['id', 'endpoint', 'event', 'status', 'attempts', 'response_status', 'delivered_at']
+    list_filter = ['status']
+    list_select_related = ['endpoint', 'event']
+    readonly_fields = ['endpoint', 'event', 'attempts', 'response_status', 'error', 'created_at', 'delivered_at']
@@ -0,0 +1,340 @@
+"""Delivering outbox events to webhook endpoints.
+
+Runs in ``python manage.py dispatch_webhooks``, never on the request path.
+Each round:
+
+1. ``fan_out`` turns undispatched outbox events into one pending
+   ``WebhookDelivery`` per subscribed endpoint.
+2. ``claim_endpoints`` leases endpoints with pending deliveries that are not
+   backing off. The lease keeps other dispatchers away, so an endpoint has
+   one batch in flight and receives its events in order.
+3. The oldest ``WEBHOOK_BATCH_SIZE`` pending deliveries of each endpoint are
+   POSTed as one JSON batch, on a pool of ``WEBHOOK_MAX_WORKERS`` threads.
+   The leases of batches still in flight (a slow endpoint, or one waiting for
+   a thread) are renewed every ``WEBHOOK_TIMEOUT`` seconds.
+
+A failed batch is retried with exponential backoff; after
+``WEBHOOK_MAX_ATTEMPTS`` attempts its deliveries are marked ``dead`` (they
+can be requeued through the API) and the endpoint moves on to later events.
+
+Endpoints must be http(s) URLs of hosts with public addresses only, checked
+when they are registered and again on every connection (the address that was
+checked is the one connected to, so DNS changes cannot point a request at an
+internal service). Redirects are not followed. Failures are stored with a
+generic message, and only logged in detail, so deliveries do not reveal what
+an endpoint's host answers. ``WEBHOOK_ALLOW_PRIVATE_ADDRESSES`` lifts the
+address check for local development.
+"""
+import hashlib
+import hmac
+import http.client
+import ipaddress
+import json
+import logging
+import random
+import socket
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.utils import timezone
+
+from .models import OutboxEvent, WebhookDelivery, WebhookEndpoint
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_HEADER = 'X-TaskSphere-Signature'
+SCHEMES = ('http', 'https')
+
+
+def webhook_settings():
+    return {
+        'BATCH_SIZE': getattr(settings, 'WEBHOOK_BATCH_SIZE', 50),
+        'MAX_WORKERS': getattr(settings, 'WEBHOOK_MAX_WORKERS', 8),
+        'TIMEOUT': getattr(settings, 'WEBHOOK_TIMEOUT', 10),
+        'MAX_ATTEMPTS': getattr(settings, 'WEBHOOK_MAX_ATTEMPTS', 8),
+        'BACKOFF_BASE': getattr(settings, 'WEBHOOK_BACKOFF_BASE', 10),
+        'BACKOFF_MAX': getattr(settings, 'WEBHOOK_BACKOFF_MAX', 3600),
+        'ALLOW_PRIVATE_ADDRESSES': getattr(settings, 'WEBHOOK_ALLOW_PRIVATE_ADDRESSES', False),
+    }
+
+
+class UnsafeURLError(ValueError):
+    """A webhook URL that must not be requested"""
+
+
+def public_addresses(host, port):
+    """Resolve host; return its addresses, or raise UnsafeURLError unless all are public"""
+    addresses = []
+    for *_, sockaddr in socket.getaddrinfo(host, port, type=socket.SOCK_STREAM):
+        address = ipaddress.ip_address(sockaddr[0].split('%')[0])
+        if not webhook_settings()['ALLOW_PRIVATE_ADDRESSES'] and (
+            not address.is_global or address.is_multicast
+        ):
+            raise UnsafeURLError(f'Host {host!r} does not have a public address')
+        addresses.append(sockaddr)
+    return addresses
+
+
+def check_url(url):
+    """Raise UnsafeURLError unless url is an http(s) URL of a public host"""
+    parts = urlsplit(url)
+    if parts.scheme not in SCHEMES or not parts.hostname:
+        raise UnsafeURLError('Only http and https URLs are allowed')
+    try:
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+    except ValueError:
+        raise UnsafeURLError('Invalid port')
+    try:
+        public_addresses(parts.hostname, port)
+    except (OSError, UnicodeError):
+        raise UnsafeURLError(f'Cannot resolve host {parts.hostname!r}')
+
+
+def _connect(host, port, timeout):
+    """Connect to one of the checked addresses of host"""
+    error = None
+    for sockaddr in public_addresses(host, port):
+        try:
+            return socket.create_connection(sockaddr[:2], timeout)
+        except OSError as exc:
+            error = exc
+    raise error
+
+
+class _HTTPConnection(http.client.HTTPConnection):
+    def connect(self):
+        self.sock = _connect(self.host, self.port, self.timeout)
+
+
+class _HTTPSConnection(http.client.HTTPSConnection):
+    def connect(self):
+        sock = _connect(self.host, self.port, self.timeout)
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+
+class _HTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_HTTPConnection, req)
+
+
+class _HTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_HTTPSConnection, req, context=self._context)
+
+
+class _NoRedirectHandler(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        # The 3xx response fails the batch like any other non-2xx status
+        return None
+
+
+# No proxies from the environment: they would connect on our behalf
+_opener = urllib.request.build_opener(
+    urllib.request.ProxyHandler({}), _HTTPHandler, _HTTPSHandler, _NoRedirectHandler
+)
+
+
+def backoff(failures):
+    """Seconds to wait after the given number of consecutive failures"""
+    config = webhook_settings()
+    delay = min(config['BACKOFF_BASE'] * 2 ** (failures - 1), config['BACKOFF_MAX'])
+    # Spread out the retries of endpoints that failed together
+    return delay * random.uniform(0.8, 1.0)
+
+
+def fan_out(batch_size=1000):
+    """Create the deliveries of undispatched events; return the number of events"""
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.filter(dispatched_at__isnull=True)
+            .order_by('id').only('id', 'group_id', 'event')[:batch_size]
+        )
+        if not events:
+            return 0
+        endpoints = defaultdict(list)
+        for endpoint in WebhookEndpoint.objects.filter(
+            group_id__in={event.group_id for event in events}, active=True
+        ).only('id', 'group_id', 'events'):
+            endpoints[endpoint.group_id].append(endpoint)
+        # Another dispatcher may have fanned out the same events
+        WebhookDelivery.objects.bulk_create([
+            WebhookDelivery(endpoint_id=endpoint.pk, event_id=event.pk)
+            for event in events
+            for endpoint in endpoints[event.group_id]
+            if endpoint.subscribes(event.event)
+        ], ignore_conflicts=True)
+        OutboxEvent.objects.filter(id__in=[event.pk for event in events]).update(
+            dispatched_at=timezone.now()
+        )
+    return len(events)
+
+
+def lease_until(now):
+    """End of a lease taken or renewed at ``now``"""
+    # A lease outlives the renewal interval; an expired one belongs to a
+    # dispatcher that died
+    return now + timedelta(seconds=webhook_settings()['TIMEOUT'] * 2 + 30)
+
+
+def claim_endpoints(limit):
+    """Lease up to ``limit`` endpoints that have deliveries due"""
+    now = timezone.now()
+    free = Q(leased_until__isnull=True) | Q(leased_until__lt=now)
+    candidates = WebhookEndpoint.objects.filter(
+        free, Q(retry_at__isnull=True) | Q(retry_at__lte=now),
+        Exists(WebhookDelivery.objects.filter(endpoint=OuterRef('pk'), status='pending')),
+        active=True, group__deleted_at__isnull=True,
+    ).order_by('retry_at', 'id').values_list('id', flat=True)[:limit]
+    lease = lease_until(now)
+    claimed = [
+        endpoint_id for endpoint_id in list(candidates)
+        if WebhookEndpoint.objects.filter(free, id=endpoint_id).update(leased_until=lease)
+    ]
+    return list(WebhookEndpoint.objects.filter(id__in=claimed))
+
+
+def renew_leases(endpoints):
+    """Extend the leases of endpoints whose batch is still in flight"""
+    lease = lease_until(timezone.now())
+    for endpoint in endpoints:
+        # Unless the lease expired and another dispatcher took the endpoint
+        if WebhookEndpoint.objects.filter(pk=endpoint.pk, leased_until=endpoint.leased_until).update(
+            leased_until=lease
+        ):
+            endpoint.leased_until = lease
+
+
+def next_batch(endpoint, batch_size):
+    return list(
+        endpoint.deliveries.filter(status='pending').select_related('event')
+        .order_by('id')[:batch_size]
+    )
+
+
+def encode_batch(deliveries):
+    return json.dumps({
+        'deliveries': [
+            {
+                'id': delivery.pk,
+                'event': delivery.event.event,
+                'created_at': delivery.event.created_at,
+                'data': delivery.event.payload,
+            }
+            for delivery in deliveries
+        ]
+    }, cls=DjangoJSONEncoder).encode()
+
+
+def sign(secret, body):
+    return 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def post(url, secret, body, timeout):
+    """POST one batch; return (status code or None, error message)"""
+    if urlsplit(url).scheme not in SCHEMES:
+        return None, 'URL not allowed'
+    request = urllib.request.Request(url, data=body, method='POST', headers={
+        'Content-Type': 'application/json',
+        'User-Agent': 'TaskSphere-Webhooks',
+        SIGNATURE_HEADER: sign(secret, body),
+    })
+    try:
+        with _opener.open(request, timeout=timeout) as response:
+            return response.status, ''
+    except urllib.error.HTTPError as exc:
+        exc.close()
+        return exc.code, f'HTTP {exc.code}'
+    except UnsafeURLError as exc:
+        logger.warning('Webhook to %s refused: %s', url, exc)
+        return None, 'URL not allowed'
+    except (urllib.error.URLError, OSError, ValueError) as exc:
+        logger.info('Webhook to %s failed: %s', url, getattr(exc, 'reason', exc))
+        return None, 'Request failed'
+
+
+def record_result(endpoint, deliveries, status_code, error):
+    """Store the outcome of a batch and release the endpoint's lease"""
+    now = timezone.now()
+    ids = [delivery.pk for delivery in deliveries]
+    endpoints = WebhookEndpoint.objects.filter(pk=endpoint.pk)
+    with transaction.atomic():
+        if status_code is not None and 200 <= status_code < 300:
+            WebhookDelivery.objects.filter(id__in=ids).update(
+                status='delivered', attempts=F('attempts') + 1, response_status=status_code,
+                error='', delivered_at=now
+            )
+            endpoints.update(failures=0, retry_at=None, leased_until=None)
+            return True
+
+        failures = endpoint.failures + 1
+        dead = failures >= webhook_settings()['MAX_ATTEMPTS']
+        WebhookDelivery.objects.filter(id__in=ids).update(
+            status='dead' if dead else 'pending', attempts=F('attempts') + 1,
+            response_status=status_code, error=error[:1000]
+        )
+        if dead:
+            logger.warning('Webhook %s: dead-lettered %d deliveries after %d attempts: %s',
+                           endpoint.pk, len(ids), failures, error)
+            endpoints.update(failures=0, retry_at=None, leased_until=None)
+        else:
+            endpoints.update(failures=failures, retry_at=now + timedelta(seconds=backoff(failures)),
+                             leased_until=None)
+    return False
+
+
+def dispatch_once(workers=None, batch_size=None):
+    """Run one dispatch round; return (events fanned out, delivered, failed)"""
+    config = webhook_settings()
+    workers = workers or config['MAX_WORKERS']
+    batch_size = batch_size or config['BATCH_SIZE']
+
+    fanned_out = 0
+    while True:
+        count = fan_out()
+        fanned_out += count
+        if not count:
+            break
+
+    batches = []
+    for endpoint in claim_endpoints(workers * 4):
+        deliveries = next_batch(endpoint, batch_size)
+        if deliveries:
+            batches.append((endpoint, deliveries, encode_batch(deliveries)))
+        else:
+            WebhookEndpoint.objects.filter(pk=endpoint.pk).update(leased_until=None)
+
+    delivered = failed = 0
+    if not batches:
+        return fanned_out, delivered, failed
+    # Only the HTTP requests run on the pool; results and leases are stored here
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='webhook') as executor:
+        in_flight = {
+            executor.submit(post, endpoint.url, endpoint.secret, body, config['TIMEOUT']):
+                (endpoint, deliveries)
+            for endpoint, deliveries, body in batches
+        }
+        renewed = time.monotonic()
+        while in_flight:
+            done, _ = wait(in_flight, timeout=config['TIMEOUT'], return_when=FIRST_COMPLETED)
+            for future in done:
+                endpoint, deliveries = in_flight.pop(future)
+                status_code, error = future.result()
+                if record_result(endpoint, deliveries, status_code, error):
+                    delivered += len(deliveries)
+                else:
+                    failed += len(deliveries)
+            # The socket timeout bounds each read, not a response dripped
+            # slowly, so the lease must not run out while a request goes on
+            if in_flight and time.monotonic() - renewed >= config['TIMEOUT']:
+                renew_leases(endpoint for endpoint, _ in in_flight.values())
+                renewed = time.monotonic()
+    return fanned_out, delivered, failed
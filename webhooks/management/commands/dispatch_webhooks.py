@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from webhooks.dispatch import dispatch_once
+
+
+class Command(BaseCommand):
+    help = 'Deliver webhook events from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Run one round and exit instead of polling')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to wait when there is nothing to deliver')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Concurrent HTTP requests (default WEBHOOK_MAX_WORKERS)')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Events per request (default WEBHOOK_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            fanned_out, delivered, failed = dispatch_once(options['workers'], options['batch_size'])
+            if options['verbosity'] > 1 or (options['once'] and options['verbosity']):
+                self.stdout.write(
+                    f'{fanned_out} new events, {delivered} deliveries sent, {failed} failed'
+                )
+            if options['once']:
+                break
+            if not (fanned_out or delivered or failed):
+                time.sleep(options['interval'])
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from webhooks.models import OutboxEvent
+
+
+class Command(BaseCommand):
+    help = 'Delete dispatched webhook events, and their deliveries, older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            default=getattr(settings, 'WEBHOOK_RETENTION_DAYS', 7),
+                            help='Keep events from the last this many days')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        # Events still waiting for a delivery are kept
+        events = OutboxEvent.objects.filter(
+            dispatched_at__lt=cutoff
+        ).exclude(deliveries__status='pending')
+
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                ids = list(events.order_by('id').values_list('id', flat=True)[:options['batch_size']])
+                if not ids:
+                    break
+                OutboxEvent.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+
+        self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} webhook events'))
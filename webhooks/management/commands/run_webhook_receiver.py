@@ -0,0 +1,50 @@
+import hmac
+import json
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from webhooks.dispatch import SIGNATURE_HEADER, sign
+
+
+class Command(BaseCommand):
+    help = 'Run a local HTTP server that prints the webhook batches it receives (for development)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8010)
+        parser.add_argument('--secret', default='',
+                            help="Endpoint secret; batches with a wrong signature get 401")
+        parser.add_argument('--fail-rate', type=float, default=0.0,
+                            help='Share of batches to answer with 500, to exercise retries')
+
+    def handle(self, *args, **options):
+        command = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if options['secret'] and not hmac.compare_digest(
+                    self.headers.get(SIGNATURE_HEADER, ''), sign(options['secret'], body)
+                ):
+                    status = 401
+                elif random.random() < options['fail_rate']:
+                    status = 500
+                else:
+                    status = 200
+                    for delivery in json.loads(body)['deliveries']:
+                        command.stdout.write(json.dumps(delivery))
+                self.send_response(status)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                command.stderr.write(format % args)
+
+        server = ThreadingHTTPServer(('127.0.0.1', options['port']), Handler)
+        self.stdout.write(f'Receiving webhooks on http://127.0.0.1:{options["port"]}/')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
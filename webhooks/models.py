@@ -0,0 +1,121 @@
+import secrets
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+from groups.models import Group
+
+
+class OutboxEvent(models.Model):
+    """A task or swap event, written in the transaction of the change.
+
+    The dispatcher turns undispatched events into one ``WebhookDelivery`` per
+    subscribed endpoint and sets ``dispatched_at``. See webhooks.dispatch.
+    """
+
+    EVENT_CHOICES = [
+        ('task.created', 'Task Created'),
+        ('task.status_changed', 'Task Status Changed'),
+        ('swap.approved', 'Swap Approved'),
+    ]
+
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    event = models.CharField(max_length=40, choices=EVENT_CHOICES)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Events the dispatcher has not fanned out yet
+            models.Index(fields=['id'], condition=models.Q(dispatched_at__isnull=True),
+                         name='outbox_undispatched'),
+        ]
+
+    def __str__(self):
+        return f"{self.id}: {self.event}"
+
+
+class WebhookEndpoint(models.Model):
+    """URL that receives a group's events (all of them if ``events`` is empty)"""
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.CASCADE,
+        related_name='webhooks'
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='webhooks'
+    )
+    url = models.URLField(max_length=500)
+    # Key of the HMAC-SHA256 signature sent with every delivery
+    secret = models.CharField(max_length=64)
+    events = models.JSONField(default=list, blank=True)
+    active = models.BooleanField(default=True)
+
+    # Delivery state: consecutive failed attempts of the current batch, when
+    # to try again, and the dispatcher lease that keeps deliveries in order
+    failures = models.PositiveIntegerField(default=0)
+    retry_at = models.DateTimeField(null=True, blank=True)
+    leased_until = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.group_id}: {self.url}"
+
+    @staticmethod
+    def new_secret():
+        return secrets.token_hex(32)
+
+    def subscribes(self, event):
+        return not self.events or event in self.events
+
+
+class WebhookDelivery(models.Model):
+    """One event to send to one endpoint"""
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('delivered', 'Delivered'),
+        ('dead', 'Dead'),
+    ]
+
+    endpoint = models.ForeignKey(
+        WebhookEndpoint,
+        on_delete=models.CASCADE,
+        related_name='deliveries'
+    )
+    event = models.ForeignKey(
+        OutboxEvent,
+        on_delete=models.CASCADE,
+        related_name='deliveries'
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['endpoint', 'event'], name='unique_webhook_delivery'),
+        ]
+        indexes = [
+            # An endpoint's deliveries in event order, by status
+            models.Index(fields=['endpoint', 'status', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} -> {self.endpoint_id} ({self.status})"
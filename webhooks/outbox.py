@@ -0,0 +1,88 @@
+"""Writing webhook events to the outbox.
+
+The functions here run in the signal handlers of the change, inside its
+transaction, so an event is stored if and only if the change commits.
+Events are only written for groups with an active endpoint subscribed to
+them; the dispatcher (webhooks.dispatch) delivers them later.
+"""
+from .models import OutboxEvent, WebhookEndpoint
+
+
+def subscribed_groups(group_ids, event):
+    """The groups among ``group_ids`` with an active endpoint for the event"""
+    groups = set()
+    for group_id, events in WebhookEndpoint.objects.filter(
+        group_id__in=set(group_ids), active=True
+    ).values_list('group_id', 'events'):
+        if not events or event in events:
+            groups.add(group_id)
+    return groups
+
+
+def _user_ids(pks):
+    """{pk: 8-digit user ID} of the given users"""
+    from users.models import User
+    pks = {pk for pk in pks if pk is not None}
+    return dict(User.objects.filter(pk__in=pks).values_list('pk', 'user_id')) if pks else {}
+
+
+def task_data(task, user_ids):
+    return {
+        'id': task.pk,
+        'title': task.title,
+        'description': task.description,
+        'priority': task.priority,
+        'status': task.status,
+        'deadline': task.deadline,
+        'group_id': task.group_id,
+        'assigned_to_user_id': user_ids.get(task.assigned_to_user_id),
+        'assigned_to_group_id': task.assigned_to_group_id,
+        'created_by_user_id': user_ids.get(task.created_by_id),
+        'recurrence_id': task.recurrence_id,
+    }
+
+
+def tasks_created(tasks):
+    groups = subscribed_groups([task.group_id for task in tasks], 'task.created')
+    tasks = [task for task in tasks if task.group_id in groups]
+    if not tasks:
+        return
+    user_ids = _user_ids(
+        [task.assigned_to_user_id for task in tasks] + [task.created_by_id for task in tasks]
+    )
+    OutboxEvent.objects.bulk_create([
+        OutboxEvent(group_id=task.group_id, event='task.created',
+                    payload={'task': task_data(task, user_ids)})
+        for task in tasks
+    ])
+
+
+def task_status_changed(changes):
+    """Record status changes given as (task, previous status, new status)"""
+    changes = [change for change in changes if change[1] != change[2]]
+    groups = subscribed_groups([task.group_id for task, _, _ in changes], 'task.status_changed')
+    OutboxEvent.objects.bulk_create([
+        OutboxEvent(group_id=task.group_id, event='task.status_changed', payload={
+            'task_id': task.pk,
+            'title': task.title,
+            'from': previous,
+            'to': status,
+        })
+        for task, previous, status in changes
+        if task.group_id in groups
+    ])
+
+
+def swap_approved(swap):
+    from tasks.models import Task
+    group_id = Task.objects.filter(pk=swap.requester_task_id).values_list('group_id', flat=True).first()
+    if group_id not in subscribed_groups([group_id], 'swap.approved'):
+        return
+    user_ids = _user_ids([swap.requester_id, swap.target_user_id])
+    OutboxEvent.objects.create(group_id=group_id, event='swap.approved', payload={
+        'swap_id': swap.pk,
+        'requester_task_id': swap.requester_task_id,
+        'target_task_id': swap.target_task_id,
+        'requester_user_id': user_ids.get(swap.requester_id),
+        'target_user_id': user_ids.get(swap.target_user_id),
+    })
@@ -0,0 +1,43 @@
+from rest_framework import serializers
+
+from .models import OutboxEvent, WebhookDelivery, WebhookEndpoint
+
+EVENTS = [value for value, _ in OutboxEvent.EVENT_CHOICES]
+
+
+class WebhookEndpointSerializer(serializers.ModelSerializer):
+    """Serializer for webhook endpoints; the secret is only shown on creation"""
+    events = serializers.ListField(child=serializers.ChoiceField(choices=EVENTS), required=False)
+
+    class Meta:
+        model = WebhookEndpoint
+        fields = ['id', 'group', 'url', 'events', 'active', 'failures', 'retry_at',
+                 'created_at', 'updated_at']
+        read_only_fields = ['id', 'failures', 'retry_at', 'created_at', 'updated_at']
+
+    def validate_url(self, value):
+        from .dispatch import UnsafeURLError, check_url
+        try:
+            check_url(value)
+        except UnsafeURLError as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
+
+
+class WebhookEndpointCreateSerializer(WebhookEndpointSerializer):
+    """Serializer for registering a webhook endpoint"""
+    class Meta(WebhookEndpointSerializer.Meta):
+        fields = WebhookEndpointSerializer.Meta.fields + ['secret']
+        read_only_fields = WebhookEndpointSerializer.Meta.read_only_fields + ['secret']
+
+
+class WebhookDeliverySerializer(serializers.ModelSerializer):
+    """Serializer for one delivery of an event to an endpoint"""
+    event = serializers.CharField(source='event.event', read_only=True)
+    event_id = serializers.IntegerField(read_only=True)
+    data = serializers.JSONField(source='event.payload', read_only=True)
+
+    class Meta:
+        model = WebhookDelivery
+        fields = ['id', 'event_id', 'event', 'data', 'status', 'attempts', 'response_status',
+                 'error', 'created_at', 'delivered_at']
@@ -0,0 +1,57 @@
+from django.db.models.signals import post_save, pre_save
+from django.dispatch import receiver
+
+from tasks.models import Task, TaskSwap
+from tasks.signals import tasks_bulk_created, tasks_bulk_updated
+
+from . import outbox
+
+# These receivers run after the tasks app's (webhooks is installed later), so
+# the task snapshot they read in pre_save is already loaded. Task and TaskSwap
+# saves are atomic, so the outbox rows commit with the change.
+
+
+@receiver(pre_save, sender=Task)
+def remember_task_status(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        return
+    snapshot = getattr(instance, '_stats_snapshot', None)
+    instance._webhook_status = snapshot['status'] if snapshot else None
+
+
+@receiver(post_save, sender=Task)
+def record_task_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        outbox.tasks_created([instance])
+        return
+    previous = getattr(instance, '_webhook_status', None)
+    if previous is not None and previous != instance.status:
+        outbox.task_status_changed([(instance, previous, instance.status)])
+
+
+@receiver(tasks_bulk_created, sender=Task)
+def record_tasks_bulk_create(sender, tasks, **kwargs):
+    outbox.tasks_created(tasks)
+
+
+@receiver(tasks_bulk_updated, sender=Task)
+def record_tasks_bulk_update(sender, tasks, changes=None, **kwargs):
+    if changes and 'status' in changes:
+        # The tasks carry their status from before the update
+        outbox.task_status_changed([(task, task.status, changes['status']) for task in tasks])
+
+
+@receiver(pre_save, sender=TaskSwap)
+def remember_swap_status(sender, instance, raw=False, **kwargs):
+    if not raw and not instance._state.adding:
+        instance._webhook_status = (
+            TaskSwap.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=TaskSwap)
+def record_swap_save(sender, instance, raw=False, **kwargs):
+    if not raw and instance.status == 'approved' and getattr(instance, '_webhook_status', None) != 'approved':
+        outbox.swap_approved(instance)
@@ -0,0 +1,102 @@
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.exceptions import ValidationError
+
+from groups.models import Group
+from users.models import User
+from . import dispatch
+from .dispatch import UnsafeURLError, check_url, post
+from .models import OutboxEvent, WebhookDelivery, WebhookEndpoint
+from .serializers import WebhookEndpointSerializer
+
+
+class RedirectHandler(BaseHTTPRequestHandler):
+    requests = 0
+
+    def do_POST(self):
+        RedirectHandler.requests += 1
+        self.send_response(302)
+        self.send_header('Location', '/elsewhere')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class EndpointURLTests(SimpleTestCase):
+    def test_internal_and_non_http_urls_are_refused(self):
+        for url in (
+            'http://127.0.0.1/hook', 'http://localhost:8000/hook', 'http://10.0.0.5/hook',
+            'http://169.254.169.254/latest/meta-data/', 'http://[::1]/hook', 'http://0.0.0.0/',
+            'file:///etc/passwd', 'ftp://93.184.216.34/hook', 'http:///hook',
+        ):
+            with self.assertRaises(UnsafeURLError, msg=url):
+                check_url(url)
+        check_url('https://93.184.216.34/hook')
+
+    def test_serializer_refuses_internal_urls(self):
+        with self.assertRaises(ValidationError):
+            WebhookEndpointSerializer().validate_url('http://127.0.0.1:8010/')
+
+    def test_dispatch_refuses_internal_urls_with_a_generic_error(self):
+        self.assertEqual(post('http://127.0.0.1:9/hook', 'secret', b'{}', 1), (None, 'URL not allowed'))
+        self.assertEqual(post('file:///etc/passwd', 'secret', b'{}', 1), (None, 'URL not allowed'))
+
+    @override_settings(WEBHOOK_ALLOW_PRIVATE_ADDRESSES=True)
+    def test_redirects_are_not_followed(self):
+        server = HTTPServer(('127.0.0.1', 0), RedirectHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = f'http://127.0.0.1:{server.server_port}/hook'
+        self.assertEqual(post(url, 'secret', b'{}', 5), (302, 'HTTP 302'))
+        self.assertEqual(RedirectHandler.requests, 1)
+
+    @override_settings(WEBHOOK_ALLOW_PRIVATE_ADDRESSES=True)
+    def test_connection_errors_are_stored_generically(self):
+        # A local port nothing listens on
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        self.assertEqual(post(f'http://127.0.0.1:{port}/', 'secret', b'{}', 5), (None, 'Request failed'))
+
+
+@override_settings(WEBHOOK_TIMEOUT=0.05)
+class DispatchLeaseTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(email='admin@example.com', username='admin', password='x',
+                                        first_name='Admin', last_name='Test')
+        group = Group.objects.create(name='Chores', creator=user)
+        cls.endpoint = WebhookEndpoint.objects.create(
+            group=group, created_by=user, url='https://example.com/', secret=WebhookEndpoint.new_secret()
+        )
+        event = OutboxEvent.objects.create(group=group, event='task.created', payload={})
+        WebhookDelivery.objects.create(endpoint=cls.endpoint, event=event)
+
+    def test_lease_is_renewed_while_a_request_is_slow(self):
+        leases = []
+
+        def renew(endpoints):
+            renew_leases(endpoints)
+            leases.append(WebhookEndpoint.objects.get(pk=self.endpoint.pk).leased_until)
+
+        def slow_post(*args):
+            time.sleep(0.3)
+            return 200, ''
+
+        renew_leases = dispatch.renew_leases
+        with mock.patch.object(dispatch, 'post', side_effect=slow_post), \
+                mock.patch.object(dispatch, 'renew_leases', side_effect=renew):
+            self.assertEqual(dispatch.dispatch_once(workers=1), (1, 1, 0))
+        self.assertGreater(len(leases), 1)
+        self.assertEqual(leases, sorted(set(leases)))
+        self.endpoint.refresh_from_db()
+        self.assertIsNone(self.endpoint.leased_until)
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('', views.webhook_list, name='webhook-list'),
+    path('<int:webhook_id>/', views.WebhookDetailView.as_view(), name='webhook-detail'),
+    path('<int:webhook_id>/deliveries/', views.WebhookDeliveryListView.as_view(), name='webhook-deliveries'),
+    path('<int:webhook_id>/redeliver/', views.redeliver, name='webhook-redeliver'),
+]
@@ -0,0 +1,81 @@
+from rest_framework import generics, status, permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from django.shortcuts import get_object_or_404
+
+from groups.models import Group
+from .models import WebhookDelivery, WebhookEndpoint
+from .serializers import (
+    WebhookEndpointSerializer,
+    WebhookEndpointCreateSerializer,
+    WebhookDeliverySerializer
+)
+
+
+def administered_endpoints(user):
+    """Endpoints of the live groups the user administers"""
+    return WebhookEndpoint.objects.filter(group__creator=user, group__deleted_at__isnull=True)
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([permissions.IsAuthenticated])
+def webhook_list(request):
+    """List or register webhook endpoints of the groups the user administers"""
+    if request.method == 'GET':
+        endpoints = administered_endpoints(request.user)
+        group_id = request.query_params.get('group')
+        if group_id:
+            endpoints = endpoints.filter(group_id=group_id)
+        return Response(WebhookEndpointSerializer(endpoints, many=True).data)
+
+    serializer = WebhookEndpointCreateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    group = get_object_or_404(Group, id=serializer.validated_data['group'].id, members=request.user)
+
+    # Check if user is admin
+    if not group.is_admin(request.user):
+        return Response({'error': 'Only group admin can register webhooks'},
+                       status=status.HTTP_403_FORBIDDEN)
+
+    endpoint = serializer.save(created_by=request.user, secret=WebhookEndpoint.new_secret())
+    return Response(WebhookEndpointCreateSerializer(endpoint).data, status=status.HTTP_201_CREATED)
+
+
+class WebhookDetailView(generics.RetrieveUpdateDestroyAPIView):
+    """Webhook endpoint detail, update, and delete (group admin only)"""
+    serializer_class = WebhookEndpointSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    lookup_url_kwarg = 'webhook_id'
+
+    def get_queryset(self):
+        return administered_endpoints(self.request.user)
+
+    def perform_update(self, serializer):
+        # The group of an endpoint cannot change
+        serializer.save(group=serializer.instance.group)
+
+
+class WebhookDeliveryListView(generics.ListAPIView):
+    """Recent deliveries of a webhook endpoint, newest first"""
+    serializer_class = WebhookDeliverySerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        endpoint = get_object_or_404(administered_endpoints(self.request.user), id=self.kwargs['webhook_id'])
+        deliveries = endpoint.deliveries.select_related('event').order_by('-id')
+        status_filter = self.request.query_params.get('status')
+        if status_filter:
+            deliveries = deliveries.filter(status=status_filter)
+        return deliveries
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def redeliver(request, webhook_id):
+    """Queue the endpoint's dead deliveries again"""
+    endpoint = get_object_or_404(administered_endpoints(request.user), id=webhook_id)
+    count = WebhookDelivery.objects.filter(endpoint=endpoint, status='dead').update(
+        status='pending', attempts=0, error=''
+    )
+    return Response({'requeued': count})